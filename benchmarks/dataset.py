@@ -0,0 +1,92 @@
+'''
+Wall time and peak memory of project/reconstruct on a dataset read with np.load
+versus the same data memory-mapped with pyCT.openVolume / pyCT.openSinogram.
+Each case runs in a fresh interpreter. The memory-mapped pages count towards the
+RSS while they are resident, but they are clean page cache that the OS can drop.
+
+usage : python benchmarks/dataset.py --size 128 --views 180 [--cone] [--jit] [--dir DIR]
+'''
+import argparse, os, sys, tempfile
+import numpy as np
+# the pyCT of this tree, as peak.runCase imports it in the cases
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyCT
+from peak import runCase
+
+CASE = '''
+import json, resource, sys, time, tracemalloc
+import numpy as np
+import pyCT
+
+path, direction, memmap, jit = json.loads(sys.argv[1])
+params = pyCT.loadParameters(path)
+tracemalloc.start()
+start = time.perf_counter()
+if direction == 'forward':
+    array = pyCT.openVolume(path) if memmap else np.load(path + '/volume.npy')
+    out = pyCT.openSinogram(path, 'r+') if memmap else None
+    pyCT.project(array, params, jit=jit, out=out)
+else:
+    array = pyCT.openSinogram(path) if memmap else np.load(path + '/sinogram.npy')
+    out = pyCT.openVolume(path, 'r+') if memmap else None
+    pyCT.reconstruct(array, params, jit=jit, out=out)
+if out is not None:
+    out.flush()
+elapsed = time.perf_counter() - start
+heap = tracemalloc.get_traced_memory()[1]
+print(json.dumps([elapsed, heap / 2**20, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024]))
+'''
+
+
+def makeDataset(path, size, views, cone):
+    params = pyCT.getParameters()
+    params.mode = cone
+    params.object.size.set([size, size, size])
+    params.object.spacing.set([1, 1, 1])
+    params.detector.size.set([size, size])
+    params.detector.spacing.set([2, 2] if cone else [1, 1])
+    params.source.distance.source2origin = 4*size
+    params.source.distance.source2detector = 8*size
+    params.check()
+    params.set(source_angles=np.linspace(0, 2*np.pi, views, endpoint=False))
+    pyCT.createDataset(path, params)
+
+    volume = pyCT.openVolume(path, 'w+')
+    for z in range(size):
+        volume[z] = np.random.rand(size, size)
+    volume.flush()
+    sinogram = pyCT.openSinogram(path, 'w+')
+    for a in range(views):
+        sinogram[a] = np.random.rand(size, size)
+    sinogram.flush()
+    np.save(os.path.join(path, 'volume.npy'), volume)
+    np.save(os.path.join(path, 'sinogram.npy'), sinogram)
+
+
+def measure(path, direction, memmap, jit):
+    '''
+    -> wall time [s], traced heap peak [MiB], peak RSS [MiB]
+    '''
+    return runCase(CASE, [path, direction, memmap, jit])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=96)
+    parser.add_argument('--views', type=int, default=90)
+    parser.add_argument('--cone', action='store_true')
+    parser.add_argument('--jit', action='store_true')
+    parser.add_argument('--dir', default=None, help='where to write the dataset (a temporary directory if omitted)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as path:
+        makeDataset(path, args.size, args.views, args.cone)
+        print('{:<10} {:<8} {:>10} {:>14} {:>14}'.format('', '', 'time', 'heap peak', 'RSS peak'))
+        for direction in ['forward', 'backward']:
+            for memmap in [False, True]:
+                elapsed, heap, rss = measure(path, direction, memmap, args.jit)
+                print('{:<10} {:<8} {:>8.2f} s {:>10.1f} MiB {:>10.1f} MiB'.format(direction, 'memmap' if memmap else 'np.load', elapsed, heap, rss))
+
+
+if __name__ == '__main__':
+    main()
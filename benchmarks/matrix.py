@@ -0,0 +1,82 @@
+'''
+Forward/adjoint pairs with the cached system matrix (getMatrix) versus the on-the-fly engines.
+For every size: the assembly time, the matrix memory, the time of one project + unfiltered reconstruct
+pair per engine and the number of pairs after which the assembly has paid off.
+The crossover is the largest size at which the matrix pair beats the fastest engine.
+
+usage : python benchmarks/matrix.py --sizes 16 32 64 [--3d] [--cone] [--repeat 3]
+'''
+import argparse, os, sys, time
+import numpy as np
+# the pyCT of this tree, as peak.runCase imports it in the cases
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyCT
+
+
+def makeParameters(size, cone, volume):
+    params = pyCT.getParameters()
+    params.mode = cone
+    params.object.size.set([size, size, size if volume else 1])
+    params.object.spacing.set([1, 1, 1])
+    params.detector.size.set([size, size if volume else 1])
+    params.detector.spacing.set([2, 2] if cone else [1, 1])
+    params.source.distance.source2origin = 4*size
+    params.source.distance.source2detector = 8*size
+    params.check()
+    params.set(source_angles=np.linspace(0, np.pi, size, endpoint=False))
+    return params
+
+
+def measure(func, repeat):
+    # best of repeat after a warm-up call (JIT compilation, caches)
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 32, 64, 128])
+    parser.add_argument('--3d', dest='volume', action='store_true', help='size^3 volumes (size^2 slices by default)')
+    parser.add_argument('--cone', action='store_true')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engines = {'numpy': dict(jit=False)}
+    if pyCT.backend.isAvailable('jit'):
+        engines['jit'] = dict(jit=True)
+
+    print('{:>6} {:>10} {:>12} {:>10} '.format('size', 'assembly', 'memory', 'matrix') + ' '.join('{:>10}'.format(name) for name in engines) + ' {:>10}'.format('payoff'))
+    crossover = None
+    for size in args.sizes:
+        params = makeParameters(size, args.cone, args.volume)
+        nx, ny, nz = params.object.size.get()
+        volume = np.random.rand(nz, ny, nx).astype(np.float32)
+        sinogram = pyCT.project(volume, params, jit=False)
+
+        pyCT.clearCache()
+        start = time.perf_counter()
+        matrix = pyCT.getMatrix(params)
+        assembly = time.perf_counter() - start
+
+        def pair(**kwargs):
+            pyCT.project(volume, params, **kwargs)
+            pyCT.reconstruct(sinogram, params, filter=None, **kwargs)
+        times = {name: measure(lambda: pair(**kwargs), args.repeat) for name, kwargs in engines.items()}
+        matrix_time = measure(lambda: pair(matrix=matrix), args.repeat)
+
+        fastest = min(times.values())
+        payoff = '{:>10.0f}'.format(np.ceil(assembly / (fastest - matrix_time))) if matrix_time < fastest else '{:>10}'.format('never')
+        if matrix_time < fastest:
+            crossover = size
+        memory = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 2**20
+        print('{:>6} {:>8.2f} s {:>8.1f} MiB {:>8.4f} s '.format(size, assembly, memory, matrix_time) + ' '.join('{:>8.4f} s'.format(t) for t in times.values()) + ' ' + payoff)
+    print('crossover: ' + ('the matrix is never faster' if crossover is None else 'the matrix is faster up to size {}'.format(crossover)))
+
+
+if __name__ == '__main__':
+    main()
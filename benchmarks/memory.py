@@ -0,0 +1,95 @@
+'''
+Peak resident memory of project/reconstruct, of the code at a baseline git ref against the current tree.
+Each case runs in a fresh interpreter, and the peak is taken over a second call
+so that JIT compilation and caches are not counted.
+The baseline gets float64 input and allocates its output; the current tree runs that same call,
+then the zero-copy path (float32 input, out=).
+On the NumPy backend the forward peak is dominated by the sample workspace, about 120 bytes per sample
+of chunk_size (30 MiB at the default 2**18, 115 MiB at 2**20).
+
+usage : python benchmarks/memory.py --baseline <ref> [--size 96] [--views 90] [--cone] [--jit] [--chunk-size 262144]
+'''
+import argparse, os, subprocess, tarfile, tempfile
+from peak import runCase
+
+CASE = '''
+import json, sys
+import numpy as np
+import pyCT
+from peak import resetPeak, getPeak
+
+size, views, mode, jit, chunk_size, direction, copy = json.loads(sys.argv[1])
+params = pyCT.getParameters()
+params.mode = mode
+params.object.size.set([size, size, size])
+params.object.spacing.set([1, 1, 1])
+params.detector.size.set([size, size])
+params.detector.spacing.set([2, 2] if mode else [1, 1])
+params.source.distance.source2origin = 4*size
+params.source.distance.source2detector = 8*size
+params.check()
+params.set(source_angles=np.linspace(0, 2*np.pi, views, endpoint=False))
+
+# out= only on the zero-copy path, the baseline does not know it
+if direction == 'forward':
+    array = np.random.rand(size, size, size).astype(np.float64 if copy else np.float32)
+    kwargs = dict(chunk_size=chunk_size) if copy else dict(chunk_size=chunk_size, out=np.empty([views, size, size], dtype=np.float32))
+    run = lambda: pyCT.project(array, params, jit=jit, **kwargs)
+else:
+    array = np.random.rand(views, size, size).astype(np.float64 if copy else np.float32)
+    kwargs = dict() if copy else dict(out=np.empty([size, size, size], dtype=np.float32))
+    run = lambda: pyCT.reconstruct(array, params, filter=None, jit=jit, **kwargs)
+
+run()
+resetPeak()
+before = getPeak()
+run()
+print(json.dumps((getPeak() - before) / 1024))
+'''
+
+
+def export(ref, path):
+    '''
+    Extract pyCT at the git ref into path.
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    archive = subprocess.check_output(['git', 'archive', ref, 'pyCT'], cwd=root)
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        with tarfile.open(fileobj=f) as tar:
+            tar.extractall(path)
+
+
+def measure(path, size, views, mode, jit, chunk_size, direction, copy):
+    '''
+    path   : directory holding the pyCT to measure
+    ->
+    output : peak RSS increase during one call [MiB]
+    '''
+    return runCase(CASE, [size, views, mode, jit, chunk_size, direction, copy], path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', required=True, help='git ref of the code to compare against')
+    parser.add_argument('--size', type=int, default=96)
+    parser.add_argument('--views', type=int, default=90)
+    parser.add_argument('--cone', action='store_true')
+    parser.add_argument('--jit', action='store_true')
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=2**18, help='ray samples at once on the NumPy backend (both trees)')
+    args = parser.parse_args()
+
+    current = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as baseline:
+        export(args.baseline, baseline)
+        print('{:<10} {:>22} {:>22} {:>22}'.format('', 'baseline, float64', 'current, float64', 'current, float32 out='))
+        for direction in ['forward', 'backward']:
+            peaks = [measure(baseline, args.size, args.views, args.cone, args.jit, args.chunk_size, direction, True),
+                     measure(current, args.size, args.views, args.cone, args.jit, args.chunk_size, direction, True),
+                     measure(current, args.size, args.views, args.cone, args.jit, args.chunk_size, direction, False)]
+            print('{:<10} {:>18.1f} MiB {:>18.1f} MiB {:>18.1f} MiB'.format(direction, *peaks))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+'''
+Shared by the benchmarks: the peak resident memory of a case run in a fresh interpreter.
+The case source imports resetPeak and getPeak from this module.
+'''
+import json, os, resource, subprocess, sys
+
+
+def resetPeak():
+    # Linux only, the peak stays at its maximum elsewhere
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def getPeak():
+    # [KiB]
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def runCase(source, args, path=None):
+    '''
+    source : Python source of the case, reading json.loads(sys.argv[1]) and printing a JSON line last
+    args   : JSON-serializable arguments of the case
+    path   : directory holding the pyCT to import (the current tree by default)
+    ->
+    output : the last line printed by the case, decoded
+    '''
+    path = path or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # a fixed mmap threshold returns freed arrays to the OS, otherwise glibc keeps them after the warm-up call
+    env = dict(os.environ, MALLOC_MMAP_THRESHOLD_='131072', PYTHONPATH=os.pathsep.join([path, os.path.dirname(os.path.abspath(__file__))]))
+    output = subprocess.check_output([sys.executable, '-c', source, json.dumps(args)], env=env, cwd=path)
+    return json.loads(output.decode().strip().splitlines()[-1])
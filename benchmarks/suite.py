@@ -0,0 +1,198 @@
+'''
+Benchmark suite of the project/reconstruct engines, the filter and the transformation, without a GPU
+(CUDA cases are added when the backend is available).
+run measures every combination of the options, each case in a fresh interpreter, and writes a JSON with the
+best wall time of --repeat calls after a warm-up call, the throughput (detector rays/s for project,
+voxel updates/s = voxels * views / s for reconstruct) and the peak RSS increase during the timed calls.
+compare matches the cases of two JSON files by name and flags those slower (or larger) by more than --threshold,
+with a nonzero exit status when any regressed.
+--workers above 1 adds the numpy cases on that many workers of each of --executors, for the scaling of the CPU pools
+(the peak RSS is that of the calling process, forked workers are not counted).
+
+usage : python benchmarks/suite.py run [--modes parallel cone] [--sizes 32 64] [--detectors 64] [--views 32]
+                                       [--ray-steps .5 1] [--filters ramp hann none] [--backends numpy jit]
+                                       [--methods sampling joseph siddon] [--workers 1 2 4] [--executors thread process]
+                                       [--repeat 3] [--output results.json]
+        python benchmarks/suite.py compare baseline.json results.json [--threshold .1]
+'''
+import argparse, itertools, json, os, platform, sys
+import numpy as np
+# the pyCT of this tree, as peak.runCase imports it in the cases
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyCT
+from peak import runCase
+
+CASE = '''
+import json, sys, time
+import numpy as np
+import pyCT
+from pyCT.backward import _applyFilter
+from peak import resetPeak, getPeak
+
+case, repeat = json.loads(sys.argv[1])
+mode, size, detector, views = case['mode'] == 'cone', case['size'], case['detector'], case['views']
+params = pyCT.getParameters()
+params.mode = mode
+params.object.size.set([size, size, size])
+params.object.spacing.set([1, 1, 1])
+params.detector.size.set([detector, detector])
+params.detector.spacing.set([2*size/detector]*2 if mode else [size/detector]*2)
+params.source.distance.source2origin = 4*size
+params.source.distance.source2detector = 8*size
+params.check()
+params.set(source_angles=np.linspace(0, 2*np.pi, views, endpoint=False))
+engine = dict(cuda=case['backend'] == 'cuda', jit=case['backend'] == 'jit', **{key: case[key] for key in ['workers', 'executor'] if key in case})
+
+rng = np.random.default_rng(0)
+if case['kind'] == 'project':
+    array = rng.random((size, size, size), dtype=np.float32)
+    out = np.empty([views, detector, detector], dtype=np.float32)
+    run = lambda: pyCT.project(array, params, method=case['method'], ray_step=case['ray_step'], out=out, **engine)
+elif case['kind'] == 'reconstruct':
+    array = rng.random((views, detector, detector), dtype=np.float32)
+    out = np.empty([size, size, size], dtype=np.float32)
+    filter = None if case['filter'] == 'none' else case['filter']
+    run = lambda: pyCT.reconstruct(array, params, filter=filter, out=out, **engine)
+elif case['kind'] == 'filter':
+    array = rng.random((views, detector, detector), dtype=np.float32)
+    run = lambda: _applyFilter(array, params, case['filter'])
+else:
+    # the transformation stacks, recomputed on every call
+    def run():
+        pyCT.clearCache()
+        pyCT.getTransformation(params, 256, 0, params.source.distance.source2detector).getForward()
+
+run()
+resetPeak()
+before = getPeak()
+times = []
+for _ in range(repeat):
+    start = time.perf_counter()
+    run()
+    times.append(time.perf_counter() - start)
+print(json.dumps([min(times), (getPeak() - before) / 1024]))
+'''
+
+
+def getCases(args):
+    '''
+    -> every combination of the options, as dicts named by their parameters
+    '''
+    backends = [name for name in args.backends if name == 'numpy' or pyCT.backend.isAvailable(name)]
+    for mode, size, views in itertools.product(args.modes, args.sizes, args.views):
+        for detector in args.detectors or [size]:
+            geometry = dict(mode=mode, size=size, detector=detector, views=views)
+            for backend, method, ray_step in itertools.product(backends, args.methods, args.ray_steps):
+                # the ray-driven methods run on the numpy backend only
+                if method == 'sampling' or backend == 'numpy':
+                    for pool in getPools(args, backend):
+                        yield dict(kind='project', backend=backend, method=method, ray_step=ray_step, **geometry, **pool)
+            for backend, filter in itertools.product(backends, args.filters):
+                for pool in getPools(args, backend):
+                    yield dict(kind='reconstruct', backend=backend, filter=filter, **geometry, **pool)
+            for filter in args.filters:
+                if filter != 'none':
+                    yield dict(kind='filter', backend='numpy', filter=filter, **geometry)
+            if size == args.sizes[0] and detector == (args.detectors or [size])[0]:
+                yield dict(kind='transformation', backend='numpy', **geometry)
+
+
+def getPools(args, backend):
+    '''
+    -> the worker pools of a case, the default single worker unnamed
+    '''
+    yield dict()
+    if backend == 'numpy':
+        for workers, executor in itertools.product(args.workers, args.executors):
+            if workers > 1:
+                yield dict(workers=workers, executor=executor)
+
+
+def getName(case):
+    keys = ['kind', 'mode', 'backend', 'method', 'filter', 'size', 'detector', 'views', 'ray_step', 'workers', 'executor']
+    return '/'.join('{}={}'.format(key, case[key]) for key in keys if key in case)
+
+
+def measure(case, repeat):
+    '''
+    -> best wall time [s], peak RSS increase [MiB]
+    '''
+    return runCase(CASE, [case, repeat])
+
+
+def run(args):
+    results = []
+    print('{:<100} {:>10} {:>14} {:>12}'.format('case', 'time', 'throughput', 'peak RSS'))
+    for case in getCases(args):
+        elapsed, peak = measure(case, args.repeat)
+        result = dict(name=getName(case), case=case, time=elapsed, peak_rss_mib=peak)
+        if case['kind'] == 'project':
+            result['rays_per_s'] = case['views'] * case['detector']**2 / elapsed
+        elif case['kind'] == 'reconstruct':
+            result['voxel_updates_per_s'] = case['views'] * case['size']**3 / elapsed
+        throughput = result.get('rays_per_s', result.get('voxel_updates_per_s'))
+        print('{:<100} {:>8.4f} s {:>14} {:>8.1f} MiB'.format(result['name'], elapsed, '' if throughput is None else '{:.3g}/s'.format(throughput), peak))
+        results.append(result)
+
+    machine = dict(python=platform.python_version(), numpy=np.__version__, platform=platform.platform(),
+                   processor=platform.processor(), cpus=os.cpu_count())
+    with open(args.output, 'w') as f:
+        json.dump(dict(machine=machine, repeat=args.repeat, results=results), f, indent=1)
+    print('written to {}'.format(args.output))
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = {result['name']: result for result in json.load(f)['results']}
+    with open(args.results) as f:
+        results = json.load(f)['results']
+
+    regressions = 0
+    print('{:<100} {:>10} {:>10} {:>8} {:>8}'.format('case', 'baseline', 'current', 'time', 'RSS'))
+    for result in results:
+        reference = baseline.get(result['name'])
+        if reference is None:
+            print('{:<100} {:>10} {:>8.4f} s'.format(result['name'], 'new', result['time']))
+            continue
+        speed = result['time'] / reference['time']
+        # below 1 MiB the RSS is noise
+        memory = max(result['peak_rss_mib'], 1) / max(reference['peak_rss_mib'], 1)
+        flags = [name for name, ratio in [('slower', speed), ('larger', memory)] if ratio > 1 + args.threshold]
+        regressions += bool(flags)
+        print('{:<100} {:>8.4f} s {:>8.4f} s {:>7.2f}x {:>7.2f}x {}'.format(result['name'], reference['time'], result['time'], speed, memory, ' '.join(flags).upper()).rstrip())
+    for name in baseline.keys() - {result['name'] for result in results}:
+        print('{:<100} {:>10}'.format(name, 'missing'))
+    print('{} of {} cases regressed by more than {:.0%}'.format(regressions, len(results), args.threshold))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    parser_run = commands.add_parser('run')
+    parser_run.add_argument('--modes', nargs='+', choices=['parallel', 'cone'], default=['parallel', 'cone'])
+    parser_run.add_argument('--sizes', type=int, nargs='+', default=[32, 64])
+    parser_run.add_argument('--detectors', type=int, nargs='+', default=None, help='detector sizes (the volume size by default)')
+    parser_run.add_argument('--views', type=int, nargs='+', default=[32])
+    parser_run.add_argument('--ray-steps', dest='ray_steps', type=float, nargs='+', default=[.5])
+    parser_run.add_argument('--filters', nargs='+', default=['ramp', 'none'])
+    parser_run.add_argument('--backends', nargs='+', choices=['numpy', 'jit', 'cuda'], default=['numpy', 'jit', 'cuda'])
+    parser_run.add_argument('--methods', nargs='+', choices=pyCT.forward.METHODS, default=pyCT.forward.METHODS)
+    parser_run.add_argument('--workers', type=int, nargs='+', default=[1])
+    parser_run.add_argument('--executors', nargs='+', choices=pyCT.parallel.EXECUTORS, default=['thread'])
+    parser_run.add_argument('--repeat', type=int, default=3)
+    parser_run.add_argument('--output', default='results.json')
+    parser_compare = commands.add_parser('compare')
+    parser_compare.add_argument('baseline')
+    parser_compare.add_argument('results')
+    parser_compare.add_argument('--threshold', type=float, default=.1, help='relative slowdown (or growth) flagged as a regression')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    elif compare(args):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
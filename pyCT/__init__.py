@@ -1,41 +1,24 @@
 from __future__ import division, absolute_import, print_function
-import os, sys, glob, subprocess
-if hasattr(os, "add_dll_directory"):
-    # Add all the DLL directories manually
-    # see:
-    # https://docs.python.org/3.8/whatsnew/3.8.html#bpo-36085-whatsnew
-    # https://stackoverflow.com/a/60803169/19344391
-    dll_directory = os.path.dirname(__file__)
-    os.add_dll_directory(dll_directory)
+from importlib import import_module
 
-    # The user must install the CUDA Toolkit
-    cuda_bin = os.path.join(os.environ["CUDA_PATH"], "bin")
-    os.add_dll_directory(cuda_bin)
-
-
-from pyCT.forward import project
+from pyCT.forward import project, project_iter
 from pyCT.backward import reconstruct
 from pyCT.parameter import getParameters
-from pyCT.phantom import getPhantom
+from pyCT.phantom import getPhantom, getRandomPhantoms, getEllipsoids, projectPhantom
 from pyCT.transformation import getTransformation
-from pyCT import geometry
+from pyCT.cache import clearCache, setCacheSize
+from pyCT.projector import Projector
+from pyCT.dataset import createDataset, loadParameters, openVolume, openSinogram, saveMatrix, loadMatrix
+from pyCT.matrix import getMatrix
+from pyCT.subset import getSubsets
+from pyCT.profiler import profile, addProfileHook, removeProfileHook
+from pyCT import backend, iterative
 
 
-IS_WINDOWS = sys.platform == "win32"
-CUDA = os.environ.get("CUDA_HOME") or os.environ.get("CUDA_PATH")
-if CUDA is None:
-    try:
-        which = "where" if IS_WINDOWS else "which"
-        nvcc = subprocess.check_output([which, "nvcc"]).decode().rstrip("\r\n")
-        CUDA = os.path.dirname(os.path.dirname(nvcc))
-    except subprocess.CalledProcessError:
-        if IS_WINDOWS:
-            cuda_homes = glob.glob("C:/Program Files/NVIDIA GPU Computing Toolkit/CUDA/v*.*")
-            if len(cuda_homes) == 0:
-                CUDA = ""
-            else:
-                CUDA = cuda_homes[0]
-        else:
-            CUDA = "/usr/local/cuda"
-        if not os.path.exists(CUDA):
-            CUDA = None
\ No newline at end of file
+def __getattr__(name):
+    # resolved on first access to keep `import pyCT` cheap
+    if name == 'CUDA':
+        return backend.getCUDA()
+    elif name == 'geometry':
+        return import_module('pyCT.geometry')
+    raise AttributeError("module 'pyCT' has no attribute '{}'".format(name))
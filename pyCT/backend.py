@@ -0,0 +1,113 @@
+import os, sys, glob, subprocess
+from functools import lru_cache
+from importlib import import_module
+from importlib.util import find_spec
+
+IS_WINDOWS = sys.platform == "win32"
+
+# name : (forward module, backward module)
+BACKENDS = {
+    'cuda' : ('projectionGPU', 'reconstructionGPU'),
+    'jit'  : ('pyCT.forward.projectionJIT', 'pyCT.backward.reconstructionJIT'),
+    'cpu'  : ('pyCT.forward.projectionCPU', 'pyCT.backward.reconstructionCPU'),
+}
+
+# name : modules that must be importable
+REQUIREMENTS = {
+    'cuda' : ['projectionGPU', 'reconstructionGPU'],
+    'jit'  : ['numba'],
+    'cpu'  : [],
+}
+
+
+def select(cuda=None, jit=None) -> str:
+    '''
+    Pick a backend: CUDA, then JIT, then CPU.
+    cuda, jit : None (auto), True (request), False (disable)
+    '''
+    is_cuda = isAvailable('cuda')
+    if cuda is not None:
+        if is_cuda:
+            if not cuda:
+                is_cuda = False
+        else:
+            if cuda:
+                print('CUDA is not available ...')
+    if is_cuda:
+        return 'cuda'
+
+    is_jit = isAvailable('jit')
+    if jit is not None:
+        if is_jit:
+            if not jit:
+                is_jit = False
+        else:
+            if jit:
+                print('Numba is not available ...')
+    if is_jit:
+        return 'jit'
+    return 'cpu'
+
+
+@lru_cache(maxsize=None)
+def isAvailable(name:str) -> bool:
+    '''
+    Check that a backend can be imported without importing it.
+    The result is cached per process.
+    '''
+    try:
+        return all(find_spec(module) is not None for module in REQUIREMENTS[name])
+    except (ImportError, ValueError):
+        return False
+
+
+@lru_cache(maxsize=None)
+def getModule(name:str, direction:str):
+    '''
+    Import a backend module on first use.
+    direction : forward, backward
+    '''
+    if name == 'cuda':
+        _addDllDirectory()
+    return import_module(BACKENDS[name][0 if direction == 'forward' else 1])
+
+
+@lru_cache(maxsize=None)
+def getCUDA():
+    '''
+    Locate the CUDA toolkit (None if not found).
+    '''
+    cuda = os.environ.get("CUDA_HOME") or os.environ.get("CUDA_PATH")
+    if cuda is None:
+        try:
+            which = "where" if IS_WINDOWS else "which"
+            nvcc = subprocess.check_output([which, "nvcc"], stderr=subprocess.DEVNULL).decode().rstrip("\r\n")
+            cuda = os.path.dirname(os.path.dirname(nvcc))
+        except (subprocess.CalledProcessError, OSError):
+            if IS_WINDOWS:
+                cuda_homes = glob.glob("C:/Program Files/NVIDIA GPU Computing Toolkit/CUDA/v*.*")
+                if len(cuda_homes) == 0:
+                    cuda = ""
+                else:
+                    cuda = cuda_homes[0]
+            else:
+                cuda = "/usr/local/cuda"
+            if not os.path.exists(cuda):
+                cuda = None
+    return cuda
+
+
+@lru_cache(maxsize=None)
+def _addDllDirectory():
+    if hasattr(os, "add_dll_directory"):
+        # Add all the DLL directories manually
+        # see:
+        # https://docs.python.org/3.8/whatsnew/3.8.html#bpo-36085-whatsnew
+        # https://stackoverflow.com/a/60803169/19344391
+        dll_directory = os.path.dirname(__file__)
+        os.add_dll_directory(dll_directory)
+
+        # The user must install the CUDA Toolkit
+        cuda = getCUDA()
+        if cuda is not None:
+            os.add_dll_directory(os.path.join(cuda, "bin"))
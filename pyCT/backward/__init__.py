@@ -1,25 +1,33 @@
 import pyCT
+from pyCT import backend, parallel
 from pyCT.parameter import _Parameters
+from pyCT.buffer import asFloat32, getOutput
+from pyCT.cache import getCached
+from pyCT.profiler import getReport, getStage, finishReport, getCopiedBytes
+from functools import lru_cache
+from itertools import chain
+from importlib import import_module
 from .reconstructionCPU import *
-from reconstructionGPU import reconstructParallelBeamGPU, reconstructConeBeamGPU
-from copy import deepcopy
+from .reconstructionCPU import _isSliceWise
+from .reconstructionFourier import reconstructParallelBeamFourier
 
 def reconstruct(sinogram_array : np.ndarray,
                 parameters : _Parameters,
                 filter : str = 'ramp',
                 **kwargs):
     '''
-    key : cuda, offset
+    sinogram_array : [na, nv, nu], a batch of sinograms [B, na, nv, nu] backprojected together,
+                     or an iterable of (view indices, [n, nv, nu] or [B, n, nv, nu]) chunks as yielded by project_iter
+    key : cuda, jit, offset, cosine, parker, slab_size, views_per_chunk, workers, executor, out,
+          views (indices or slice of the views in sinogram_array, all by default),
+          matrix (system matrix from getMatrix, or True for the cached one, backprojects with its transpose, filter=None only),
+          ray_step (of the cached system matrix),
+          method ('backprojection', or 'fourier' for direct Fourier reconstruction by gridding, on CPU,
+                  for parallel beam rotating about z with a filter as the density compensation),
+          profile (a callable or a list receiving the per-stage report of the call, see pyCT.profile)
     '''
-    # check CUDA
-    is_cuda = False if pyCT.CUDA is None else True        
-    if 'cuda' in kwargs.keys():
-        if is_cuda:
-            if not kwargs['cuda']:
-                is_cuda = False
-        else:
-            if kwargs['cuda']:
-                print('CUDA is not available ...')
+    # check backend (CUDA, then JIT, then CPU)
+    name = backend.select(kwargs.get('cuda'), kwargs.get('jit'))
     
     # set offset correction
     if 'offset' in kwargs.keys():
@@ -27,80 +35,325 @@ def reconstruct(sinogram_array : np.ndarray,
     else:
         is_offsetCorrection = False
 
+    # set FDK weighting, cosine pre-weights and distance-weighted backprojection (on by default for filtered cone beam)
+    if 'cosine' in kwargs.keys():
+        is_cosineWeighting = kwargs['cosine']
+    else:
+        is_cosineWeighting = bool(parameters.mode) and filter is not None and filter.lower() != 'none'
+
+    # set Parker short-scan weighting
+    if 'parker' in kwargs.keys():
+        is_parkerWeighting = kwargs['parker']
+    else:
+        is_parkerWeighting = False
+
+    # set the number of voxels processed at once on CPU
+    if 'slab_size' in kwargs.keys():
+        slab_size = kwargs['slab_size']
+    else:
+        slab_size = 2**20
+
+    # set the number of views filtered at once (all unless memory-mapped)
+    if 'views_per_chunk' in kwargs.keys():
+        views_per_chunk = kwargs['views_per_chunk']
+    elif isinstance(sinogram_array, np.memmap):
+        views_per_chunk = 16
+    else:
+        views_per_chunk = None
+
+    # set the number of CPU threads
+    if 'workers' in kwargs.keys():
+        workers = kwargs['workers']
+    else:
+        workers = None
+
+    # set the CPU worker pool, threads or forked processes (see pyCT.parallel)
+    if 'executor' in kwargs.keys():
+        executor = parallel.checkExecutor(kwargs['executor'])
+    else:
+        executor = 'thread'
+
+    # set system matrix (replaces the backprojectors)
+    if 'matrix' in kwargs.keys():
+        system_matrix = kwargs['matrix']
+    else:
+        system_matrix = None
+
+    # set reconstruction method
+    if 'method' in kwargs.keys():
+        method = kwargs['method']
+    else:
+        method = 'backprojection'
+
     # check filter
     if filter is not None and filter.lower() not in ['none', 'ramp', 'ram-lak', 'shepp-logan', 'cosine', 'hamming', 'hann']:
         raise ValueError('{} was not supported in pyCT'.format(filter) + '\nWe support the following filters: ramp or ram-lak, shepp-logan, cosine, hamming, hann')
 
+    # check system matrix, A^T has neither the FBP scale nor the FDK distance weight of the backprojectors
+    if system_matrix is not None and filter is not None and filter.lower() != 'none':
+        raise ValueError("matrix backprojects with A^T, which is only supported with filter=None.")
+
+    # check method
+    if method not in ['backprojection', 'fourier']:
+        raise ValueError("{} was not supported in pyCT\nWe support the following methods: backprojection, fourier".format(method))
+    if method == 'fourier':
+        if system_matrix is not None:
+            raise ValueError("method='fourier' does not use a system matrix.")
+        if filter is None or filter.lower() == 'none':
+            raise ValueError("method='fourier' requires a filter, its response is the density compensation.")
+
+    # set profiling (None unless a report is collected)
+    report = getReport('reconstruct', kwargs.get('profile'), backend='matrix' if system_matrix is not None else method if method == 'fourier' else name, filter=filter, shape=np.shape(sinogram_array) if isinstance(sinogram_array, np.ndarray) else None)
+
     # get parameters
     mode = parameters.mode
     s2d = parameters.source.distance.source2detector
+    s2o = parameters.source.distance.source2origin if is_cosineWeighting else 0
     nx, ny, nz = parameters.object.size.get()
+    dx, dy, _ = parameters.object.spacing.get()
     du, dv = parameters.detector.spacing.get()
     su, sv = parameters.detector.length.get()
     nu, nv = parameters.detector.size.get()
-    na = len(parameters.source.motion.rotation.get()[0])
 
     # get transformation
-    transformation = pyCT.getTransformation(parameters, 1, 0, s2d)
-    transformationMatrix = transformation.getBackward()
+    with getStage(report, 'transformation'):
+        transformation = pyCT.getTransformation(parameters, 1, 0, s2d)
+        transformationMatrix = transformation.getBackward()
+        offset = transformation.getOffset()
+    if method == 'fourier' and (mode or not _isSliceWise(transformationMatrix)):
+        raise ValueError("method='fourier' requires parallel beam with rotations about z only.")
 
-    if is_offsetCorrection:
-        sinogram_array = _applyOffsetCorrection(sinogram_array, parameters)
-    
-    if filter is None or filter.lower() == 'none':
-        pass
+    # get pre-weights, each broadcastable to [na, nv, nu]
+    with getStage(report, 'weights'):
+        weights = _getWeights(parameters, is_offsetCorrection, is_cosineWeighting, is_parkerWeighting)
+
+    # set chunks
+    if 'views' in kwargs.keys():
+        chunks = [(kwargs['views'], sinogram_array)]
+    elif isinstance(sinogram_array, np.ndarray):
+        step = sinogram_array.shape[-3] if views_per_chunk is None else views_per_chunk
+        chunks = ((slice(a0, a0+step), sinogram_array[..., a0:a0+step, :, :]) for a0 in range(0, sinogram_array.shape[-3], step))
     else:
-        sinogram_array = _applyFilter(sinogram_array, parameters, filter)
-
-    if is_cuda:
-        reconstruction_array = np.zeros(nz*ny*nx, dtype=np.float32)
-        sinogram_array = sinogram_array.flatten().astype(np.float32)
-        transformationMatrix = transformationMatrix.flatten().astype(np.float32)
-        if mode:
-            ou, ov = parameters.detector.motion.translation.get(axis=0).astype(np.float32)
-            oa = parameters.detector.motion.rotation.get().astype(np.float32)
-            if (len(ou) == 1) and (len(ov) == 1):
-                ou, ov = np.repeat(ou, na), np.repeat(ov, na)
-            if len(oa) == 1:
-                oa = np.repeat(oa, na)
-            reconstruction_array = deepcopy(reconstructConeBeamGPU(reconstruction_array, sinogram_array, transformationMatrix, nx, ny, nz, nu, nv, na, su, sv, du, dv, ou, ov, oa, s2d))
+        chunks = sinogram_array
+
+    # set batch from the first chunk, the engines project each voxel once for all of its sinograms
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    chunks = chain([] if first is None else [first], chunks)
+    shape = (0, nv, nu) if first is None else np.shape(first[1])
+    if len(shape) not in [3, 4]:
+        raise ValueError("sinogram_array must be [na, nv, nu] or a batch [B, na, nv, nu], got shape {}.".format(shape))
+    batch = shape[:-3]
+
+    # set output (float32, accumulated over the chunks)
+    with getStage(report, 'output') as stage:
+        reconstruction_array = getOutput(kwargs.get('out'), batch + (nz, ny, nx))
+        stage.add(bytes=reconstruction_array.nbytes if kwargs.get('out') is None else 0)
+
+    if system_matrix is not None:
+        from pyCT.matrix import getMatrix, _getViews, _checkMatrix
+        if system_matrix is True:
+            with getStage(report, 'matrix'):
+                system_matrix = getMatrix(parameters, kwargs['ray_step'] if 'ray_step' in kwargs.keys() else .5)
+        _checkMatrix(system_matrix, len(transformationMatrix), nv, nu, nx, ny, nz)
+
+    buffer = None
+    for i, (views, chunk) in enumerate(chunks):
+        weight = [w if len(w) == 1 else w[views] for w in weights]
+        if filter is None or filter.lower() == 'none' or method == 'fourier':
+            if weight:
+                with getStage(report, 'weighting', np.size(chunk)) as stage:
+                    chunk = _applyWeights(chunk, weight)
+                    stage.add(bytes=chunk.nbytes)
         else:
-            reconstruction_array = deepcopy(reconstructParallelBeamGPU(reconstruction_array, sinogram_array, transformationMatrix, nx, ny, nz, nu, nv, na))
-        reconstruction_array = reconstruction_array.reshape(nz, ny, nx)
-    else:
-        reconstruction_array = np.zeros([nz, ny, nx])
-        if mode:
-            reconstructConeBeamCPU(reconstruction_array, sinogram_array, transformationMatrix, nx, ny, nz, nu, nv, na, su, sv, du, dv, ou, ov, oa, s2d)
+            with getStage(report, 'filter', np.size(chunk)) as stage:
+                chunk = _applyFilter(chunk, parameters, filter, workers, weight)
+                stage.add(bytes=chunk.nbytes)
+
+        matrix = transformationMatrix[views]
+        ou, ov, oa = (o[views] for o in offset)
+        n = len(matrix)
+        # every voxel is updated once per view and sinogram
+        updates = reconstruction_array.size * n
+
+        if method == 'fourier':
+            with getStage(report, 'kernel', updates):
+                reconstructParallelBeamFourier(reconstruction_array, chunk, transformationMatrix, views, _getDensity(parameters, filter), dx, dy, (parameters.fingerprint(), 'fourier', filter.lower()), slab_size, workers)
+        elif system_matrix is not None:
+            with getStage(report, 'cast') as stage:
+                rows = asFloat32(chunk)
+                stage.add(rows.size, getCopiedBytes(rows, chunk))
+            with getStage(report, 'kernel', updates):
+                rows = rows.reshape(-1, n*nv*nu).T
+                reconstruction_array += (_getViews(system_matrix, views, len(transformationMatrix)).T @ rows).T.reshape(reconstruction_array.shape)
+        elif name == 'cuda':
+            # the CUDA kernels overwrite their output, later chunks go through a buffer
+            if i == 0:
+                output = reconstruction_array
+            else:
+                if buffer is None:
+                    buffer = np.empty_like(reconstruction_array)
+                output = buffer
+            gpu = backend.getModule('cuda', 'backward')
+            # the plans take C-contiguous float32 arrays, views of a stepped slice are not
+            matrix = matrix.astype(np.float32).reshape(-1)
+            ou, ov, oa = (np.ascontiguousarray(o) for o in (ou, ov, oa))
+            with getStage(report, 'cast') as stage:
+                sinograms = asFloat32(chunk)
+                stage.add(sinograms.size, getCopiedBytes(sinograms, chunk))
+            # one texture per sinogram, the batch runs one after the other
+            with getStage(report, 'kernel', updates):
+                for volume, sinogram in zip(output.reshape(-1, nx*ny*nz), sinograms.reshape(-1, n*nv*nu)):
+                    if mode:
+                        gpu.reconstructConeBeamGPU(volume, sinogram, matrix, nx, ny, nz, nu, nv, n, su, sv, du, dv, ou, ov, oa, s2d, s2o)
+                    else:
+                        gpu.reconstructParallelBeamGPU(volume, sinogram, matrix, nx, ny, nz, nu, nv, n)
+                if output is buffer:
+                    reconstruction_array += buffer
+        elif name == 'jit':
+            jit = backend.getModule('jit', 'backward')
+            with getStage(report, 'kernel', updates):
+                if mode:
+                    jit.reconstructConeBeamJIT(reconstruction_array, chunk, matrix, nx, ny, nz, nu, nv, n, su, sv, du, dv, ou, ov, oa, s2d, workers, s2o)
+                else:
+                    jit.reconstructParallelBeamJIT(reconstruction_array, chunk, matrix, nx, ny, nz, nu, nv, n, workers)
         else:
-            reconstructParallelBeamCPU(reconstruction_array, sinogram_array, transformationMatrix, nx, ny, nz, nu, nv, na)
-    
+            with getStage(report, 'kernel', updates):
+                if mode:
+                    reconstructConeBeamCPU(reconstruction_array, chunk, matrix, nx, ny, nz, nu, nv, n, su, sv, du, dv, ou, ov, oa, s2d, slab_size, workers or 1, s2o, executor)
+                else:
+                    reconstructParallelBeamCPU(reconstruction_array, chunk, matrix, nx, ny, nz, nu, nv, n, slab_size, workers or 1, executor)
+
+    finishReport(report)
     return reconstruction_array
 
 
-def _applyOffsetCorrection(sinogram_array : np.ndarray, 
-                           parameters : _Parameters):
-    weight = np.ones(sinogram_array.shape)
+def _getWeights(parameters : _Parameters,
+                offset : bool,
+                cosine : bool,
+                parker : bool):
+    '''
+    Pre-weights of the enabled stages, cached per geometry.
+    Each is float32 and broadcastable to [na, nv, nu], e.g. [1, 1, nu], [1, nv, nu] or [na, 1, nu].
+    '''
+    fp = parameters.fingerprint()
+    stages = [(offset, 'offset', _computeOffsetWeight), (cosine, 'cosine', _computeCosineWeight), (parker, 'parker', _computeParkerWeight)]
+    weights = [getCached((fp, 'weight', stage), lambda: func(parameters)) for is_stage, stage, func in stages if is_stage]
+    return [weight for weight in weights if weight is not None]
+
+
+def _applyWeights(sinogram_array : np.ndarray,
+                  weights : list):
+    output = np.array(sinogram_array, dtype=np.float32)
+    for weight in weights:
+        output *= weight
+    return output
+
+
+def _computeOffsetWeight(parameters : _Parameters):
+    '''
+    Redundancy weight of a laterally shifted detector, [1, 1, nu] (None without a shift).
+    '''
     ou, _ = parameters.detector.motion.translation.get().T
     oa = parameters.detector.motion.rotation.get()
     if np.any(ou-ou[0]) or np.any(oa):
-        raise ValueError()
+        raise ValueError("Offset correction requires a fixed, unrotated detector offset.")
     else:
         ou = ou[0]
-    gap = int((parameters.detector.length.u/2 - ou) / parameters.detector.spacing.u)
+    nu = parameters.detector.size.u
+    # columns seen from one side only, mirrored for negative offsets
+    gap = int((parameters.detector.length.u/2 - abs(ou)) / parameters.detector.spacing.u)
     if ou != 0 and gap > 0:
+        weight = np.ones(nu)
         if ou > 0:
             f = (1+np.cos(np.linspace(-np.pi, 0, gap*2))) / 2
-            weight[:,:,:2*gap] = f
+            weight[:2*gap] = f
         elif ou < 0:
             f =  (1+np.cos(np.linspace(0, np.pi, gap*2))) / 2
-            weight[:,:,-2*gap:] = f
-        return 2 * weight * sinogram_array
+            weight[-2*gap:] = f
+        return _readOnly(2 * weight[None, None])
     else:
-        return sinogram_array
+        return None
+
+
+def _computeCosineWeight(parameters : _Parameters):
+    '''
+    FDK pre-weight, the cosine of the angle between each ray and the central ray.
+    [1, nv, nu], or [na, nv, nu] if the detector moves between views.
+    '''
+    if not parameters.mode:
+        raise ValueError("Cosine weighting is only defined for cone beam.")
+    s2d = parameters.source.distance.source2detector
+    du, dv = parameters.detector.spacing.get()
+    su, sv = parameters.detector.length.get()
+    nu, nv = parameters.detector.size.get()
+    ou, ov, oa = pyCT.getTransformation(parameters, 1, 0, s2d).getOffset()
+    if not (np.any(ou-ou[0]) or np.any(ov-ov[0]) or np.any(oa-oa[0])):
+        ou, ov, oa = ou[:1], ov[:1], oa[:1]
+    # detector pixel centers in the source frame, as the cone beam projectors
+    U, V = np.meshgrid(np.linspace(-su/2+du/2, su/2-du/2, nu), np.linspace(-sv/2+dv/2, sv/2-dv/2, nv))
+    cos, sin = np.cos(oa)[:, None, None], np.sin(oa)[:, None, None]
+    U, V = U*cos + V*sin + ou[:, None, None], -U*sin + V*cos + ov[:, None, None]
+    return _readOnly(s2d / np.sqrt(U**2 + V**2 + s2d**2))
+
+
+def _computeParkerWeight(parameters : _Parameters):
+    '''
+    Parker weight of a short scan about one axis, [na, 1, nu] (None for a full scan).
+    Normalized so that the global scale of a full scan stays valid.
+    '''
+    if not parameters.mode:
+        raise ValueError("Parker weighting is only defined for cone beam.")
+    angles, axes = parameters.source.motion.rotation.get()
+    if len(axes) != 1:
+        raise ValueError("Parker weighting requires a rotation about a single axis.")
+    s2d = parameters.source.distance.source2detector
+    du = parameters.detector.spacing.u
+    su = parameters.detector.length.u
+    nu = parameters.detector.size.u
+    na = len(angles)
+    ou, _, _ = pyCT.getTransformation(parameters, 1, 0, s2d).getOffset()
+
+    beta = angles[:, 0]
+    step = (beta[-1] - beta[0]) / max(1, na-1)
+    scan = abs(step) * na
+    if scan >= 2*np.pi - abs(step)/2:
+        return None
+    beta = (beta - beta[0]) * np.sign(step)
+    # fan angle of each column, with the sign that follows the rotation
+    gamma = -np.sign(step) * np.arctan((np.linspace(-su/2+du/2, su/2-du/2, nu) + ou[:, None]) / s2d)
+    delta = (scan - np.pi) / 2
+    if delta < np.abs(gamma).max():
+        raise ValueError("The scan range ({:.1f} deg) is shorter than 180 deg plus the fan angle.".format(np.degrees(scan)))
+
+    b = beta[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rise = np.sin(np.pi/4 * b / (delta - gamma)) ** 2
+        fall = np.sin(np.pi/4 * (np.pi + 2*delta - b) / (delta + gamma)) ** 2
+    weight = np.where(b < 2*(delta - gamma), rise, np.where(b > np.pi - 2*gamma, fall, 1.))
+    return _readOnly(weight[:, None] * scan / np.pi)
+
+
+def _readOnly(weight):
+    weight = weight.astype(np.float32)
+    weight.flags.writeable = False
+    return weight
+
 
 def _applyFilter(sinogram_array : np.ndarray, 
                  parameters : _Parameters, 
-                 filter : str):
+                 filter : str,
+                 workers : int = None,
+                 weights : list = []):
+    '''
+    Weight and filter the rows of the sinogram with the cached frequency response, a block of views at a time.
+    weights : broadcastable to sinogram_array
+    ->
+    output  : filtered sinogram, float32 [na', nv, nu], or [B, na', nv, nu]
+    '''
+    sinogram_array = np.asarray(sinogram_array)
+    if sinogram_array.ndim == 4:
+        return np.array([_applyFilter(sinogram, parameters, filter, workers, weights) for sinogram in sinogram_array])
     na = len(parameters.source.motion.rotation.get()[0])
     nu = parameters.detector.size.u
     du = parameters.detector.spacing.u
@@ -110,13 +363,68 @@ def _applyFilter(sinogram_array : np.ndarray,
     extended_size = max(64, int(2 ** np.ceil(np.log2(2 * nu))))
     pad = (extended_size - nu) // 2
 
+    if parameters.mode:
+        weight = np.pi / na / 2 / du / s2o * s2d
+    else:
+        weight = np.pi / na / 2 / du
+    fourier_filter = (_getFilter(filter, extended_size) * weight).astype(np.float32)
+
+    sinogram_array = np.asarray(sinogram_array)
+    n, nv = sinogram_array.shape[:2]
+    output = np.empty([n, nv, nu], dtype=np.float32)
+    block = max(1, 2**20 // (nv*extended_size))
+    padded = np.zeros([min(block, n), nv, extended_size], dtype=np.float32)
+    fft = _getFFT()
+    for a0 in range(0, n, block):
+        a1 = min(a0+block, n)
+        # the zero padding of the buffer is never written, only the detector columns are refreshed
+        rows = padded[:a1-a0, :, pad:pad+nu]
+        rows[...] = sinogram_array[a0:a1]
+        for w in weights:
+            rows *= w if len(w) == 1 else w[a0:a1]
+        if fft is None:
+            fourier_proj = np.fft.rfft(padded[:a1-a0], axis=-1)
+            fourier_proj *= fourier_filter
+            output[a0:a1] = np.fft.irfft(fourier_proj, n=extended_size, axis=-1)[..., pad:pad+nu]
+        else:
+            fourier_proj = fft.rfft(padded[:a1-a0], axis=-1, workers=workers)
+            fourier_proj *= fourier_filter
+            output[a0:a1] = fft.irfft(fourier_proj, n=extended_size, axis=-1, overwrite_x=True, workers=workers)[..., pad:pad+nu]
+    return output
+
+
+def _getDensity(parameters : _Parameters,
+                filter : str):
+    '''
+    Density compensation of the Fourier samples on the rfft grid of the padded rows, the filter response
+    with the parallel beam weight of _applyFilter but per detector pixel (the gridding scales it by the view).
+    ->
+    output : [extended_size//2 + 1]
+    '''
+    na = len(parameters.source.motion.rotation.get()[0])
+    nu = parameters.detector.size.u
+    extended_size = max(64, int(2 ** np.ceil(np.log2(2 * nu))))
+    return _getFilter(filter, extended_size) * (np.pi / na / 2)
+
+
+def _getFilter(filter : str, 
+               extended_size : int):
+    '''
+    Frequency response of the filter on the rfft grid, cached per (filter, padded size).
+    ->
+    output : [extended_size//2 + 1]
+    '''
+    return getCached(('filter', filter.lower(), extended_size), lambda: _computeFilter(filter, extended_size))
+
+
+def _computeFilter(filter : str, 
+                   extended_size : int):
     n = np.concatenate((np.arange(1, extended_size/2 + 1, 2, dtype=np.uint32),
                             np.arange(extended_size/2 - 1, 0, -2, dtype=np.uint32)))
     f = np.zeros(extended_size)
     f[0] = 0.25
     f[1::2] = -1 / (np.pi * n) ** 2
     fourier_filter = 2 * np.real(np.fft.fft(f))
-    fourier_proj = np.fft.fft(np.pad(sinogram_array, [(0,0),(0,0),(pad,pad)]), axis=-1)
 
     if filter.lower() == 'ramp' or filter.lower()=='ram-lak':
         pass
@@ -132,9 +440,17 @@ def _applyFilter(sinogram_array : np.ndarray,
     elif filter.lower() == 'hann':
         fourier_filter *= np.fft.fftshift(np.hanning(extended_size))
 
-    sinogram_array = np.fft.ifft(fourier_proj*fourier_filter, axis=-1).real
-    if parameters.mode:
-        weight = np.pi / na / 2 / du / s2o * s2d
-    else:
-        weight = np.pi / na / 2 / du
-    return sinogram_array[..., pad : -pad] * weight
\ No newline at end of file
+    # only the even part acts on real rows (the shifted windows are not exactly even), and its rfft half carries all of it
+    fourier_filter = (fourier_filter + np.roll(fourier_filter[::-1], 1)) / 2
+    fourier_filter = fourier_filter[:extended_size//2 + 1]
+    fourier_filter.flags.writeable = False
+    return fourier_filter
+
+
+@lru_cache(maxsize=None)
+def _getFFT():
+    # scipy.fft runs on several threads, numpy.fft is the fallback
+    try:
+        return import_module('scipy.fft')
+    except ImportError:
+        return None
@@ -1,44 +1,127 @@
 import numpy as np
+from pyCT import parallel
 
-def reconstructParallelBeamCPU(reconstruction_array, sinogram_array, transformation, nx, ny, nz, nu, nv, na):
-    pad = 1
-    sinogram_array = np.pad(sinogram_array, [(0,0),(pad,pad),(pad,pad)])
-    nu += (2*pad -1)
-    nv += (2*pad -1)
-    for a in range(na):
-        matrix = transformation[a]
-        for x in range(nx):
-            for y in range(ny):
-                for z in range(nz):
-                    u, v, _, _ = matrix @ [x,y,z,1] + pad
-                    if 0 < u < nu and 0 < v < nv:
-                        u0, v0 = int(u), int(v)
-                        u1, v1 = u0 + 1, v0 + 1
-                        interp = (v1-v) * ((u1-u)*sinogram_array[a,v0,u0]+(u-u0)*sinogram_array[a,v0,u1]) + (v-v0) * ((u1-u)*sinogram_array[a,v1,u0]+(u-u0)*sinogram_array[a,v1,u1])
-                        reconstruction_array[z,y,x] += interp
-
-
-def reconstructConeBeamCPU(reconstruction_array, sinogram_array, transformation, nx, ny, nz, nu, nv, na, su, sv, du, dv, ou, ov, oa, s2d):
-    pad = 1
-    sinogram_array = np.pad(sinogram_array, [(0,0),(pad,pad),(pad,pad)])
-    nu += (2*pad -1)
-    nv += (2*pad -1)
+def reconstructParallelBeamCPU(reconstruction_array, sinogram_array, transformation, nx, ny, nz, nu, nv, na, slab_size=2**20, workers=1, executor='thread'):
+    if _isSliceWise(transformation):
+        _reconstructSlices(reconstruction_array, sinogram_array, transformation, nx, ny, nz, slab_size, workers, executor)
+        return
+    x, y = np.arange(nx), np.arange(ny)[:, None]
+    def run(volume, views):
+        for z0, z1 in parallel.getSlabs(nx, ny, nz, slab_size):
+            z = np.arange(z0, z1)[:, None, None]
+            slab = volume[..., z0:z1, :, :]
+            for a in views:
+                t = transformation[a]
+                # all voxel centers of the slab at once
+                u = t[0,0]*x + t[0,1]*y + t[0,2]*z + t[0,3]
+                v = t[1,0]*x + t[1,1]*y + t[1,2]*z + t[1,3]
+                _backproject(slab, sinogram_array[..., a, :, :], u, v)
+    _run(run, reconstruction_array, na, workers, executor)
+
+
+def reconstructConeBeamCPU(reconstruction_array, sinogram_array, transformation, nx, ny, nz, nu, nv, na, su, sv, du, dv, ou, ov, oa, s2d, slab_size=2**20, workers=1, s2o=0, executor='thread'):
     if len(ou) == 1:
         ou = np.repeat(ou, na)
     if len(ov) == 1:
         ov = np.repeat(ov, na)
     if len(oa) == 1:
         oa = np.repeat(oa, na)
-    for a in range(na):
-        matrix = transformation[a]
-        offmat = [[np.cos(oa[a]), np.sin(oa[a])],[-np.sin(oa[a]), np.cos(oa[a])]]
-        for x in range(nx):
-            for y in range(ny):
-                for z in range(nz):
-                    u, v, w, _ = matrix @ [x,y,z,1]
-                    u, v = ([u, v] @ offmat / w * -s2d - [ou[a], ov[a]]) / [du, dv] + pad
-                    if 0 < u < nu and 0 < v < nv:
-                        u0, v0 = int(u), int(v)
-                        u1, v1 = u0 + 1, v0 + 1
-                        interp = (v1-v) * ((u1-u)*sinogram_array[a,v0,u0]+(u-u0)*sinogram_array[a,v0,u1]) + (v-v0) * ((u1-u)*sinogram_array[a,v1,u0]+(u-u0)*sinogram_array[a,v1,u1])
-                        reconstruction_array[z,y,x] += interp
\ No newline at end of file
+    x, y = np.arange(nx), np.arange(ny)[:, None]
+    def run(volume, views):
+        for z0, z1 in parallel.getSlabs(nx, ny, nz, slab_size):
+            z = np.arange(z0, z1)[:, None, None]
+            slab = volume[..., z0:z1, :, :]
+            for a in views:
+                t = transformation[a]
+                u = t[0,0]*x + t[0,1]*y + t[0,2]*z + t[0,3]
+                v = t[1,0]*x + t[1,1]*y + t[1,2]*z + t[1,3]
+                w = t[2,0]*x + t[2,1]*y + t[2,2]*z + t[2,3]
+                # detector rotation, perspective divide and detector offset
+                cos, sin = np.cos(oa[a]), np.sin(oa[a])
+                u, v = cos*u - sin*v, sin*u + cos*v
+                u = (u / w * -s2d + su/2 - ou[a]) / du - .5
+                v = (v / w * -s2d + sv/2 - ov[a]) / dv - .5
+                # FDK distance weight when s2o > 0
+                _backproject(slab, sinogram_array[..., a, :, :], u, v, (s2o/w)**2 if s2o > 0 else None)
+    _run(run, reconstruction_array, na, workers, executor)
+
+
+def _isSliceWise(transformation, tolerance=1e-9):
+    '''
+    True if u depends on (x, y) only and v on z only in every view (parallel beam, rotation about z),
+    so that detector row v maps to volume slice z.
+    '''
+    return bool(np.all(np.abs(transformation[:, 0, 2]) < tolerance) and np.all(np.abs(transformation[:, 1, :2]) < tolerance))
+
+
+def _reconstructSlices(reconstruction_array, sinogram_array, transformation, nx, ny, nz, slab_size, workers, executor):
+    '''
+    2D backprojection of every slice, the u table of a view is computed once and shared by all slices.
+    The workers own disjoint groups of slices, so they write to reconstruction_array directly.
+    '''
+    pad = 1
+    x, y = np.arange(nx), np.arange(ny)[:, None]
+    shape = sinogram_array.shape[-2:]
+    sinograms = sinogram_array.reshape((-1,) + sinogram_array.shape[-3:])
+    def run(output, slab):
+        z0, z1 = slab
+        volumes = output.reshape((-1, nz, ny*nx))
+        z = np.arange(z0, z1)
+        for a, t in enumerate(transformation):
+            # v of the slices, only those that see the detector (a range, v is linear in z)
+            v = t[1,2]*z + t[1,3] + pad
+            inside = np.nonzero((0 < v) & (v < shape[0]+1))[0]
+            if len(inside) == 0:
+                continue
+            s0, s1 = inside[0], inside[-1] + 1
+            v0 = v[s0:s1].astype(np.intp)
+            fv = (v[s0:s1] - v0).astype(np.float32)[:, None]
+            # u of the pixels of a slice, clipped into the zero border so that every pixel is gathered
+            u = np.clip((t[0,0]*x + t[0,1]*y + t[0,3]).ravel() + pad, 0, shape[1]+1)
+            u0 = np.minimum(u.astype(np.intp), shape[1])
+            fu = (u - u0).astype(np.float32)
+            gu = 1 - fu
+            for volume, sinogram in zip(volumes, sinograms):
+                view = np.pad(sinogram[a], pad)
+                # the detector row of each slice, interpolated in v once for all its pixels
+                rows = (1-fv) * view[v0] + fv * view[v0+1]
+                volume[z0+s0:z0+s1] += gu * rows[:, u0] + fu * rows[:, u0+1]
+    # at least one group of slices per worker
+    parallel.run(run, reconstruction_array, parallel.getSlabs(nx, ny, nz, min(slab_size, nx*ny*-(-nz // workers))), workers, executor)
+
+
+def _run(func, reconstruction_array, na, workers, executor):
+    '''
+    Each worker backprojects its own group of views into a private partial volume.
+    The partial volumes are reduced into reconstruction_array.
+    '''
+    parallel.runPartial(func, reconstruction_array, np.array_split(np.arange(na), max(1, min(workers, na))), workers, executor)
+
+
+def _backproject(slab, view, u, v, weight=None):
+    '''
+    slab   : volume slab [nz', ny, nx], or the slabs of a batch [B, nz', ny, nx]
+    view   : one projection [nv, nu], or [B, nv, nu]
+    u, v   : detector coordinates of the slab voxels [nz', ny, nx]
+    weight : voxel weights, broadcastable to the slab
+    '''
+    pad = 1
+    shape = slab.shape[-3:]
+    views = np.pad(view, [(0, 0)] * (view.ndim - 2) + [(pad, pad)] * 2).reshape(-1, view.shape[-2]+2*pad, view.shape[-1]+2*pad)
+    nv, nu = views.shape[1:]
+    u, v = np.broadcast_to(u + pad, shape), np.broadcast_to(v + pad, shape)
+    mask = (0 < u) & (u < nu-1) & (0 < v) & (v < nv-1)
+    u, v = u[mask], v[mask]
+    u0, v0 = u.astype(np.intp), v.astype(np.intp)
+    fu, fv = u - u0, v - v0
+    gu, gv = 1-fu, 1-fv
+    idx = v0*nu + u0
+    if weight is not None:
+        weight = np.broadcast_to(weight, shape)[mask]
+    # the detector coordinates and weights are shared by the views of a batch
+    for volume, flat in zip(slab.reshape((-1,) + shape), views.reshape(len(views), -1)):
+        # gather the 4 neighbours from the flattened view
+        interp = gv * (gu*flat[idx] + fu*flat[idx+1]) + fv * (gu*flat[idx+nu] + fu*flat[idx+nu+1])
+        if weight is not None:
+            interp *= weight
+        volume[mask] += interp
@@ -0,0 +1,123 @@
+import numpy as np
+from importlib import import_module
+from pyCT.cache import getCached
+
+# Kaiser-Bessel kernel width [grid cells] and oversampling of the frequency grid
+WIDTH = 6
+OVERSAMPLING = 2
+
+def reconstructParallelBeamFourier(reconstruction_array, sinogram_array, transformation, views, density, dx, dy, key, slab_size=2**20, workers=None):
+    '''
+    Direct Fourier reconstruction of a slice-wise parallel beam geometry (see _isSliceWise), slice by slice:
+    1D FFT of the detector rows, gridding onto an oversampled Cartesian frequency plane with a Kaiser-Bessel kernel,
+    inverse 2D FFT and deapodization.
+    transformation : backward transformation of all the views [na, 4, 4]
+    views          : views of transformation in sinogram_array
+    density        : density compensation on the rfft grid of the padded rows [n//2+1], the FBP filter response
+    key            : cache key of the gridding matrix (geometry and density)
+    '''
+    from pyCT.backward import _getFFT
+    fft = _getFFT()
+    options = {} if fft is None else dict(workers=workers)
+    fft = np.fft if fft is None else fft
+    nz, ny, nx = reconstruction_array.shape[-3:]
+    nv, nu = sinogram_array.shape[-2:]
+    na = len(transformation)
+    n = 2 * (len(density) - 1)
+    gx, gy = OVERSAMPLING * nx, OVERSAMPLING * ny
+    matrix, weights = getCached(key, lambda: _computeGridding(transformation, density, nx, ny, dx, dy))
+
+    # the samples of the views in the chunk
+    columns = np.arange(na * len(density)).reshape(na, -1)[views]
+    matrix = matrix[:, columns.ravel()]
+    weights = weights[views]
+    t = transformation[views]
+
+    # voxel (x, y) is at x - nx//2, y - ny//2 from the center, negative offsets wrap around the grid
+    x, y = np.arange(nx) - nx // 2, np.arange(ny) - ny // 2
+    deapodization = 1 / np.outer(_getKernelTransform(y / gy), _getKernelTransform(x / gx))
+    x, y = x % gx, y % gy
+
+    # v of every slice in every view, rows outside the detector fall on the zero border
+    pad = 1
+    v = np.clip(t[:, 1, 2, None] * np.arange(nz) + t[:, 1, 3, None] + pad, 0, nv + 2*pad - 1)
+    v0 = np.minimum(v.astype(np.intp), nv + pad - 1)
+    fv = (v - v0)[..., None]
+    a = np.arange(len(t))[:, None]
+
+    step = max(1, slab_size // (gx * gy))
+    for volume, sinogram in zip(reconstruction_array.reshape((-1, nz, ny, nx)), sinogram_array.reshape((-1,) + sinogram_array.shape[-3:])):
+        sinogram = np.pad(sinogram, ((0, 0), (pad, pad), (0, 0)))
+        for z0 in range(0, nz, step):
+            z1 = min(z0 + step, nz)
+            # the detector row of each slice and view [na', nz', nu], then its spectrum [na', nz', n//2+1]
+            rows = (1 - fv[:, z0:z1]) * sinogram[a, v0[:, z0:z1]] + fv[:, z0:z1] * sinogram[a, v0[:, z0:z1] + 1]
+            spectra = fft.rfft(rows, n=n, axis=-1, **options)
+            spectra *= weights[:, None]
+            grid = matrix @ spectra.transpose(0, 2, 1).reshape(-1, z1 - z0)
+            image = fft.ifft2(grid.T.reshape(z1 - z0, gy, gx), **options) * (gx * gy)
+            volume[z0:z1] += image[:, y][:, :, x].real * deapodization
+
+
+def _computeGridding(transformation, density, nx, ny, dx, dy):
+    '''
+    Sample k of view a is at frequency k * (t[0,0]/dx, t[0,1]/dy) [cycles/mm], the Fourier slice of the view.
+    ->
+    output : gridding matrix, CSC [gy*gx, na*(n//2+1)] of the kernel weights of the samples on the grid cells
+             weights of the samples [na, n//2+1], density, shift to the center voxel and the doubled negative frequencies
+    '''
+    sparse = import_module('scipy.sparse')
+    na = len(transformation)
+    n = 2 * (len(density) - 1)
+    gx, gy = OVERSAMPLING * nx, OVERSAMPLING * ny
+    k = np.arange(n // 2 + 1) / n
+
+    # P(k) e^{2 pi i k u_c} |g| is the slice of the image spectrum about the center voxel at u_c,
+    # the real part of the image only needs k >= 0, the others are conjugates
+    center = transformation[:, 0, 0] * (nx // 2) + transformation[:, 0, 1] * (ny // 2) + transformation[:, 0, 3]
+    scale = np.hypot(transformation[:, 0, 0] / dx, transformation[:, 0, 1] / dy)
+    double = np.full(len(k), 2.)
+    double[0] = double[-1] = 1
+    weights = np.exp(2j * np.pi * k * center[:, None]) * (scale[:, None] * density * double / n)
+
+    # grid coordinates of the samples, those beyond the Nyquist frequency of the voxels are left out
+    jx = (k * transformation[:, 0, 0, None] * gx).ravel()
+    jy = (k * transformation[:, 0, 1, None] * gy).ravel()
+    sample = np.nonzero((np.abs(jx) < gx / 2) & (np.abs(jy) < gy / 2))[0]
+    jx, jy = jx[sample], jy[sample]
+
+    rows, columns, values = [], [], []
+    offsets = np.arange(-(WIDTH // 2) + 1, WIDTH // 2 + 1)
+    cx, cy = np.floor(jx).astype(np.intp), np.floor(jy).astype(np.intp)
+    wx = [_getKernel(cx + o - jx) for o in offsets]
+    for j, oy in enumerate(offsets):
+        wy = _getKernel(cy + oy - jy)
+        for i, ox in enumerate(offsets):
+            rows.append(((cy + oy) % gy) * gx + (cx + ox) % gx)
+            columns.append(sample)
+            values.append(wy * wx[i])
+    matrix = sparse.csc_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))), shape=(gy * gx, na * len(k)))
+    weights.flags.writeable = False
+    return matrix, weights
+
+
+def _getBeta():
+    # Beatty et al., 2005, for the kernel width and oversampling
+    return np.pi * np.sqrt((WIDTH / OVERSAMPLING * (OVERSAMPLING - .5)) ** 2 - .8)
+
+
+def _getKernel(t):
+    '''
+    Kaiser-Bessel kernel at t grid cells from the sample.
+    '''
+    r = 1 - (2 * t / WIDTH) ** 2
+    return np.where(r > 0, np.i0(_getBeta() * np.sqrt(np.maximum(r, 0))), 0.)
+
+
+def _getKernelTransform(nu):
+    '''
+    Fourier transform of _getKernel at nu cycles per grid cell, |nu| <= 1/2/OVERSAMPLING.
+    '''
+    s = np.sqrt(_getBeta() ** 2 - (np.pi * WIDTH * nu) ** 2)
+    return WIDTH * np.sinh(s) / s
+
@@ -5,14 +5,20 @@ cnp.import_array()
 ctypedef cnp.float32_t DTYPE
 
 cdef extern from "backward.h":
+    ctypedef struct BackwardPlan:
+        pass
     void funcParallelBeam(float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na)
-    void funcConeBeam    (float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, float* ou, float* ov, float* oa, float s2d);
+    void funcConeBeam    (float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, float* ou, float* ov, float* oa, float s2d, float s2o);
+    BackwardPlan* createBackwardPlan(float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float* ou, float* ov, float* oa)
+    void runParallelBeamPlan(BackwardPlan* plan, float* reconstruction_array, float* sinogram_array)
+    void runConeBeamPlan    (BackwardPlan* plan, float* reconstruction_array, float* sinogram_array, float su, float sv, float du, float dv, float s2d, float s2o)
+    void destroyBackwardPlan(BackwardPlan* plan)
 
-def reconstructParallelBeamGPU(cnp.ndarray[DTYPE, ndim=1] reconstruction_array, cnp.ndarray[DTYPE, ndim=1] sinogram_array, cnp.ndarray[DTYPE, ndim=1] transformation, int nx, int ny, int nz, int nu, int nv, int na):
+def reconstructParallelBeamGPU(cnp.ndarray[DTYPE, ndim=1] reconstruction_array, const DTYPE[::1] sinogram_array, const DTYPE[::1] transformation, int nx, int ny, int nz, int nu, int nv, int na):
 
     cdef float* c_reconstruction_array = <float *> reconstruction_array.data
-    cdef float* c_sinogram_array = <float *> sinogram_array.data
-    cdef float* c_transformation = <float *> transformation.data
+    cdef float* c_sinogram_array = <float *> &sinogram_array[0]
+    cdef float* c_transformation = <float *> &transformation[0]
 
     funcParallelBeam(c_reconstruction_array, c_sinogram_array, c_transformation, nx, ny, nz, nu, nv, na)
 
@@ -23,20 +29,60 @@ def reconstructParallelBeamGPU(cnp.ndarray[DTYPE, ndim=1] reconstruction_array,
 
     return new
 
-def reconstructConeBeamGPU(cnp.ndarray[DTYPE, ndim=1] reconstruction_array, cnp.ndarray[DTYPE, ndim=1] sinogram_array, cnp.ndarray[DTYPE, ndim=1] transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, cnp.ndarray[DTYPE, ndim=1] ou, cnp.ndarray[DTYPE, ndim=1] ov, cnp.ndarray[DTYPE, ndim=1] oa, float s2d):
+def reconstructConeBeamGPU(cnp.ndarray[DTYPE, ndim=1] reconstruction_array, const DTYPE[::1] sinogram_array, const DTYPE[::1] transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, const DTYPE[::1] ou, const DTYPE[::1] ov, const DTYPE[::1] oa, float s2d, float s2o=0):
 
     cdef float* c_reconstruction_array = <float *> reconstruction_array.data
-    cdef float* c_sinogram_array = <float *> sinogram_array.data
-    cdef float* c_transformation = <float *> transformation.data
-    cdef float* c_ou = <float *> ou.data
-    cdef float* c_ov = <float *> ov.data
-    cdef float* c_oa = <float *> oa.data
+    cdef float* c_sinogram_array = <float *> &sinogram_array[0]
+    cdef float* c_transformation = <float *> &transformation[0]
+    cdef float* c_ou = <float *> &ou[0]
+    cdef float* c_ov = <float *> &ov[0]
+    cdef float* c_oa = <float *> &oa[0]
 
-    funcConeBeam(c_reconstruction_array, c_sinogram_array, c_transformation, nx, ny, nz, nu, nv, na, su, sv, du, dv, c_ou, c_ov, c_oa, s2d)
+    funcConeBeam(c_reconstruction_array, c_sinogram_array, c_transformation, nx, ny, nz, nu, nv, na, su, sv, du, dv, c_ou, c_ov, c_oa, s2d, s2o)
 
     cdef cnp.npy_intp shape[1]
     shape[0] = <cnp.npy_intp> (nx*ny*nz)
 
     new = cnp.PyArray_SimpleNewFromData(1, shape, cnp.NPY_FLOAT32, c_reconstruction_array)
 
-    return new
\ No newline at end of file
+    return new
+
+
+cdef class BackwardPlanGPU:
+    '''
+    Device buffers, texture and transformation kept between calls.
+    ou, ov, oa are None for parallel beam.
+    '''
+    cdef BackwardPlan* plan
+    cdef int mode, size, input_size
+    cdef float su, sv, du, dv, s2d
+
+    def __cinit__(self, int mode, const DTYPE[::1] transformation, int nx, int ny, int nz, int nu, int nv, int na, float su=0, float sv=0, float du=0, float dv=0, const DTYPE[::1] ou=None, const DTYPE[::1] ov=None, const DTYPE[::1] oa=None, float s2d=0):
+        cdef float* c_ou = NULL
+        cdef float* c_ov = NULL
+        cdef float* c_oa = NULL
+        if mode:
+            c_ou = <float *> &ou[0]
+            c_ov = <float *> &ov[0]
+            c_oa = <float *> &oa[0]
+        self.mode = mode
+        self.size = nx*ny*nz
+        self.input_size = na*nv*nu
+        self.su, self.sv, self.du, self.dv, self.s2d = su, sv, du, dv, s2d
+        self.plan = createBackwardPlan(<float *> &transformation[0], nx, ny, nz, nu, nv, na, c_ou, c_ov, c_oa)
+
+    def run(self, cnp.ndarray[DTYPE, ndim=1] reconstruction_array, const DTYPE[::1] sinogram_array):
+        if reconstruction_array.shape[0] != self.size:
+            raise ValueError("reconstruction_array must have {} elements.".format(self.size))
+        # the whole sinogram is copied to the device, a shorter buffer would be read past its end
+        if sinogram_array.shape[0] != self.input_size:
+            raise ValueError("sinogram_array must have {} elements.".format(self.input_size))
+        if self.mode:
+            runConeBeamPlan(self.plan, <float *> reconstruction_array.data, <float *> &sinogram_array[0], self.su, self.sv, self.du, self.dv, self.s2d, 0)
+        else:
+            runParallelBeamPlan(self.plan, <float *> reconstruction_array.data, <float *> &sinogram_array[0])
+        return reconstruction_array
+
+    def __dealloc__(self):
+        if self.plan != NULL:
+            destroyBackwardPlan(self.plan)
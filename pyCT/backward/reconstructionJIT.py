@@ -0,0 +1,161 @@
+import math
+import numba
+import numpy as np
+from numba import njit, prange
+from pyCT.forward.projectionJIT import _threads
+
+def reconstructParallelBeamJIT(reconstruction_array, sinogram_array, transformation, nx, ny, nz, nu, nv, na, workers=None):
+    with _threads(workers):
+        if sinogram_array.ndim == 4:
+            _kernelParallelBatch(reconstruction_array, sinogram_array, transformation, nx, ny, nz, na)
+        else:
+            _kernelParallel(reconstruction_array, sinogram_array, transformation, nx, ny, nz, na)
+
+
+def reconstructConeBeamJIT(reconstruction_array, sinogram_array, transformation, nx, ny, nz, nu, nv, na, su, sv, du, dv, ou, ov, oa, s2d, workers=None, s2o=0):
+    with _threads(workers):
+        if sinogram_array.ndim == 4:
+            _kernelConeBatch(reconstruction_array, sinogram_array, transformation, nx, ny, nz, na, su, sv, du, dv, ou, ov, oa, s2d, s2o)
+        else:
+            _kernelCone(reconstruction_array, sinogram_array, transformation, nx, ny, nz, na, su, sv, du, dv, ou, ov, oa, s2d, s2o)
+
+
+@njit(parallel=True, cache=True)
+def _kernelParallel(recon, sino, transformation, nx, ny, nz, na):
+    # one voxel per (x, y, z), as kernel_parallel in backward.cu
+    for idx in prange(nz*ny*nx):
+        z = idx // (nx*ny)
+        y = (idx // nx) % ny
+        x = idx % nx
+        total = 0.
+        for a in range(na):
+            t = transformation[a]
+            u = t[0,0] * x + t[0,1] * y + t[0,2] * z + t[0,3]
+            v = t[1,0] * x + t[1,1] * y + t[1,2] * z + t[1,3]
+            total += _tex2D(sino[a], u, v)
+        recon[z, y, x] += total
+
+
+@njit(parallel=True, cache=True)
+def _kernelCone(recon, sino, transformation, nx, ny, nz, na, su, sv, du, dv, ou, ov, oa, s2d, s2o):
+    # one voxel per (x, y, z), as kernel_cone in backward.cu
+    for idx in prange(nz*ny*nx):
+        z = idx // (nx*ny)
+        y = (idx // nx) % ny
+        x = idx % nx
+        total = 0.
+        for a in range(na):
+            t = transformation[a]
+            u = t[0,0] * x + t[0,1] * y + t[0,2] * z + t[0,3]
+            v = t[1,0] * x + t[1,1] * y + t[1,2] * z + t[1,3]
+            w = t[2,0] * x + t[2,1] * y + t[2,2] * z + t[2,3]
+
+            u_ = math.cos(oa[a])*u - math.sin(oa[a])*v
+            v_ = math.sin(oa[a])*u + math.cos(oa[a])*v
+            u = (u_ / w * -s2d + su/2 - ou[a])/du - .5
+            v = (v_ / w * -s2d + sv/2 - ov[a])/dv - .5
+            # FDK distance weight when s2o > 0
+            if s2o > 0:
+                total += _tex2D(sino[a], u, v) * (s2o/w)**2
+            else:
+                total += _tex2D(sino[a], u, v)
+        recon[z, y, x] += total
+
+
+@njit(parallel=True, cache=True)
+def _kernelParallelBatch(recon, sino, transformation, nx, ny, nz, na):
+    # _kernelParallel for sino [B, na, nv, nu], every voxel is projected once for the B sinograms
+    for row in prange(nz*ny):
+        z = row // ny
+        y = row % ny
+        # sums of the sinograms for the current voxel, allocated once per volume row
+        total = np.empty(len(sino))
+        for x in range(nx):
+            total[:] = 0.
+            for a in range(na):
+                t = transformation[a]
+                u = t[0,0] * x + t[0,1] * y + t[0,2] * z + t[0,3]
+                v = t[1,0] * x + t[1,1] * y + t[1,2] * z + t[1,3]
+                _tex2DBatch(sino, a, u, v, 1., total)
+            for b in range(len(sino)):
+                recon[b, z, y, x] += total[b]
+
+
+@njit(parallel=True, cache=True)
+def _kernelConeBatch(recon, sino, transformation, nx, ny, nz, na, su, sv, du, dv, ou, ov, oa, s2d, s2o):
+    # _kernelCone for sino [B, na, nv, nu], every voxel is projected once for the B sinograms
+    for row in prange(nz*ny):
+        z = row // ny
+        y = row % ny
+        # sums of the sinograms for the current voxel, allocated once per volume row
+        total = np.empty(len(sino))
+        for x in range(nx):
+            total[:] = 0.
+            for a in range(na):
+                t = transformation[a]
+                u = t[0,0] * x + t[0,1] * y + t[0,2] * z + t[0,3]
+                v = t[1,0] * x + t[1,1] * y + t[1,2] * z + t[1,3]
+                w = t[2,0] * x + t[2,1] * y + t[2,2] * z + t[2,3]
+
+                u_ = math.cos(oa[a])*u - math.sin(oa[a])*v
+                v_ = math.sin(oa[a])*u + math.cos(oa[a])*v
+                u = (u_ / w * -s2d + su/2 - ou[a])/du - .5
+                v = (v_ / w * -s2d + sv/2 - ov[a])/dv - .5
+                # FDK distance weight when s2o > 0
+                _tex2DBatch(sino, a, u, v, (s2o/w)**2 if s2o > 0 else 1., total)
+            for b in range(len(sino)):
+                recon[b, z, y, x] += total[b]
+
+
+@njit(inline='always')
+def _tex2D(view, u, v):
+    '''
+    Bilinear sample at pixel coordinates (u, v) with a zero border,
+    as tex3D with cudaFilterModeLinear and cudaAddressModeBorder.
+    '''
+    nv, nu = view.shape
+    if not (-1 < u < nu and -1 < v < nv):
+        return 0.
+    u0, v0 = math.floor(u), math.floor(v)
+    fu, fv = u - u0, v - v0
+    u0, v0 = int(u0), int(v0)
+    total = 0.
+    for j in range(2):
+        vj = v0 + j
+        if vj < 0 or vj >= nv:
+            continue
+        wv = fv if j else 1 - fv
+        for i in range(2):
+            ui = u0 + i
+            if ui < 0 or ui >= nu:
+                continue
+            wu = fu if i else 1 - fu
+            total += wv * wu * view[vj, ui]
+    return total
+
+
+@njit(inline='always')
+def _tex2DBatch(sino, a, u, v, weight, total):
+    '''
+    _tex2D of view a of every sinogram of sino [B, na, nv, nu], times weight, added to total [B].
+    '''
+    nv, nu = sino.shape[2:]
+    if not (-1 < u < nu and -1 < v < nv):
+        return
+    u0, v0 = math.floor(u), math.floor(v)
+    fu, fv = u - u0, v - v0
+    u0, v0 = int(u0), int(v0)
+    for b in range(len(sino)):
+        sample = 0.
+        for j in range(2):
+            vj = v0 + j
+            if vj < 0 or vj >= nv:
+                continue
+            wv = fv if j else 1 - fv
+            for i in range(2):
+                ui = u0 + i
+                if ui < 0 or ui >= nu:
+                    continue
+                wu = fu if i else 1 - fu
+                sample += wv * wu * sino[b, a, vj, ui]
+        total[b] += sample * weight
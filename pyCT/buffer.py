@@ -0,0 +1,23 @@
+import numpy as np
+
+def asFloat32(array:np.ndarray) -> np.ndarray:
+    '''
+    C-contiguous float32 view of array, copied only when needed.
+    '''
+    return np.ascontiguousarray(array, dtype=np.float32)
+
+
+def getOutput(out:np.ndarray, shape:tuple, clear:bool=True) -> np.ndarray:
+    '''
+    Check a caller-provided output array, or allocate one if out is None.
+    ->
+    output : C-contiguous float32 [shape], zero-filled when clear
+    '''
+    if out is None:
+        return np.zeros(shape, dtype=np.float32)
+    shape = tuple(int(n) for n in shape)
+    if out.shape != shape or out.dtype != np.float32 or not out.flags.c_contiguous:
+        raise ValueError("out must be a C-contiguous float32 array of shape {}.".format(shape))
+    if clear:
+        out.fill(0)
+    return out
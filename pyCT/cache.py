@@ -0,0 +1,39 @@
+from collections import OrderedDict
+from threading import Lock
+
+_cache = OrderedDict()
+_lock = Lock()
+_size = 16
+
+def getCached(key, func):
+    '''
+    Return the cached value of key, or compute it with func() and cache it.
+    The least recently used entries are dropped beyond the cache size.
+    '''
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = func()
+    with _lock:
+        _cache[key] = value
+        while len(_cache) > _size:
+            _cache.popitem(last=False)
+    return value
+
+
+def clearCache():
+    with _lock:
+        _cache.clear()
+
+
+def setCacheSize(size:int):
+    global _size
+    with _lock:
+        _size = size
+        while len(_cache) > _size:
+            _cache.popitem(last=False)
+
+
+def getCacheSize() -> int:
+    return _size
@@ -35,58 +35,8 @@ void kernel_parallel(float* recon, cudaTextureObject_t texObjSino, float* transf
 	}
 }
 
-void funcParallelBeam(float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na)
-{
-	// object array >> texture memory
-	const cudaExtent objSize = make_cudaExtent(nu, nv, na);
-	cudaArray* d_sinogram_array = 0;
-	cudaTextureObject_t tex_sinogram_array = 0;
-
-	// create 3D array
-	cudaChannelFormatDesc channelDesc = cudaCreateChannelDesc(32, 0, 0, 0, cudaChannelFormatKindFloat);
-	cudaMalloc3DArray(&d_sinogram_array, &channelDesc, objSize);
-
-	// copy data to 3D array
-	cudaMemcpy3DParms copyParams = { 0 };
-	copyParams.srcPtr = make_cudaPitchedPtr((void*)sinogram_array, objSize.width * sizeof(float), objSize.width, objSize.height);
-	copyParams.dstArray = d_sinogram_array;
-	copyParams.extent = objSize;
-	copyParams.kind = cudaMemcpyHostToDevice;
-	cudaMemcpy3D(&copyParams);
-
-	cudaResourceDesc            texRes;
-	memset(&texRes, 0, sizeof(cudaResourceDesc));
-	texRes.resType = cudaResourceTypeArray;
-	texRes.res.array.array = d_sinogram_array;
-
-	cudaTextureDesc             texDescr;
-	memset(&texDescr, 0, sizeof(cudaTextureDesc));
-	texDescr.normalizedCoords = false; // access with normalized texture coordinates
-	texDescr.filterMode = cudaFilterModeLinear; // linear interpolation
-	texDescr.addressMode[0] = cudaAddressModeBorder; // wrap texture coordinates
-	texDescr.addressMode[1] = cudaAddressModeBorder; // wrap texture coordinates
-	texDescr.addressMode[2] = cudaAddressModeBorder; // wrap texture coordinates
-	texDescr.readMode = cudaReadModeElementType;
-
-	cudaCreateTextureObject(&tex_sinogram_array, &texRes, &texDescr, NULL);
-
-	float* d_transformation;
-	cudaMalloc(&d_transformation, na * 4 * 4 * sizeof(float));
-	cudaMemcpy(d_transformation, transformation, na * 4 * 4 * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_reconstruction_array;
-	cudaMalloc(&d_reconstruction_array, nx * ny * nz * sizeof(float));
-	
-	kernel_parallel <<< dim3(nx,ny,1), dim3(nz,1,1) >>> (d_reconstruction_array, tex_sinogram_array, d_transformation, na);
-	cudaMemcpy(reconstruction_array, d_reconstruction_array, nx*ny*nz*sizeof(float), cudaMemcpyDeviceToHost);
-
-	cudaFree(d_reconstruction_array);
-	cudaFree(d_transformation);
-	cudaFreeArray(d_sinogram_array);
-	cudaDestroyTextureObject(tex_sinogram_array);
-}
-
 __global__ 
-void kernel_cone(float* recon, cudaTextureObject_t texObjSino, float* transformation, int na, float su, float sv, float du, float dv, float *ou, float *ov, float *oa, float s2d)
+void kernel_cone(float* recon, cudaTextureObject_t texObjSino, float* transformation, int na, float su, float sv, float du, float dv, float *ou, float *ov, float *oa, float s2d, float s2o)
 {
 	int nx = gridDim.x;
 	int ny = gridDim.y;
@@ -124,37 +74,36 @@ void kernel_cone(float* recon, cudaTextureObject_t texObjSino, float* transforma
 
 		u_ = cosf(oa[a])*u - sinf(oa[a])*v;
 		v_ = sinf(oa[a])*u + cosf(oa[a])*v;
-		u = (u_ / w * -s2d + su/2 - ou[a])/du;
-		v = (v_ / w * -s2d + sv/2 - ov[a])/dv;
+		u = (u_ / w * -s2d + su/2 - ou[a])/du - .5;
+		v = (v_ / w * -s2d + sv/2 - ov[a])/dv - .5;
 
 		idx = x + y*nx + z*nx*ny;
-		recon[idx] += tex3D<float>(texObjSino, u+.5, v+.5, a+.5);
+		// FDK distance weight when s2o > 0
+		if (s2o > 0)
+			recon[idx] += tex3D<float>(texObjSino, u+.5, v+.5, a+.5) * (s2o/w) * (s2o/w);
+		else
+			recon[idx] += tex3D<float>(texObjSino, u+.5, v+.5, a+.5);
 	}
 }
 
-void funcConeBeam(float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, float* ou, float* ov, float* oa, float s2d)
+BackwardPlan* createBackwardPlan(float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float* ou, float* ov, float* oa)
 {
-	// object array >> texture memory
+	BackwardPlan* plan = new BackwardPlan;
+	memset(plan, 0, sizeof(BackwardPlan));
+	plan->nx = nx; plan->ny = ny; plan->nz = nz;
+	plan->nu = nu; plan->nv = nv; plan->na = na;
+
+	// sinogram array >> texture memory
 	const cudaExtent objSize = make_cudaExtent(nu, nv, na);
-	cudaArray* d_sinogram_array = 0;
-	cudaTextureObject_t tex_sinogram_array = 0;
 
 	// create 3D array
 	cudaChannelFormatDesc channelDesc = cudaCreateChannelDesc(32, 0, 0, 0, cudaChannelFormatKindFloat);
-	cudaMalloc3DArray(&d_sinogram_array, &channelDesc, objSize);
-
-	// copy data to 3D array
-	cudaMemcpy3DParms copyParams = { 0 };
-	copyParams.srcPtr = make_cudaPitchedPtr((void*)sinogram_array, objSize.width * sizeof(float), objSize.width, objSize.height);
-	copyParams.dstArray = d_sinogram_array;
-	copyParams.extent = objSize;
-	copyParams.kind = cudaMemcpyHostToDevice;
-	cudaMemcpy3D(&copyParams);
+	cudaMalloc3DArray(&plan->d_sinogram_array, &channelDesc, objSize);
 
 	cudaResourceDesc            texRes;
 	memset(&texRes, 0, sizeof(cudaResourceDesc));
 	texRes.resType = cudaResourceTypeArray;
-	texRes.res.array.array = d_sinogram_array;
+	texRes.res.array.array = plan->d_sinogram_array;
 
 	cudaTextureDesc             texDescr;
 	memset(&texDescr, 0, sizeof(cudaTextureDesc));
@@ -165,31 +114,73 @@ void funcConeBeam(float* reconstruction_array, float* sinogram_array, float* tra
 	texDescr.addressMode[2] = cudaAddressModeBorder; // wrap texture coordinates
 	texDescr.readMode = cudaReadModeElementType;
 
-	cudaCreateTextureObject(&tex_sinogram_array, &texRes, &texDescr, NULL);
-	
-	float* d_transformation;
-	cudaMalloc(&d_transformation, na * 4 * 4 * sizeof(float));
-	cudaMemcpy(d_transformation, transformation, na * 4 * 4 * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_reconstruction_array;
-	cudaMalloc(&d_reconstruction_array, nx * ny * nz * sizeof(float));
-	float* d_ou;
-	cudaMalloc(&d_ou, na * sizeof(float));
-	cudaMemcpy(d_ou, ou, na * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_ov;
-	cudaMalloc(&d_ov, na * sizeof(float));
-	cudaMemcpy(d_ov, ov, na * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_oa;
-	cudaMalloc(&d_oa, na * sizeof(float));
-	cudaMemcpy(d_oa, oa, na * sizeof(float), cudaMemcpyHostToDevice);
-	
-	kernel_cone <<< dim3(nx,ny,1), dim3(nz,1,1) >>> (d_reconstruction_array, tex_sinogram_array, d_transformation, na, su, sv, du, dv, d_ou, d_ov, d_oa, s2d);
-	cudaMemcpy(reconstruction_array, d_reconstruction_array, nx*ny*nz*sizeof(float), cudaMemcpyDeviceToHost);
-
-	cudaFree(d_reconstruction_array);
-	cudaFree(d_transformation);
-	cudaFree(d_ou);
-	cudaFree(d_ov);
-	cudaFree(d_oa);
-	cudaFreeArray(d_sinogram_array);
-	cudaDestroyTextureObject(tex_sinogram_array);
+	cudaCreateTextureObject(&plan->tex_sinogram_array, &texRes, &texDescr, NULL);
+
+	cudaMalloc(&plan->d_reconstruction_array, nx * ny * nz * sizeof(float));
+	cudaMalloc(&plan->d_transformation, na * 4 * 4 * sizeof(float));
+	cudaMemcpy(plan->d_transformation, transformation, na * 4 * 4 * sizeof(float), cudaMemcpyHostToDevice);
+	if (ou != NULL && ov != NULL && oa != NULL)
+	{
+		cudaMalloc(&plan->d_ou, na * sizeof(float));
+		cudaMemcpy(plan->d_ou, ou, na * sizeof(float), cudaMemcpyHostToDevice);
+		cudaMalloc(&plan->d_ov, na * sizeof(float));
+		cudaMemcpy(plan->d_ov, ov, na * sizeof(float), cudaMemcpyHostToDevice);
+		cudaMalloc(&plan->d_oa, na * sizeof(float));
+		cudaMemcpy(plan->d_oa, oa, na * sizeof(float), cudaMemcpyHostToDevice);
+	}
+	return plan;
+}
+
+void copySinogram(BackwardPlan* plan, float* sinogram_array)
+{
+	// copy data to 3D array
+	const cudaExtent objSize = make_cudaExtent(plan->nu, plan->nv, plan->na);
+	cudaMemcpy3DParms copyParams = { 0 };
+	copyParams.srcPtr = make_cudaPitchedPtr((void*)sinogram_array, objSize.width * sizeof(float), objSize.width, objSize.height);
+	copyParams.dstArray = plan->d_sinogram_array;
+	copyParams.extent = objSize;
+	copyParams.kind = cudaMemcpyHostToDevice;
+	cudaMemcpy3D(&copyParams);
+	// the kernels accumulate into the volume
+	cudaMemset(plan->d_reconstruction_array, 0, plan->nx * plan->ny * plan->nz * sizeof(float));
+}
+
+void runParallelBeamPlan(BackwardPlan* plan, float* reconstruction_array, float* sinogram_array)
+{
+	copySinogram(plan, sinogram_array);
+	kernel_parallel <<< dim3(plan->nx,plan->ny,1), dim3(plan->nz,1,1) >>> (plan->d_reconstruction_array, plan->tex_sinogram_array, plan->d_transformation, plan->na);
+	cudaMemcpy(reconstruction_array, plan->d_reconstruction_array, plan->nx*plan->ny*plan->nz*sizeof(float), cudaMemcpyDeviceToHost);
+}
+
+void runConeBeamPlan(BackwardPlan* plan, float* reconstruction_array, float* sinogram_array, float su, float sv, float du, float dv, float s2d, float s2o)
+{
+	copySinogram(plan, sinogram_array);
+	kernel_cone <<< dim3(plan->nx,plan->ny,1), dim3(plan->nz,1,1) >>> (plan->d_reconstruction_array, plan->tex_sinogram_array, plan->d_transformation, plan->na, su, sv, du, dv, plan->d_ou, plan->d_ov, plan->d_oa, s2d, s2o);
+	cudaMemcpy(reconstruction_array, plan->d_reconstruction_array, plan->nx*plan->ny*plan->nz*sizeof(float), cudaMemcpyDeviceToHost);
+}
+
+void destroyBackwardPlan(BackwardPlan* plan)
+{
+	cudaFree(plan->d_reconstruction_array);
+	cudaFree(plan->d_transformation);
+	cudaFree(plan->d_ou);
+	cudaFree(plan->d_ov);
+	cudaFree(plan->d_oa);
+	cudaDestroyTextureObject(plan->tex_sinogram_array);
+	cudaFreeArray(plan->d_sinogram_array);
+	delete plan;
+}
+
+void funcParallelBeam(float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na)
+{
+	BackwardPlan* plan = createBackwardPlan(transformation, nx, ny, nz, nu, nv, na, NULL, NULL, NULL);
+	runParallelBeamPlan(plan, reconstruction_array, sinogram_array);
+	destroyBackwardPlan(plan);
+}
+
+void funcConeBeam(float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, float* ou, float* ov, float* oa, float s2d, float s2o)
+{
+	BackwardPlan* plan = createBackwardPlan(transformation, nx, ny, nz, nu, nv, na, ou, ov, oa);
+	runConeBeamPlan(plan, reconstruction_array, sinogram_array, su, sv, du, dv, s2d, s2o);
+	destroyBackwardPlan(plan);
 }
\ No newline at end of file
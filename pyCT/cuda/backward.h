@@ -1,2 +1,22 @@
+#include <cuda_runtime.h>
+
+struct BackwardPlan
+{
+	int nx, ny, nz, nu, nv, na;
+	cudaArray* d_sinogram_array;
+	cudaTextureObject_t tex_sinogram_array;
+	float* d_transformation;
+	float* d_reconstruction_array;
+	float* d_ou;
+	float* d_ov;
+	float* d_oa;
+};
+
 void funcParallelBeam(float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na);
-void funcConeBeam    (float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, float* ou, float* ov, float* oa, float s2d);
\ No newline at end of file
+void funcConeBeam    (float* reconstruction_array, float* sinogram_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float su, float sv, float du, float dv, float* ou, float* ov, float* oa, float s2d, float s2o);
+
+// device buffers kept between calls
+BackwardPlan* createBackwardPlan(float* transformation, int nx, int ny, int nz, int nu, int nv, int na, float* ou, float* ov, float* oa);
+void runParallelBeamPlan(BackwardPlan* plan, float* reconstruction_array, float* sinogram_array);
+void runConeBeamPlan    (BackwardPlan* plan, float* reconstruction_array, float* sinogram_array, float su, float sv, float du, float dv, float s2d, float s2o);
+void destroyBackwardPlan(BackwardPlan* plan);
\ No newline at end of file
@@ -1,7 +1,42 @@
 #include "forward.h"
 
+__device__
+void clip(float x, float dx, float lower, float upper, int* w0, int* w1)
+{
+	// narrow w0 <= w < w1 to the samples with lower < x + dx * w < upper
+	if (dx == 0)
+	{
+		if (!(lower < x && x < upper)) *w1 = *w0;
+		return;
+	}
+	float s0 = (lower - x) / dx;
+	float s1 = (upper - x) / dx;
+	if (dx < 0)
+	{
+		float s = s0; s0 = s1; s1 = s;
+	}
+	s0 = fmaxf(s0, *w0 - 1.f);
+	s1 = fminf(s1, (float) *w1);
+	if (s0 >= s1)
+	{
+		*w1 = *w0;
+		return;
+	}
+	*w0 = max(*w0, (int) floorf(s0) + 1);
+	*w1 = max(*w0, min(*w1, (int) ceilf(s1)));
+}
+
+__device__
+void clip_volume(float x, float y, float z, float dx, float dy, float dz, int nx, int ny, int nz, int* w0, int* w1)
+{
+	// the texture is nonzero for -1 < x < nx, ..., a voxel of margin absorbs the rounding
+	clip(x, dx, -2, nx+1, w0, w1);
+	clip(y, dy, -2, ny+1, w0, w1);
+	clip(z, dz, -2, nz+1, w0, w1);
+}
+
 __global__ 
-void kernel_parallel(float* proj, cudaTextureObject_t texObjImg, float* transformation, int nw)
+void kernel_parallel(float* proj, cudaTextureObject_t texObjImg, float* transformation, int nx, int ny, int nz, int nw)
 {
 	int nu = gridDim.x;
 	int nv = gridDim.y;
@@ -28,10 +63,13 @@ void kernel_parallel(float* proj, cudaTextureObject_t texObjImg, float* transfor
 	float yy = t10 * u + t11 * v + t13;
 	float zz = t20 * u + t21 * v + t23;
 
+	int w0 = 0, w1 = nw;
+	clip_volume(xx, yy, zz, t02, t12, t22, nx, ny, nz, &w0, &w1);
+
 	float sum = 0;
 	float x, y, z;
 
-	for (int w = 0; w < nw; w++)
+	for (int w = w0; w < w1; w++)
 	{
 		x = xx + t02 * w;
 		y = yy + t12 * w;
@@ -42,59 +80,8 @@ void kernel_parallel(float* proj, cudaTextureObject_t texObjImg, float* transfor
 	proj[idx] = sum;
 }
 
-void funcParallelBeam(float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na)
-{
-	// object array >> texture memory
-	const cudaExtent objSize = make_cudaExtent(nx, ny, nz);
-	cudaArray* d_object_array = 0;
-	cudaTextureObject_t tex_object_array = 0;
-
-	// create 3D array
-	cudaChannelFormatDesc channelDesc = cudaCreateChannelDesc(32, 0, 0, 0, cudaChannelFormatKindFloat);
-	cudaMalloc3DArray(&d_object_array, &channelDesc, objSize);
-
-	// copy data to 3D array
-	cudaMemcpy3DParms copyParams = { 0 };
-	copyParams.srcPtr = make_cudaPitchedPtr((void*)object_array, objSize.width * sizeof(float), objSize.width, objSize.height);
-	copyParams.dstArray = d_object_array;
-	copyParams.extent = objSize;
-	copyParams.kind = cudaMemcpyHostToDevice;
-	cudaMemcpy3D(&copyParams);
-
-	cudaResourceDesc            texRes;
-	memset(&texRes, 0, sizeof(cudaResourceDesc));
-	texRes.resType = cudaResourceTypeArray;
-	texRes.res.array.array = d_object_array;
-
-	cudaTextureDesc             texDescr;
-	memset(&texDescr, 0, sizeof(cudaTextureDesc));
-	texDescr.normalizedCoords = false; // access with normalized texture coordinates
-	texDescr.filterMode = cudaFilterModeLinear; // linear interpolation
-	texDescr.addressMode[0] = cudaAddressModeBorder; // wrap texture coordinates
-	texDescr.addressMode[1] = cudaAddressModeBorder; // wrap texture coordinates
-	texDescr.addressMode[2] = cudaAddressModeBorder; // wrap texture coordinates
-	texDescr.readMode = cudaReadModeElementType;
-
-	cudaCreateTextureObject(&tex_object_array, &texRes, &texDescr, NULL);
-
-	float* d_transformation;
-	cudaMalloc(&d_transformation, na * 4 * 4 * sizeof(float));
-	cudaMemcpy(d_transformation, transformation, na * 4 * 4 * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_detector_array;
-	cudaMalloc(&d_detector_array, na * nu * nv * sizeof(float));
-
-	kernel_parallel <<< dim3(nu,nv,1), dim3(na,1,1) >>> (d_detector_array, tex_object_array, d_transformation, nw);
-	cudaMemcpy(detector_array, d_detector_array, na*nu*nv*sizeof(float), cudaMemcpyDeviceToHost);
-
-	cudaFree(d_detector_array);
-	cudaFree(d_transformation);
-	cudaFreeArray(d_object_array);
-	cudaDestroyTextureObject(tex_object_array);
-}
-
-
 __global__ 
-void kernel_cone(float* proj, cudaTextureObject_t texObjImg, float* transformation, int nw, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far)
+void kernel_cone(float* proj, cudaTextureObject_t texObjImg, float* transformation, int nx, int ny, int nz, int nw, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far)
 {
 	int nu = gridDim.x;
 	int nv = gridDim.y;
@@ -113,7 +100,6 @@ void kernel_cone(float* proj, cudaTextureObject_t texObjImg, float* transformati
 	ry /= magnitude;
 	rz /= magnitude;
 
-	float t = near;
 	float dt = (far - near) / nw;
 	if (rz*far > s2d)
 	{
@@ -135,44 +121,48 @@ void kernel_cone(float* proj, cudaTextureObject_t texObjImg, float* transformati
 	float t22 = transformation[2 + 2*4 + a*4*4];
 	float t23 = transformation[3 + 2*4 + a*4*4];
 
+	// sample w sits at (t03 + sx*near) + sx*dt*w, ..., as _getConeRay in projectionJIT.py
+	float sx = t00*rx + t01*ry + t02*rz;
+	float sy = t10*rx + t11*ry + t12*rz;
+	float sz = t20*rx + t21*ry + t22*rz;
+	float xx = t03 + sx*near, yy = t13 + sy*near, zz = t23 + sz*near;
+	float dx = sx*dt, dy = sy*dt, dz = sz*dt;
+	int w0 = 0, w1 = nw;
+	clip_volume(xx, yy, zz, dx, dy, dz, nx, ny, nz, &w0, &w1);
+
 	float sum = 0;
 	float x, y, z;
 
-	for (int i = 0; i <= nw; i++)
+	// only the samples inside the volume box are visited
+	for (int w = w0; w < w1; w++)
 	{
-		x = t00*rx*t + t01*ry*t + t02*rz*t + t03;
-		y = t10*rx*t + t11*ry*t + t12*rz*t + t13;
-		z = t20*rx*t + t21*ry*t + t22*rz*t + t23;
+		x = xx + dx * w;
+		y = yy + dy * w;
+		z = zz + dz * w;
 		sum += tex3D<float>(texObjImg, x+.5, y+.5, z+.5);
-		t += dt;
 	}
 	int idx = u + v*nu + a*nu*nv;
 	proj[idx] = sum;
 }
 
-void funcConeBeam(float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far)
+ForwardPlan* createForwardPlan(float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float* ou, float* ov, float* oa)
 {
+	ForwardPlan* plan = new ForwardPlan;
+	memset(plan, 0, sizeof(ForwardPlan));
+	plan->nx = nx; plan->ny = ny; plan->nz = nz;
+	plan->nu = nu; plan->nv = nv; plan->nw = nw; plan->na = na;
+
 	// object array >> texture memory
 	const cudaExtent objSize = make_cudaExtent(nx, ny, nz);
-	cudaArray* d_object_array = 0;
-	cudaTextureObject_t tex_object_array = 0;
 
 	// create 3D array
 	cudaChannelFormatDesc channelDesc = cudaCreateChannelDesc(32, 0, 0, 0, cudaChannelFormatKindFloat);
-	cudaMalloc3DArray(&d_object_array, &channelDesc, objSize);
-
-	// copy data to 3D array
-	cudaMemcpy3DParms copyParams = { 0 };
-	copyParams.srcPtr = make_cudaPitchedPtr((void*)object_array, objSize.width * sizeof(float), objSize.width, objSize.height);
-	copyParams.dstArray = d_object_array;
-	copyParams.extent = objSize;
-	copyParams.kind = cudaMemcpyHostToDevice;
-	cudaMemcpy3D(&copyParams);
+	cudaMalloc3DArray(&plan->d_object_array, &channelDesc, objSize);
 
 	cudaResourceDesc            texRes;
 	memset(&texRes, 0, sizeof(cudaResourceDesc));
 	texRes.resType = cudaResourceTypeArray;
-	texRes.res.array.array = d_object_array;
+	texRes.res.array.array = plan->d_object_array;
 
 	cudaTextureDesc             texDescr;
 	memset(&texDescr, 0, sizeof(cudaTextureDesc));
@@ -183,31 +173,71 @@ void funcConeBeam(float* detector_array, float* object_array, float* transformat
 	texDescr.addressMode[2] = cudaAddressModeBorder; // wrap texture coordinates
 	texDescr.readMode = cudaReadModeElementType;
 
-	cudaCreateTextureObject(&tex_object_array, &texRes, &texDescr, NULL);
-
-	float* d_detector_array;
-	cudaMalloc(&d_detector_array, na * nu * nv * sizeof(float));
-	float* d_transformation;
-	cudaMalloc(&d_transformation, na * 4 * 4 * sizeof(float));
-	cudaMemcpy(d_transformation, transformation, na * 4 * 4 * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_ou;
-	cudaMalloc(&d_ou, na * sizeof(float));
-	cudaMemcpy(d_ou, ou, na * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_ov;
-	cudaMalloc(&d_ov, na * sizeof(float));
-	cudaMemcpy(d_ov, ov, na * sizeof(float), cudaMemcpyHostToDevice);
-	float* d_oa;
-	cudaMalloc(&d_oa, na * sizeof(float));
-	cudaMemcpy(d_oa, oa, na * sizeof(float), cudaMemcpyHostToDevice);
-
-	kernel_cone <<< dim3(nu,nv,1), dim3(na,1,1) >>> (d_detector_array, tex_object_array, d_transformation, nw, su, sv, d_ou, d_ov, d_oa, s2d, near, far);
-	cudaMemcpy(detector_array, d_detector_array, na*nu*nv*sizeof(float), cudaMemcpyDeviceToHost);
-
-	cudaFree(d_detector_array);
-	cudaFree(d_transformation);
-	cudaFree(d_ou);
-	cudaFree(d_ov);
-	cudaFree(d_oa);
-	cudaFreeArray(d_object_array);
-	cudaDestroyTextureObject(tex_object_array);
+	cudaCreateTextureObject(&plan->tex_object_array, &texRes, &texDescr, NULL);
+
+	cudaMalloc(&plan->d_detector_array, na * nu * nv * sizeof(float));
+	cudaMalloc(&plan->d_transformation, na * 4 * 4 * sizeof(float));
+	cudaMemcpy(plan->d_transformation, transformation, na * 4 * 4 * sizeof(float), cudaMemcpyHostToDevice);
+	if (ou != NULL && ov != NULL && oa != NULL)
+	{
+		cudaMalloc(&plan->d_ou, na * sizeof(float));
+		cudaMemcpy(plan->d_ou, ou, na * sizeof(float), cudaMemcpyHostToDevice);
+		cudaMalloc(&plan->d_ov, na * sizeof(float));
+		cudaMemcpy(plan->d_ov, ov, na * sizeof(float), cudaMemcpyHostToDevice);
+		cudaMalloc(&plan->d_oa, na * sizeof(float));
+		cudaMemcpy(plan->d_oa, oa, na * sizeof(float), cudaMemcpyHostToDevice);
+	}
+	return plan;
+}
+
+void copyObject(ForwardPlan* plan, float* object_array)
+{
+	// copy data to 3D array
+	const cudaExtent objSize = make_cudaExtent(plan->nx, plan->ny, plan->nz);
+	cudaMemcpy3DParms copyParams = { 0 };
+	copyParams.srcPtr = make_cudaPitchedPtr((void*)object_array, objSize.width * sizeof(float), objSize.width, objSize.height);
+	copyParams.dstArray = plan->d_object_array;
+	copyParams.extent = objSize;
+	copyParams.kind = cudaMemcpyHostToDevice;
+	cudaMemcpy3D(&copyParams);
+}
+
+void runParallelBeamPlan(ForwardPlan* plan, float* detector_array, float* object_array)
+{
+	copyObject(plan, object_array);
+	kernel_parallel <<< dim3(plan->nu,plan->nv,1), dim3(plan->na,1,1) >>> (plan->d_detector_array, plan->tex_object_array, plan->d_transformation, plan->nx, plan->ny, plan->nz, plan->nw);
+	cudaMemcpy(detector_array, plan->d_detector_array, plan->na*plan->nu*plan->nv*sizeof(float), cudaMemcpyDeviceToHost);
+}
+
+void runConeBeamPlan(ForwardPlan* plan, float* detector_array, float* object_array, float su, float sv, float s2d, float near, float far)
+{
+	copyObject(plan, object_array);
+	kernel_cone <<< dim3(plan->nu,plan->nv,1), dim3(plan->na,1,1) >>> (plan->d_detector_array, plan->tex_object_array, plan->d_transformation, plan->nx, plan->ny, plan->nz, plan->nw, su, sv, plan->d_ou, plan->d_ov, plan->d_oa, s2d, near, far);
+	cudaMemcpy(detector_array, plan->d_detector_array, plan->na*plan->nu*plan->nv*sizeof(float), cudaMemcpyDeviceToHost);
+}
+
+void destroyForwardPlan(ForwardPlan* plan)
+{
+	cudaFree(plan->d_detector_array);
+	cudaFree(plan->d_transformation);
+	cudaFree(plan->d_ou);
+	cudaFree(plan->d_ov);
+	cudaFree(plan->d_oa);
+	cudaDestroyTextureObject(plan->tex_object_array);
+	cudaFreeArray(plan->d_object_array);
+	delete plan;
+}
+
+void funcParallelBeam(float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na)
+{
+	ForwardPlan* plan = createForwardPlan(transformation, nx, ny, nz, nu, nv, nw, na, NULL, NULL, NULL);
+	runParallelBeamPlan(plan, detector_array, object_array);
+	destroyForwardPlan(plan);
+}
+
+void funcConeBeam(float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far)
+{
+	ForwardPlan* plan = createForwardPlan(transformation, nx, ny, nz, nu, nv, nw, na, ou, ov, oa);
+	runConeBeamPlan(plan, detector_array, object_array, su, sv, s2d, near, far);
+	destroyForwardPlan(plan);
 }
\ No newline at end of file
@@ -1,2 +1,22 @@
+#include <cuda_runtime.h>
+
+struct ForwardPlan
+{
+	int nx, ny, nz, nu, nv, nw, na;
+	cudaArray* d_object_array;
+	cudaTextureObject_t tex_object_array;
+	float* d_transformation;
+	float* d_detector_array;
+	float* d_ou;
+	float* d_ov;
+	float* d_oa;
+};
+
 void funcParallelBeam(float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na);
-void funcConeBeam    (float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far);
\ No newline at end of file
+void funcConeBeam    (float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far);
+
+// device buffers kept between calls
+ForwardPlan* createForwardPlan(float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float* ou, float* ov, float* oa);
+void runParallelBeamPlan(ForwardPlan* plan, float* detector_array, float* object_array);
+void runConeBeamPlan    (ForwardPlan* plan, float* detector_array, float* object_array, float su, float sv, float s2d, float near, float far);
+void destroyForwardPlan (ForwardPlan* plan);
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+from importlib import import_module
+from pyCT.parameter import _Parameters, getParameters
+
+# a dataset is a directory holding the geometry and raw float32 payloads in C order
+HEADER = 'parameters.json'
+VOLUME = 'volume.raw'
+SINOGRAM = 'sinogram.raw'
+MATRIX = 'matrix.npz'
+
+def createDataset(path:str, parameters:_Parameters) -> str:
+    '''
+    Create the dataset directory and write its header.
+    '''
+    os.makedirs(path, exist_ok=True)
+    parameters.save(os.path.join(path, HEADER))
+    return path
+
+
+def loadParameters(path:str) -> _Parameters:
+    return getParameters(os.path.join(path, HEADER))
+
+
+def openVolume(path:str, mode:str='r') -> np.memmap:
+    '''
+    mode   : r (read-only), r+ (read and write), w+ (create or overwrite)
+    ->
+    output : float32 [nz, ny, nx] mapped from volume.raw
+    '''
+    nx, ny, nz = loadParameters(path).object.size.get()
+    return _open(os.path.join(path, VOLUME), mode, (nz, ny, nx))
+
+
+def openSinogram(path:str, mode:str='r') -> np.memmap:
+    '''
+    mode   : r (read-only), r+ (read and write), w+ (create or overwrite)
+    ->
+    output : float32 [na, nv, nu] mapped from sinogram.raw
+    '''
+    params = loadParameters(path)
+    nu, nv = params.detector.size.get()
+    na = len(params.source.motion.rotation.get()[0])
+    return _open(os.path.join(path, SINOGRAM), mode, (na, nv, nu))
+
+
+def saveMatrix(path:str, matrix) -> str:
+    '''
+    Store a system matrix from getMatrix next to the header (uncompressed, for fast loading).
+    '''
+    import_module('scipy.sparse').save_npz(os.path.join(path, MATRIX), matrix, compressed=False)
+    return path
+
+
+def loadMatrix(path:str):
+    '''
+    output : scipy.sparse CSR float32 [na*nv*nu, nz*ny*nx], checked against the header
+    '''
+    params = loadParameters(path)
+    nx, ny, nz = params.object.size.get()
+    nu, nv = params.detector.size.get()
+    na = len(params.source.motion.rotation.get()[0])
+    matrix = import_module('scipy.sparse').load_npz(os.path.join(path, MATRIX)).tocsr()
+    if matrix.shape != (na*nv*nu, nx*ny*nz):
+        raise ValueError("{} has shape {}, but the header expects {}.".format(os.path.join(path, MATRIX), matrix.shape, (int(na*nv*nu), int(nx*ny*nz))))
+    return matrix
+
+
+def _open(path, mode, shape):
+    shape = tuple(int(n) for n in shape)
+    if mode != 'w+':
+        size = os.path.getsize(path)
+        if size != np.prod(shape) * 4:
+            raise ValueError("{} has {} bytes, but the header expects float32 {}.".format(path, size, shape))
+    return np.memmap(path, dtype=np.float32, mode=mode, shape=shape)
@@ -1,30 +1,109 @@
 import pyCT
+from pyCT import backend, parallel
 from pyCT.parameter import _Parameters
+from pyCT.cache import getCached
+from pyCT.buffer import asFloat32, getOutput
+from pyCT.subset import getSubsets
+from pyCT.profiler import getReport, getStage, finishReport, getCopiedBytes
 from .projectionCPU import *
-from projectionGPU import projectParallelBeamGPU, projectConeBeamGPU
-from copy import deepcopy
+from .projectionRay import projectParallelBeamRay, projectConeBeamRay, METHODS
 
 def project(object_array : np.ndarray,
             parameters   : _Parameters,
             **kwargs):
     '''
-    key : cuda, ray_step
+    object_array : [nz, ny, nx], or a batch of volumes [B, nz, ny, nx] projected together
+    ->
+    output       : [na, nv, nu], or [B, na, nv, nu]
+    key : cuda, jit, method, ray_step, chunk_size, slab_size, workers, executor, out, views (indices or slice, all by default),
+          matrix (system matrix from getMatrix, or True for the cached one of this geometry and ray_step),
+          profile (a callable or a list receiving the per-stage report of the call, see pyCT.profile)
     '''
-    # check CUDA
-    is_cuda = False if pyCT.CUDA is None else True        
-    if 'cuda' in kwargs.keys():
-        if is_cuda:
-            if not kwargs['cuda']:
-                is_cuda = False
-        else:
-            if kwargs['cuda']:
-                print('CUDA is not available ...')
+    views = kwargs.pop('views') if 'views' in kwargs.keys() else slice(None)
+    return _project(object_array, parameters, views, **kwargs)
+
+
+def project_iter(object_array    : np.ndarray,
+                 parameters      : _Parameters,
+                 views_per_chunk : int = 16,
+                 **kwargs):
+    '''
+    Forward projection of views_per_chunk views at a time.
+    Only one chunk of the sinogram is held in memory.
+    key : cuda, jit, method, ray_step, chunk_size, slab_size, workers, executor, matrix, profile (one report per chunk),
+          out ([views_per_chunk, nv, nu] or [B, views_per_chunk, nv, nu], its memory reused for every chunk),
+          order (consecutive views by default, or interleaved subsets in a getSubsets order for progressive previews)
+    ->
+    yield (view indices, detector_array [len(view indices), nv, nu], or [B, len(view indices), nv, nu] for a batch)
+    '''
+    na = len(parameters.source.motion.rotation.get()[0])
+    out = kwargs.pop('out', None)
+    order = kwargs.pop('order', None)
+    if order is None:
+        chunks = [np.arange(a0, min(a0+views_per_chunk, na)) for a0 in range(0, na, views_per_chunk)]
+    else:
+        chunks = getSubsets(na, -(-na // views_per_chunk), order)
+    for views in chunks:
+        # the leading part of out, contiguous also for a batch
+        shape = out.shape[:-3] + (len(views),) + out.shape[-2:] if out is not None else None
+        yield views, _project(object_array, parameters, views, out=None if out is None else out.reshape(-1)[:np.prod(shape)].reshape(shape), **kwargs)
+
+
+def _project(object_array : np.ndarray,
+             parameters   : _Parameters,
+             views        : slice,
+             **kwargs):
+    # check backend (CUDA, then JIT, then CPU)
+    name = backend.select(kwargs.get('cuda'), kwargs.get('jit'))
     
     # set step size
     if 'ray_step' in kwargs.keys():
         ray_step = kwargs['ray_step']
     else:
         ray_step = .5
+
+    # set projection method (sampling on every backend, joseph and siddon on CPU)
+    if 'method' in kwargs.keys():
+        method = kwargs['method'].lower()
+    else:
+        method = 'sampling'
+    if method not in METHODS:
+        raise ValueError('{} was not supported in pyCT'.format(method) + '\nWe support the following methods: ' + ', '.join(METHODS))
+
+    # set the number of ray samples processed at once on CPU, its workspace is about 120 bytes per sample (30 MiB)
+    if 'chunk_size' in kwargs.keys():
+        chunk_size = kwargs['chunk_size']
+    else:
+        chunk_size = 2**18
+
+    # set the number of voxels read at once on CPU (whole volume unless memory-mapped)
+    if 'slab_size' in kwargs.keys():
+        slab_size = kwargs['slab_size']
+    elif isinstance(object_array, np.memmap):
+        slab_size = 2**27
+    else:
+        slab_size = None
+
+    # set the number of CPU threads
+    if 'workers' in kwargs.keys():
+        workers = kwargs['workers']
+    else:
+        workers = None
+
+    # set the CPU worker pool, threads or forked processes (see pyCT.parallel)
+    if 'executor' in kwargs.keys():
+        executor = parallel.checkExecutor(kwargs['executor'])
+    else:
+        executor = 'thread'
+
+    # set system matrix (replaces the projection engines)
+    if 'matrix' in kwargs.keys():
+        matrix = kwargs['matrix']
+    else:
+        matrix = None
+
+    # set profiling (None unless a report is collected)
+    report = getReport('project', kwargs.get('profile'), backend='matrix' if matrix is not None else name, method=method, shape=np.shape(object_array))
     
     # get parameters
     mode = parameters.mode
@@ -32,47 +111,133 @@ def project(object_array : np.ndarray,
     nx, ny, nz = parameters.object.size.get()
     su, sv = parameters.detector.length.get()
     nu, nv = parameters.detector.size.get()
-    na = len(parameters.source.motion.rotation.get()[0])
-    near, far, nw = _getNearFar(parameters, ray_step)
+    with getStage(report, 'near_far'):
+        near, far, nw = _getNearFar(parameters, ray_step)
     
-    # get transformation
-    transformation = pyCT.getTransformation(parameters, nw, near, far)
-    transformationMatrix = transformation.getForward()
+    # get transformation of the selected views
+    with getStage(report, 'transformation'):
+        transformation = pyCT.getTransformation(parameters, nw, near, far)
+        transformationMatrix = transformation.getForward()[views]
+        ou, ov, oa = (offset[views] for offset in transformation.getOffset())
+    na = len(transformationMatrix)
+
+    # set batch, the engines trace the rays once for all of its volumes
+    if np.ndim(object_array) not in [3, 4]:
+        raise ValueError("object_array must be [nz, ny, nx] or a batch [B, nz, ny, nx], got shape {}.".format(np.shape(object_array)))
+    batch = np.shape(object_array)[:-3]
+
+    # set output (float32, written in place)
+    with getStage(report, 'output') as stage:
+        detector_array = getOutput(kwargs.get('out'), batch + (na, nv, nu), clear=name != 'cuda' or method != 'sampling')
+        stage.add(bytes=detector_array.nbytes if kwargs.get('out') is None else 0)
 
     # run
-    if is_cuda:
-        detector_array = np.zeros(na*nv*nu, dtype=np.float32)
-        object_array = object_array.flatten().astype(np.float32)
-        transformationMatrix = transformationMatrix.flatten().astype(np.float32)
-        if mode:
-            ou, ov = parameters.detector.motion.translation.get(axis=0).astype(np.float32)
-            oa = parameters.detector.motion.rotation.get().astype(np.float32)
-            if (len(ou) == 1) and (len(ov) == 1):
-                ou, ov = np.repeat(ou, na), np.repeat(ov, na)
-            if len(oa) == 1:
-                oa = np.repeat(oa, na)
-            detector_array = deepcopy(projectConeBeamGPU(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far))
-        else:
-            detector_array = deepcopy(projectParallelBeamGPU(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na))
-        detector_array = detector_array.reshape(na, nv, nu)
+    if matrix is not None:
+        from pyCT.matrix import getMatrix, _getViews, _checkMatrix
+        if matrix is True:
+            with getStage(report, 'matrix'):
+                matrix = getMatrix(parameters, ray_step, chunk_size)
+        _checkMatrix(matrix, len(transformation.getForward()), nv, nu, nx, ny, nz)
+        with getStage(report, 'cast') as stage:
+            volumes = asFloat32(object_array)
+            stage.add(np.size(volumes), getCopiedBytes(volumes, object_array))
+        with getStage(report, 'kernel', detector_array.size):
+            volumes = volumes.reshape(-1, nx*ny*nz).T
+            detector_array[...] = (_getViews(matrix, views, len(transformation.getForward())) @ volumes).T.reshape(detector_array.shape)
+
+    elif method != 'sampling':
+        # exact line integrals, ray_step only sets the direction scale
+        with getStage(report, 'kernel', detector_array.size):
+            if mode:
+                projectConeBeamRay(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, method, chunk_size, workers or 1, executor)
+            else:
+                projectParallelBeamRay(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, ray_step, method, chunk_size, workers or 1, executor)
+
+    elif name == 'cuda':
+        gpu = backend.getModule('cuda', 'forward')
+        # the plans take C-contiguous float32 arrays, views of a stepped slice are not
+        transformationMatrix = transformationMatrix.astype(np.float32).reshape(-1)
+        ou, ov, oa = (np.ascontiguousarray(offset) for offset in (ou, ov, oa))
+        with getStage(report, 'cast') as stage:
+            volumes = asFloat32(object_array)
+            stage.add(np.size(volumes), getCopiedBytes(volumes, object_array))
+        # one texture per volume, the batch runs one after the other
+        with getStage(report, 'kernel', detector_array.size):
+            for volume, detector in zip(volumes.reshape(-1, nx*ny*nz), detector_array.reshape(-1, na*nv*nu)):
+                if mode:
+                    gpu.projectConeBeamGPU(detector, volume, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far)
+                else:
+                    gpu.projectParallelBeamGPU(detector, volume, transformationMatrix, nx, ny, nz, nu, nv, nw, na)
     
+    elif name == 'jit':
+        jit = backend.getModule('jit', 'forward')
+        with getStage(report, 'kernel', detector_array.size):
+            if mode:
+                jit.projectConeBeamJIT(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, workers)
+            else:
+                jit.projectParallelBeamJIT(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, workers)
+
     else:
-        detector_array = np.zeros([na, nv, nu])
-        if mode:
-            ou, ov = parameters.detector.motion.translation.get(axis=0).astype(np.float32)
-            oa = parameters.detector.motion.rotation.get().astype(np.float32)
-            if (len(ou) == 1) and (len(ov) == 1):
-                ou, ov = np.repeat(ou, na), np.repeat(ov, na)
-            if len(oa) == 1:
-                oa = np.repeat(oa, na)
-            projectConeBeamCPU(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far)
+        with getStage(report, 'kernel', detector_array.size):
+            if mode:
+                projectConeBeamCPU(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, chunk_size, workers or 1, slab_size, executor)
+            else:
+                projectParallelBeamCPU(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, chunk_size, workers or 1, slab_size, executor)
+
+    # the samples of the sampling engines are ray_step apart
+    if matrix is None and method == 'sampling':
+        with getStage(report, 'scale', detector_array.size):
+            detector_array *= ray_step
+    finishReport(report)
+    return detector_array
+
+
+def _transpose(detector_array : np.ndarray,
+               parameters     : _Parameters,
+               views          : slice,
+               out            : np.ndarray = None,
+               ray_step       : float = .5,
+               chunk_size     : int = 2**18,
+               jit            : bool = None,
+               workers        : int = None):
+    '''
+    Exact transpose of the sampling projector, <project(x), y> = <x, _transpose(y)>, on JIT or CPU.
+    detector_array : [na', nv, nu] of the views, or [B, na', nv, nu]
+    ->
+    output         : float32 [nz, ny, nx], or [B, nz, ny, nx]
+    '''
+    nx, ny, nz = parameters.object.size.get()
+    su, sv = parameters.detector.length.get()
+    nu, nv = parameters.detector.size.get()
+    s2d = parameters.source.distance.source2detector
+    near, far, nw = _getNearFar(parameters, ray_step)
+    transformation = pyCT.getTransformation(parameters, nw, near, far)
+    transformationMatrix = transformation.getForward()[views]
+    ou, ov, oa = (offset[views] for offset in transformation.getOffset())
+    na = len(transformationMatrix)
+
+    object_array = getOutput(out, np.shape(detector_array)[:-3] + (nz, ny, nx))
+    detector_array = asFloat32(detector_array)
+    if backend.select(False, jit) == 'jit':
+        jit = backend.getModule('jit', 'forward')
+        if parameters.mode:
+            jit.backprojectConeBeamJIT(object_array, detector_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, workers)
         else:
-            projectParallelBeamCPU(detector_array, object_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na)
-    
-    return detector_array * ray_step
+            jit.backprojectParallelBeamJIT(object_array, detector_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, workers)
+    elif parameters.mode:
+        backprojectConeBeamCPU(object_array, detector_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, chunk_size)
+    else:
+        backprojectParallelBeamCPU(object_array, detector_array, transformationMatrix, nx, ny, nz, nu, nv, nw, na, chunk_size)
+    # the samples are ray_step apart, as in _project
+    object_array *= ray_step
+    return object_array
 
 
 def _getNearFar(params:_Parameters, ray_step:float):
+    return getCached((params.fingerprint(), 'near_far', ray_step), lambda: _computeNearFar(params, ray_step))
+
+
+def _computeNearFar(params:_Parameters, ray_step:float):
     s2o = params.source.distance.source2origin
     s2d = params.source.distance.source2detector
     lo = np.linalg.norm(params.object.length.get()/2)
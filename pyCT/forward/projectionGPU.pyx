@@ -5,15 +5,21 @@ cnp.import_array()
 ctypedef cnp.float32_t DTYPE
 
 cdef extern from "forward.h":
+    ctypedef struct ForwardPlan:
+        pass
     void funcParallelBeam(float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na)
     void funcConeBeam    (float* detector_array, float* object_array, float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, float* ou, float* ov, float* oa, float s2d, float near, float far);
+    ForwardPlan* createForwardPlan(float* transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float* ou, float* ov, float* oa)
+    void runParallelBeamPlan(ForwardPlan* plan, float* detector_array, float* object_array)
+    void runConeBeamPlan    (ForwardPlan* plan, float* detector_array, float* object_array, float su, float sv, float s2d, float near, float far)
+    void destroyForwardPlan (ForwardPlan* plan)
 
 
-def projectParallelBeamGPU(cnp.ndarray[DTYPE, ndim=1] detector_array, cnp.ndarray[DTYPE, ndim=1] object_array, cnp.ndarray[DTYPE, ndim=1] transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na):
+def projectParallelBeamGPU(cnp.ndarray[DTYPE, ndim=1] detector_array, const DTYPE[::1] object_array, const DTYPE[::1] transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na):
 
     cdef float* c_detector_array = <float *> detector_array.data
-    cdef float* c_object_array = <float *> object_array.data
-    cdef float* c_transformation = <float *> transformation.data
+    cdef float* c_object_array = <float *> &object_array[0]
+    cdef float* c_transformation = <float *> &transformation[0]
 
     funcParallelBeam(c_detector_array, c_object_array, c_transformation, nx, ny, nz, nu, nv, nw, na)
 
@@ -25,14 +31,14 @@ def projectParallelBeamGPU(cnp.ndarray[DTYPE, ndim=1] detector_array, cnp.ndarra
     return new
 
 
-def projectConeBeamGPU(cnp.ndarray[DTYPE, ndim=1] detector_array, cnp.ndarray[DTYPE, ndim=1] object_array, cnp.ndarray[DTYPE, ndim=1] transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, cnp.ndarray[DTYPE, ndim=1] ou, cnp.ndarray[DTYPE, ndim=1] ov, cnp.ndarray[DTYPE, ndim=1] oa, float s2d, float near, float far):
+def projectConeBeamGPU(cnp.ndarray[DTYPE, ndim=1] detector_array, const DTYPE[::1] object_array, const DTYPE[::1] transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su, float sv, const DTYPE[::1] ou, const DTYPE[::1] ov, const DTYPE[::1] oa, float s2d, float near, float far):
 
     cdef float* c_detector_array = <float *> detector_array.data
-    cdef float* c_object_array = <float *> object_array.data
-    cdef float* c_transformation = <float *> transformation.data
-    cdef float* c_ou = <float *> ou.data
-    cdef float* c_ov = <float *> ov.data
-    cdef float* c_oa = <float *> oa.data
+    cdef float* c_object_array = <float *> &object_array[0]
+    cdef float* c_transformation = <float *> &transformation[0]
+    cdef float* c_ou = <float *> &ou[0]
+    cdef float* c_ov = <float *> &ov[0]
+    cdef float* c_oa = <float *> &oa[0]
 
     funcConeBeam(c_detector_array, c_object_array, c_transformation, nx, ny, nz, nu, nv, nw, na, su, sv, c_ou, c_ov, c_oa, s2d, near, far)
 
@@ -41,4 +47,44 @@ def projectConeBeamGPU(cnp.ndarray[DTYPE, ndim=1] detector_array, cnp.ndarray[DT
 
     new = cnp.PyArray_SimpleNewFromData(1, shape, cnp.NPY_FLOAT32, c_detector_array)
 
-    return new
\ No newline at end of file
+    return new
+
+
+cdef class ForwardPlanGPU:
+    '''
+    Device buffers, texture and transformation kept between calls.
+    ou, ov, oa are None for parallel beam.
+    '''
+    cdef ForwardPlan* plan
+    cdef int mode, size, input_size
+    cdef float su, sv, s2d, near, far
+
+    def __cinit__(self, int mode, const DTYPE[::1] transformation, int nx, int ny, int nz, int nu, int nv, int nw, int na, float su=0, float sv=0, const DTYPE[::1] ou=None, const DTYPE[::1] ov=None, const DTYPE[::1] oa=None, float s2d=0, float near=0, float far=0):
+        cdef float* c_ou = NULL
+        cdef float* c_ov = NULL
+        cdef float* c_oa = NULL
+        if mode:
+            c_ou = <float *> &ou[0]
+            c_ov = <float *> &ov[0]
+            c_oa = <float *> &oa[0]
+        self.mode = mode
+        self.size = na*nv*nu
+        self.input_size = nx*ny*nz
+        self.su, self.sv, self.s2d, self.near, self.far = su, sv, s2d, near, far
+        self.plan = createForwardPlan(<float *> &transformation[0], nx, ny, nz, nu, nv, nw, na, c_ou, c_ov, c_oa)
+
+    def run(self, cnp.ndarray[DTYPE, ndim=1] detector_array, const DTYPE[::1] object_array):
+        if detector_array.shape[0] != self.size:
+            raise ValueError("detector_array must have {} elements.".format(self.size))
+        # the whole volume is copied to the device, a shorter buffer would be read past its end
+        if object_array.shape[0] != self.input_size:
+            raise ValueError("object_array must have {} elements.".format(self.input_size))
+        if self.mode:
+            runConeBeamPlan(self.plan, <float *> detector_array.data, <float *> &object_array[0], self.su, self.sv, self.s2d, self.near, self.far)
+        else:
+            runParallelBeamPlan(self.plan, <float *> detector_array.data, <float *> &object_array[0])
+        return detector_array
+
+    def __dealloc__(self):
+        if self.plan != NULL:
+            destroyForwardPlan(self.plan)
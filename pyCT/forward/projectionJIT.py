@@ -0,0 +1,401 @@
+import math
+import numba
+import numpy as np
+from contextlib import contextmanager
+from numba import njit, prange
+
+def projectParallelBeamJIT(detector_array, object_array, transformation, nx, ny, nz, nu, nv, nw, na, workers=None):
+    with _threads(workers):
+        if object_array.ndim == 4:
+            _kernelParallelBatch(detector_array, object_array, transformation, nu, nv, nw, na)
+        else:
+            _kernelParallel(detector_array, object_array, transformation, nu, nv, nw, na)
+
+
+def projectConeBeamJIT(detector_array, object_array, transformation, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, workers=None):
+    with _threads(workers):
+        if object_array.ndim == 4:
+            _kernelConeBatch(detector_array, object_array, transformation, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far)
+        else:
+            _kernelCone(detector_array, object_array, transformation, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far)
+
+
+def backprojectParallelBeamJIT(object_array, detector_array, transformation, nx, ny, nz, nu, nv, nw, na, workers=None, partial_size=2**26):
+    '''
+    Transpose of projectParallelBeamJIT: every sample adds the value of its ray to its 8 neighbours.
+    object_array : accumulated float32 volume [nz, ny, nx], or [B, nz, ny, nx] for a batch of detector arrays
+    partial_size : voxels of the float32 partial volumes of the threads together (one thread when a volume exceeds it)
+    '''
+    with _threads(workers):
+        for volume, partial, detector in _getPartials(object_array, detector_array, nx, ny, nz, nu, nv, na, partial_size):
+            _kernelParallelTranspose(partial, detector, transformation, nu, nv, nw, na)
+            _reduce(volume, partial)
+
+
+def backprojectConeBeamJIT(object_array, detector_array, transformation, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, workers=None, partial_size=2**26):
+    '''
+    Transpose of projectConeBeamJIT, as backprojectParallelBeamJIT.
+    '''
+    with _threads(workers):
+        for volume, partial, detector in _getPartials(object_array, detector_array, nx, ny, nz, nu, nv, na, partial_size):
+            _kernelConeTranspose(partial, detector, transformation, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far)
+            _reduce(volume, partial)
+
+
+@contextmanager
+def _threads(workers):
+    '''
+    Run on min(workers, NUMBA_NUM_THREADS) threads (the current count if None), then restore the previous count.
+    '''
+    previous = numba.get_num_threads()
+    if workers is not None:
+        numba.set_num_threads(max(1, min(workers, numba.config.NUMBA_NUM_THREADS)))
+    try:
+        yield
+    finally:
+        numba.set_num_threads(previous)
+
+
+def _getPartials(object_array, detector_array, nx, ny, nz, nu, nv, na, partial_size):
+    '''
+    One private partial volume per group of views, as many groups as threads within partial_size,
+    a single group scatters straight into the volume.
+    ->
+    yield (volume, partials [groups, nz, ny, nx], detector_array [na, nv, nu])
+    '''
+    groups = max(1, min(numba.get_num_threads(), na, partial_size // (nx*ny*nz)))
+    # the same partials for every volume of a batch
+    partial = np.empty((groups, nz, ny, nx), dtype=np.float32) if groups > 1 else None
+    for volume, detector in zip(object_array.reshape((-1, nz, ny, nx)), detector_array.reshape((-1, na, nv, nu))):
+        if partial is None:
+            yield volume, volume[None], detector
+        else:
+            partial.fill(0)
+            yield volume, partial, detector
+
+
+def _reduce(volume, partial):
+    if not np.may_share_memory(volume, partial):
+        for p in partial:
+            volume += p
+
+
+@njit(parallel=True, cache=True)
+def _kernelParallelTranspose(partial, proj, transformation, nu, nv, nw, na):
+    # rays of different views hit the same voxels, so each group of views scatters into its own partial volume
+    groups = partial.shape[0]
+    for g in prange(groups):
+        for a in range(g*na // groups, (g+1)*na // groups):
+            for v in range(nv):
+                for u in range(nu):
+                    value = proj[a, v, u]
+                    if value == 0:
+                        continue
+                    x, y, z, dx, dy, dz = _getParallelRay(transformation[a], u, v)
+                    w0, w1, i0, i1 = _getRange(partial.shape[1:], x, y, z, dx, dy, dz, nw)
+                    for w in range(w0, w1):
+                        _scatter3D(partial[g], x + dx * w, y + dy * w, z + dz * w, value)
+
+
+@njit(parallel=True, cache=True)
+def _kernelConeTranspose(partial, proj, transformation, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far):
+    # as _kernelParallelTranspose
+    groups = partial.shape[0]
+    for g in prange(groups):
+        for a in range(g*na // groups, (g+1)*na // groups):
+            for v in range(nv):
+                for u in range(nu):
+                    value = proj[a, v, u]
+                    if value == 0:
+                        continue
+                    x, y, z, dx, dy, dz = _getConeRay(transformation[a], a, u, v, nu, nv, nw, su, sv, ou, ov, oa, s2d, near, far)
+                    w0, w1, i0, i1 = _getRange(partial.shape[1:], x, y, z, dx, dy, dz, nw)
+                    for w in range(w0, w1):
+                        _scatter3D(partial[g], x + dx * w, y + dy * w, z + dz * w, value)
+
+
+@njit(parallel=True, cache=True)
+def _kernelParallel(proj, img, transformation, nu, nv, nw, na):
+    # one ray per (u, v, a), as kernel_parallel in forward.cu
+    for idx in prange(na*nv*nu):
+        a = idx // (nu*nv)
+        v = (idx // nu) % nv
+        u = idx % nu
+        x, y, z, dx, dy, dz = _getParallelRay(transformation[a], u, v)
+
+        w0, w1, i0, i1 = _getRange(img.shape, x, y, z, dx, dy, dz, nw)
+        total = 0.
+        for w in range(w0, i0):
+            total += _tex3D(img, x + dx * w, y + dy * w, z + dz * w)
+        for w in range(i0, i1):
+            total += _tex3DInterior(img, x + dx * w, y + dy * w, z + dz * w)
+        for w in range(i1, w1):
+            total += _tex3D(img, x + dx * w, y + dy * w, z + dz * w)
+        proj[a, v, u] += total
+
+
+@njit(parallel=True, cache=True)
+def _kernelCone(proj, img, transformation, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far):
+    # one ray per (u, v, a), as kernel_cone in forward.cu
+    for idx in prange(na*nv*nu):
+        a = idx // (nu*nv)
+        v = (idx // nu) % nv
+        u = idx % nu
+        x, y, z, dx, dy, dz = _getConeRay(transformation[a], a, u, v, nu, nv, nw, su, sv, ou, ov, oa, s2d, near, far)
+
+        w0, w1, i0, i1 = _getRange(img.shape, x, y, z, dx, dy, dz, nw)
+        total = 0.
+        for w in range(w0, i0):
+            total += _tex3D(img, x + dx * w, y + dy * w, z + dz * w)
+        for w in range(i0, i1):
+            total += _tex3DInterior(img, x + dx * w, y + dy * w, z + dz * w)
+        for w in range(i1, w1):
+            total += _tex3D(img, x + dx * w, y + dy * w, z + dz * w)
+        proj[a, v, u] += total
+
+
+@njit(parallel=True, cache=True)
+def _kernelParallelBatch(proj, img, transformation, nu, nv, nw, na):
+    # _kernelParallel for img [B, nz, ny, nx], every sample position and weight serves the B volumes
+    for row in prange(na*nv):
+        a = row // nv
+        v = row % nv
+        # sums along the current ray, allocated once per detector row
+        total = np.empty(len(img))
+        for u in range(nu):
+            x, y, z, dx, dy, dz = _getParallelRay(transformation[a], u, v)
+
+            w0, w1, i0, i1 = _getRange(img.shape[1:], x, y, z, dx, dy, dz, nw)
+            total[:] = 0.
+            for w in range(w0, i0):
+                _tex3DBatch(img, x + dx * w, y + dy * w, z + dz * w, total)
+            for w in range(i0, i1):
+                _tex3DInteriorBatch(img, x + dx * w, y + dy * w, z + dz * w, total)
+            for w in range(i1, w1):
+                _tex3DBatch(img, x + dx * w, y + dy * w, z + dz * w, total)
+            for b in range(len(img)):
+                proj[b, a, v, u] += total[b]
+
+
+@njit(parallel=True, cache=True)
+def _kernelConeBatch(proj, img, transformation, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far):
+    # _kernelCone for img [B, nz, ny, nx], every sample position and weight serves the B volumes
+    for row in prange(na*nv):
+        a = row // nv
+        v = row % nv
+        # sums along the current ray, allocated once per detector row
+        total = np.empty(len(img))
+        for u in range(nu):
+            x, y, z, dx, dy, dz = _getConeRay(transformation[a], a, u, v, nu, nv, nw, su, sv, ou, ov, oa, s2d, near, far)
+
+            w0, w1, i0, i1 = _getRange(img.shape[1:], x, y, z, dx, dy, dz, nw)
+            total[:] = 0.
+            for w in range(w0, i0):
+                _tex3DBatch(img, x + dx * w, y + dy * w, z + dz * w, total)
+            for w in range(i0, i1):
+                _tex3DInteriorBatch(img, x + dx * w, y + dy * w, z + dz * w, total)
+            for w in range(i1, w1):
+                _tex3DBatch(img, x + dx * w, y + dy * w, z + dz * w, total)
+            for b in range(len(img)):
+                proj[b, a, v, u] += total[b]
+
+
+@njit(inline='always')
+def _getParallelRay(t, u, v):
+    '''
+    output : first sample (x, y, z) and step (dx, dy, dz) of the ray through pixel (u, v), in voxels
+    '''
+    x = t[0,0] * u + t[0,1] * v + t[0,3]
+    y = t[1,0] * u + t[1,1] * v + t[1,3]
+    z = t[2,0] * u + t[2,1] * v + t[2,3]
+    return x, y, z, t[0,2], t[1,2], t[2,2]
+
+
+@njit(inline='always')
+def _getConeRay(t, a, u, v, nu, nv, nw, su, sv, ou, ov, oa, s2d, near, far):
+    '''
+    output : as _getParallelRay, with the first sample at near from the source
+    '''
+    rx_ = -su/2 + su/2/nu + u*su/nu
+    ry_ = -sv/2 + sv/2/nv + v*sv/nv
+    rx = rx_*math.cos(oa[a]) + ry_*math.sin(oa[a]) + ou[a]
+    ry = -rx_*math.sin(oa[a]) + ry_*math.cos(oa[a]) + ov[a]
+    rz = -s2d
+    magnitude = math.sqrt(rx*rx + ry*ry + rz*rz)
+    rx /= magnitude
+    ry /= magnitude
+    rz /= magnitude
+
+    # incremental step along the ray
+    dt = (far - near) / nw
+    sx = t[0,0]*rx + t[0,1]*ry + t[0,2]*rz
+    sy = t[1,0]*rx + t[1,1]*ry + t[1,2]*rz
+    sz = t[2,0]*rx + t[2,1]*ry + t[2,2]*rz
+    return t[0,3] + sx*near, t[1,3] + sy*near, t[2,3] + sz*near, sx*dt, sy*dt, sz*dt
+
+
+@njit(inline='always')
+def _getRange(shape, x, y, z, dx, dy, dz, nw):
+    '''
+    Samples x + dx * w, ... that can be nonzero lie in w0 <= w < w1 (with a voxel of margin),
+    those in i0 <= w < i1 have all 8 neighbours inside the volume of shape [nz, ny, nx].
+    '''
+    nz, ny, nx = shape
+    w0, w1 = _clip(x, dx, -2, nx+1, 0, nw)
+    w0, w1 = _clip(y, dy, -2, ny+1, w0, w1)
+    w0, w1 = _clip(z, dz, -2, nz+1, w0, w1)
+    i0, i1 = _clip(x, dx, .5, nx-1.5, w0, w1)
+    i0, i1 = _clip(y, dy, .5, ny-1.5, i0, i1)
+    i0, i1 = _clip(z, dz, .5, nz-1.5, i0, i1)
+    return w0, w1, i0, i1
+
+
+@njit(inline='always')
+def _clip(x, dx, lower, upper, w0, w1):
+    '''
+    Narrow w0 <= w < w1 to the samples with lower < x + dx * w < upper, or to an empty range at w0.
+    '''
+    if dx == 0:
+        if lower < x < upper:
+            return w0, w1
+        return w0, w0
+    s0, s1 = (lower - x) / dx, (upper - x) / dx
+    if dx < 0:
+        s0, s1 = s1, s0
+    # clamped first, as a nearly parallel ray puts the bounds far beyond any integer
+    s0, s1 = max(s0, w0 - 1.), min(s1, float(w1))
+    if s0 >= s1:
+        return w0, w0
+    return max(w0, int(math.floor(s0)) + 1), max(w0, min(w1, int(math.ceil(s1))))
+
+
+@njit(inline='always')
+def _tex3D(img, x, y, z):
+    '''
+    Trilinear sample at voxel coordinates (x, y, z) with a zero border,
+    as tex3D with cudaFilterModeLinear and cudaAddressModeBorder.
+    '''
+    nz, ny, nx = img.shape
+    if not (-1 < x < nx and -1 < y < ny and -1 < z < nz):
+        return 0.
+    x0, y0, z0 = math.floor(x), math.floor(y), math.floor(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    x0, y0, z0 = int(x0), int(y0), int(z0)
+    total = 0.
+    for k in range(2):
+        zk = z0 + k
+        if zk < 0 or zk >= nz:
+            continue
+        wz = fz if k else 1 - fz
+        for j in range(2):
+            yj = y0 + j
+            if yj < 0 or yj >= ny:
+                continue
+            wy = fy if j else 1 - fy
+            for i in range(2):
+                xi = x0 + i
+                if xi < 0 or xi >= nx:
+                    continue
+                wx = fx if i else 1 - fx
+                total += wz * wy * wx * img[zk, yj, xi]
+    return total
+
+
+@njit(inline='always')
+def _scatter3D(img, x, y, z, value):
+    '''
+    Transpose of _tex3D, value added to the neighbours of (x, y, z) with the trilinear weights.
+    '''
+    nz, ny, nx = img.shape
+    if not (-1 < x < nx and -1 < y < ny and -1 < z < nz):
+        return
+    x0, y0, z0 = math.floor(x), math.floor(y), math.floor(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    x0, y0, z0 = int(x0), int(y0), int(z0)
+    for k in range(2):
+        zk = z0 + k
+        if zk < 0 or zk >= nz:
+            continue
+        wz = fz if k else 1 - fz
+        for j in range(2):
+            yj = y0 + j
+            if yj < 0 or yj >= ny:
+                continue
+            wy = fy if j else 1 - fy
+            for i in range(2):
+                xi = x0 + i
+                if xi < 0 or xi >= nx:
+                    continue
+                wx = fx if i else 1 - fx
+                img[zk, yj, xi] += wz * wy * wx * value
+
+
+@njit(inline='always')
+def _tex3DInterior(img, x, y, z):
+    '''
+    _tex3D for 0 <= x < nx-1, ..., where no neighbour needs a bounds check.
+    '''
+    x0, y0, z0 = math.floor(x), math.floor(y), math.floor(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    x0, y0, z0 = int(x0), int(y0), int(z0)
+    total = 0.
+    for k in range(2):
+        wz = fz if k else 1 - fz
+        for j in range(2):
+            wy = fy if j else 1 - fy
+            for i in range(2):
+                wx = fx if i else 1 - fx
+                total += wz * wy * wx * img[z0 + k, y0 + j, x0 + i]
+    return total
+
+
+@njit(inline='always')
+def _tex3DBatch(img, x, y, z, total):
+    '''
+    _tex3D of every volume of img [B, nz, ny, nx], added to total [B].
+    '''
+    nz, ny, nx = img.shape[1:]
+    if not (-1 < x < nx and -1 < y < ny and -1 < z < nz):
+        return
+    x0, y0, z0 = math.floor(x), math.floor(y), math.floor(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    x0, y0, z0 = int(x0), int(y0), int(z0)
+    for b in range(len(img)):
+        sample = 0.
+        for k in range(2):
+            zk = z0 + k
+            if zk < 0 or zk >= nz:
+                continue
+            wz = fz if k else 1 - fz
+            for j in range(2):
+                yj = y0 + j
+                if yj < 0 or yj >= ny:
+                    continue
+                wy = fy if j else 1 - fy
+                for i in range(2):
+                    xi = x0 + i
+                    if xi < 0 or xi >= nx:
+                        continue
+                    wx = fx if i else 1 - fx
+                    sample += wz * wy * wx * img[b, zk, yj, xi]
+        total[b] += sample
+
+
+@njit(inline='always')
+def _tex3DInteriorBatch(img, x, y, z, total):
+    '''
+    _tex3DInterior of every volume of img [B, nz, ny, nx], added to total [B].
+    '''
+    x0, y0, z0 = math.floor(x), math.floor(y), math.floor(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    x0, y0, z0 = int(x0), int(y0), int(z0)
+    for b in range(len(img)):
+        sample = 0.
+        for k in range(2):
+            wz = fz if k else 1 - fz
+            for j in range(2):
+                wy = fy if j else 1 - fy
+                for i in range(2):
+                    wx = fx if i else 1 - fx
+                    sample += wz * wy * wx * img[b, z0 + k, y0 + j, x0 + i]
+        total[b] += sample
@@ -0,0 +1,105 @@
+import numpy as np
+from pyCT import parallel
+from pyCT.forward.projectionCPU import _getDirections, _getInterval, _getBlocks, _integrate
+
+METHODS = ['sampling', 'joseph', 'siddon']
+
+def projectParallelBeamRay(detector_array, object_array, transformation, nx, ny, nz, nu, nv, nw, na, ray_step, method='joseph', chunk_size=2**18, workers=1, executor='thread'):
+    origins, directions = _getParallelRays(transformation, nu, nv, ray_step)
+    _projectRays(detector_array, object_array, origins, directions, -np.inf, method, chunk_size, workers, executor)
+
+
+def projectConeBeamRay(detector_array, object_array, transformation, nx, ny, nz, nu, nv, nw, na, su, sv, ou, ov, oa, s2d, near, far, method='joseph', chunk_size=2**18, workers=1, executor='thread'):
+    origins, directions = _getConeRays(transformation, nu, nv, na, su, sv, ou, ov, oa, s2d)
+    _projectRays(detector_array, object_array, origins, directions, 0, method, chunk_size, workers, executor)
+
+
+def _getParallelRays(transformation, nu, nv, ray_step):
+    '''
+    Ray through pixel (u, v): origin + s * direction, s in mm along the whole line.
+    ->
+    output : origins, directions in voxel coordinates [x, y, z], per mm [na, nu*nv, 3]
+    '''
+    v, u = np.divmod(np.arange(nu*nv), nu)
+    origins = np.einsum('aij,jr->ari', transformation[:, :3][..., [0,1,3]], [u, v, np.ones(nu*nv)])
+    directions = np.broadcast_to(transformation[:, None, :3, 2] / ray_step, origins.shape)
+    return origins, directions
+
+
+def _getConeRays(transformation, nu, nv, na, su, sv, ou, ov, oa, s2d):
+    '''
+    Ray through pixel (u, v): source + s * direction, s in mm from the source.
+    ->
+    output : origins, directions in voxel coordinates [x, y, z], per mm [na, nu*nv, 3]
+    '''
+    directions = np.einsum('aij,arj->ari', transformation[:, :3, :3], _getDirections(nu, nv, na, su, sv, ou, ov, oa, s2d).reshape(na, nu*nv, 3))
+    origins = np.broadcast_to(transformation[:, None, :3, 3], directions.shape)
+    return origins, directions
+
+
+def _projectRays(detector_array, object_array, origins, directions, start, method, chunk_size, workers, executor):
+    '''
+    origins, directions : voxel coordinates [x, y, z] of the rays, per mm [na, nu*nv, 3]
+    start               : lower bound of s on each ray
+    '''
+    na, nr = origins.shape[:2]
+    nu = detector_array.shape[-1]
+    v, u = np.divmod(np.arange(nr), nu)
+    shape = np.array(object_array.shape[:-4:-1])
+    object_array = np.pad(object_array, [(0, 0)] * (object_array.ndim - 3) + [(1, 1)] * 3)
+    project = _getJoseph if method == 'joseph' else _getSiddon
+    def trace(detector, block):
+        a0, a1, r0, r1 = block
+        o = origins[a0:a1, r0:r1].reshape(-1, 3)
+        d = directions[a0:a1, r0:r1].reshape(-1, 3)
+        detector[..., a0:a1, v[r0:r1], u[r0:r1]] += project(object_array, shape, o, d, start).reshape(detector.shape[:-3] + (a1-a0, r1-r0))
+    parallel.run(trace, detector_array, _getBlocks(na, nr, shape.sum()+3, max(1, chunk_size // workers)), workers, executor)
+
+
+def _getJoseph(object_array, shape, o, d, start):
+    '''
+    Step plane by plane along the axis the ray crosses fastest and sample bilinearly within each plane.
+    object_array : padded volume [nz+2, ny+2, nx+2], or a batch of them [B, nz+2, ny+2, nx+2]
+    ->
+    output       : line integrals [rays], or [B, rays]
+    '''
+    output = np.zeros(object_array.shape[:-3] + (len(o),))
+    axis = np.abs(d).argmax(axis=1)
+    for k in range(3):
+        ray = np.nonzero(axis == k)[0]
+        if len(ray) == 0:
+            continue
+        plane = np.arange(shape[k])
+        s = (plane - o[ray, k, None]) / d[ray, k, None]
+        x, y, z = (o[ray, :, None] + d[ray, :, None] * s[:, None] + 1).transpose(1, 0, 2)
+        # exact plane coordinates, and samples behind the start pushed out of the volume
+        (x, y, z)[k][...] = plane + 1
+        x[s < start] = -1
+        output[..., ray] = _integrate(object_array, x, y, z) / np.abs(d[ray, k])
+    return output
+
+
+def _getSiddon(object_array, shape, o, d, start):
+    '''
+    Sum the voxel values weighted by the exact intersection lengths of the ray with the voxels.
+    object_array : padded volume [nz+2, ny+2, nx+2], or a batch of them [B, nz+2, ny+2, nx+2]
+    ->
+    output       : line integrals [rays], or [B, rays]
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # s at the voxel boundaries (index - 1/2) of every axis
+        s = np.concatenate([(np.arange(shape[k]+1) - .5 - o[:, k, None]) / d[:, k, None] for k in range(3)], axis=1)
+    first, last = _getInterval(o, d, -.5, shape - .5)
+    first = np.maximum(first, start)
+    # rays that miss the volume get an empty range
+    miss = ~(first < last)
+    first[miss], last[miss] = 0, 0
+    s = np.sort(np.clip(np.nan_to_num(s, nan=np.inf), first[:, None], last[:, None]), axis=1)
+    length = np.diff(s, axis=1)
+    middle = (s[:, 1:] + s[:, :-1]) / 2
+    ray, segment = np.nonzero(length > 0)
+    x, y, z = (np.floor(o[ray] + d[ray] * middle[ray, segment, None] + .5).astype(np.intp) + 1).T
+    values = object_array[..., z, y, x] * length[ray, segment]
+    if values.ndim == 1:
+        return np.bincount(ray, weights=values, minlength=len(o))
+    return np.array([np.bincount(ray, weights=value, minlength=len(o)) for value in values])
@@ -0,0 +1,192 @@
+'''
+Iterative reconstruction with project as A and its transpose as A^T
+(exact for the sampling projector and the system matrix, the unfiltered reconstruct weighted by the ray density otherwise).
+common key : cuda, jit, ray_step, chunk_size, slab_size, workers, executor, matrix, x0, callback
+callback(iteration, reconstruction_array, residual, elapsed) is called after every iteration,
+with the residual norm |b - Ax| before the update and the wall time of the iteration [s].
+'''
+import time
+import numpy as np
+import pyCT
+from pyCT.parameter import _Parameters
+from pyCT.buffer import asFloat32
+from pyCT.cache import getCached
+from pyCT.forward import _project, _transpose
+from pyCT.backward import _computeCosineWeight
+from pyCT.subset import getSubsets
+
+
+def sirt(sinogram_array : np.ndarray,
+         parameters     : _Parameters,
+         iterations     : int = 10,
+         **kwargs):
+    '''
+    Simultaneous iterative reconstruction, x += relaxation * C A^T R (b - Ax).
+    key : relaxation (1), nonnegative (False)
+    '''
+    return sart(sinogram_array, parameters, iterations, subsets=1, **kwargs)
+
+
+def sart(sinogram_array : np.ndarray,
+         parameters     : _Parameters,
+         iterations     : int = 10,
+         **kwargs):
+    '''
+    Ordered-subsets SART: the SIRT update over interleaved groups of views, one group at a time.
+    key : subsets (8), order (bit-reversal, see getSubsets), relaxation (1), nonnegative (False)
+    '''
+    subsets = kwargs.pop('subsets') if 'subsets' in kwargs.keys() else 8
+    order = kwargs.pop('order') if 'order' in kwargs.keys() else 'bit-reversal'
+    relaxation = kwargs.pop('relaxation') if 'relaxation' in kwargs.keys() else 1
+    nonnegative = kwargs.pop('nonnegative') if 'nonnegative' in kwargs.keys() else False
+    x, callback, kwargs = _getOptions(parameters, kwargs)
+
+    na = len(parameters.source.motion.rotation.get()[0])
+    views = getSubsets(na, subsets, order)
+    rows, columns = _getWeights(parameters, views, order, kwargs)
+    sinogram_array = asFloat32(sinogram_array)
+    b = [sinogram_array[view] for view in views]
+    y = [np.empty_like(bs) for bs in b]
+    z = np.empty_like(x)
+
+    for k in range(iterations):
+        start = time.perf_counter()
+        residual = 0
+        for view, bs, ys, row, column in zip(views, b, y, rows, columns):
+            _forward(x, parameters, view, ys, kwargs)
+            np.subtract(bs, ys, out=ys)
+            residual += np.vdot(ys, ys)
+            ys *= row
+            _adjoint(ys, parameters, view, z, kwargs)
+            z *= column
+            z *= relaxation
+            x += z
+            if nonnegative:
+                np.maximum(x, 0, out=x)
+        if callback is not None:
+            callback(k, x, np.sqrt(residual), time.perf_counter() - start)
+    return x
+
+
+def cgls(sinogram_array : np.ndarray,
+         parameters     : _Parameters,
+         iterations     : int = 10,
+         **kwargs):
+    '''
+    Conjugate gradient on the normal equations A^T A x = A^T b.
+    '''
+    x, callback, kwargs = _getOptions(parameters, kwargs)
+    views = slice(None)
+
+    r = asFloat32(sinogram_array).copy()
+    q = np.empty_like(r)
+    if np.any(x):
+        r -= _forward(x, parameters, views, q, kwargs)
+    s = _adjoint(r, parameters, views, np.empty_like(x), kwargs)
+    p = s.copy()
+    gamma = np.vdot(s, s)
+
+    for k in range(iterations):
+        start = time.perf_counter()
+        residual = np.sqrt(np.vdot(r, r))
+        _forward(p, parameters, views, q, kwargs)
+        alpha = gamma / np.vdot(q, q)
+        # q and s are free until the next projections, so they hold the scaled updates
+        q *= alpha
+        r -= q
+        np.multiply(p, alpha, out=s)
+        x += s
+        _adjoint(r, parameters, views, s, kwargs)
+        gamma, previous = np.vdot(s, s), gamma
+        p *= gamma / previous
+        p += s
+        if callback is not None:
+            callback(k, x, residual, time.perf_counter() - start)
+    return x
+
+
+def _getOptions(parameters, kwargs):
+    kwargs = dict(kwargs)
+    nx, ny, nz = parameters.object.size.get()
+    x0 = kwargs.pop('x0') if 'x0' in kwargs.keys() else None
+    x = np.zeros([nz, ny, nx], dtype=np.float32) if x0 is None else np.array(x0, dtype=np.float32)
+    callback = kwargs.pop('callback') if 'callback' in kwargs.keys() else None
+    kwargs.pop('out', None)
+    return x, callback, kwargs
+
+
+def _getWeights(parameters, views, order, kwargs):
+    '''
+    Inverse row sums A_s 1 and column sums A_s^T 1 of every subset, cached per geometry and projector.
+    '''
+    ray_step = kwargs['ray_step'] if 'ray_step' in kwargs.keys() else .5
+    method = kwargs['method'] if 'method' in kwargs.keys() else 'sampling'
+    key = (parameters.fingerprint(), 'iterative', len(views), order, method.lower(), ray_step, kwargs.get('matrix') is not None)
+    return getCached(key, lambda: _computeWeights(parameters, views, kwargs))
+
+
+def _computeWeights(parameters, views, kwargs):
+    nx, ny, nz = parameters.object.size.get()
+    ones = np.ones([nz, ny, nx], dtype=np.float32)
+    rows, columns = [], []
+    for view in views:
+        row = _forward(ones, parameters, view, None, kwargs)
+        column = _adjoint(np.ones_like(row), parameters, view, None, kwargs)
+        rows.append(_invert(row))
+        columns.append(_invert(column))
+    return rows, columns
+
+
+def _invert(array):
+    # zero where nothing is measured
+    output = np.zeros_like(array)
+    np.divide(1, array, out=output, where=array > 1e-6)
+    output.flags.writeable = False
+    return output
+
+
+def _forward(x, parameters, views, out, kwargs):
+    return _project(x, parameters, views, out=out, **kwargs)
+
+
+def _adjoint(y, parameters, views, out, kwargs):
+    '''
+    A^T y, exact for the system matrix and the sampling projector (its engines share the samples).
+    The ray-driven methods backproject unfiltered, weighted by the density of the rays at each voxel,
+    so that <Ax, y> = <x, A^T y> up to the interpolation.
+    '''
+    if kwargs.get('matrix') is not None:
+        return pyCT.reconstruct([(views, y)], parameters, filter=None, out=out, **kwargs)
+    if kwargs.get('method', 'sampling') == 'sampling':
+        options = {key: kwargs[key] for key in ['ray_step', 'chunk_size', 'jit', 'workers'] if key in kwargs.keys()}
+        return _transpose(y, parameters, views, out, **options)
+    # method selects the projector, not the reconstruction method
+    kwargs = {key: value for key, value in kwargs.items() if key != 'method'}
+    dx, dy, dz = parameters.object.spacing.get()
+    du, dv = parameters.detector.spacing.get()
+    scale = dx * dy * dz / (du * dv)
+    if parameters.mode:
+        # the rays spread as (s2d / depth)^2 / cos, the FDK distance weight (s2o / depth)^2 of the cosine
+        # weighting rescaled, with its cosine pre-weight turned into 1 / cos
+        s2o = parameters.source.distance.source2origin
+        s2d = parameters.source.distance.source2detector
+        cosine = _getCosine(parameters)
+        y = y / (cosine if len(cosine) == 1 else cosine[views])
+        out = pyCT.reconstruct([(views, y)], parameters, filter=None, cosine=True, out=out, **kwargs)
+        scale *= (s2d / s2o) ** 2
+    else:
+        out = pyCT.reconstruct([(views, y)], parameters, filter=None, out=out, **kwargs)
+    out *= scale
+    return out
+
+
+def _getCosine(parameters):
+    '''
+    Square of the cosine pre-weight of reconstruct, [1, nv, nu] or [na, nv, nu].
+    '''
+    return getCached((parameters.fingerprint(), 'iterative', 'cosine'), lambda: _readOnly(_computeCosineWeight(parameters) ** 2))
+
+
+def _readOnly(array):
+    array.flags.writeable = False
+    return array
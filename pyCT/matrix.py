@@ -0,0 +1,88 @@
+import numpy as np
+from importlib import import_module
+import pyCT
+from pyCT.parameter import _Parameters
+from pyCT.cache import getCached
+from pyCT.forward import _getNearFar
+from pyCT.forward.projectionCPU import _getParallelSamples, _getConeSamples, _getDirections, _getBlocks
+
+def getMatrix(parameters:_Parameters, ray_step:float=.5, chunk_size:int=2**20):
+    '''
+    System matrix of the sampling projector, assembled once per geometry and ray_step (cached).
+    project(matrix=A) computes A x and reconstruct(matrix=A, filter=None) backprojects with A^T.
+    chunk_size : samples assembled at once
+    ->
+    output     : scipy.sparse CSR float32 [na*nv*nu, nz*ny*nx], rows in (a, v, u) and columns in (z, y, x) order
+    '''
+    return getCached((parameters.fingerprint(), 'matrix', ray_step), lambda: _computeMatrix(parameters, ray_step, chunk_size))
+
+
+def _computeMatrix(parameters, ray_step, chunk_size):
+    sparse = import_module('scipy.sparse')
+    mode = parameters.mode
+    s2d = parameters.source.distance.source2detector
+    nx, ny, nz = parameters.object.size.get()
+    nu, nv = parameters.detector.size.get()
+    su, sv = parameters.detector.length.get()
+    near, far, nw = _getNearFar(parameters, ray_step)
+    transformation = pyCT.getTransformation(parameters, nw, near, far)
+    forward = transformation.getForward()
+    na = len(forward)
+
+    v, u = np.divmod(np.arange(nu*nv), nu)
+    shift, shape = np.ones(3), np.array([nx+2, ny+2, nz+2])
+    if mode:
+        directions = _getDirections(nu, nv, na, su, sv, *transformation.getOffset(), s2d).reshape(na, nu*nv, 3)
+
+    # the blocks cover consecutive rows, so their matrices stack in order
+    blocks = []
+    for a0, a1, r0, r1 in _getBlocks(na, nu*nv, nw, chunk_size):
+        if mode:
+            counts, x, y, z = _getConeSamples(forward[a0:a1, :3], directions[a0:a1, r0:r1], shift, shape, near, far, nw)
+        else:
+            counts, x, y, z = _getParallelSamples(forward[a0:a1, :3], u[r0:r1], v[r0:r1], shift, shape, nw)
+        ray = np.repeat(np.arange(len(counts)), counts)
+        rows, columns, values = _getStencil(ray, x, y, z, nx, ny, nz)
+        # duplicates, the samples of a ray in the same voxels, are summed
+        blocks.append(sparse.csr_matrix((values * ray_step, (rows, columns)), shape=(len(counts), nx*ny*nz), dtype=np.float32))
+    return sparse.vstack(blocks, format='csr', dtype=np.float32)
+
+
+def _getStencil(ray, x, y, z, nx, ny, nz):
+    '''
+    Trilinear weights of the samples on their 8 neighbours, as _integrate.
+    x, y, z : padded sample coordinates [samples]
+    ->
+    output  : ray, voxel index and weight of every nonzero (sample, neighbour) pair
+    '''
+    mask = (0 < x) & (x < nx+1) & (0 < y) & (y < ny+1) & (0 < z) & (z < nz+1)
+    ray, x, y, z = ray[mask], x[mask], y[mask], z[mask]
+    x0, y0, z0 = x.astype(np.intp), y.astype(np.intp), z.astype(np.intp)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    rows, columns, values = [], [], []
+    for k in range(2):
+        for j in range(2):
+            for i in range(2):
+                # padded index p is voxel p - 1, the padding itself is zero
+                xi, yj, zk = x0 + i - 1, y0 + j - 1, z0 + k - 1
+                inside = (0 <= xi) & (xi < nx) & (0 <= yj) & (yj < ny) & (0 <= zk) & (zk < nz)
+                weight = (fx if i else 1-fx) * (fy if j else 1-fy) * (fz if k else 1-fz)
+                rows.append(ray[inside])
+                columns.append(((zk*ny + yj)*nx + xi)[inside])
+                values.append(weight[inside])
+    return np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+
+
+def _getViews(matrix, views, na):
+    '''
+    Rows of the views in matrix (all of them without a copy).
+    '''
+    if isinstance(views, slice) and views == slice(None):
+        return matrix
+    rows = np.arange(matrix.shape[0]).reshape(na, -1)[views]
+    return matrix[rows.ravel()]
+
+
+def _checkMatrix(matrix, na, nv, nu, nx, ny, nz):
+    if matrix.shape != (na*nv*nu, nx*ny*nz):
+        raise ValueError("matrix of shape {} does not match the geometry, expected {}.".format(matrix.shape, (int(na*nv*nu), int(nx*ny*nz))))
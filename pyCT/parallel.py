@@ -0,0 +1,115 @@
+'''
+Worker pools of the NumPy engines.
+Threads share the arrays without copies, but np.bincount and the Python between the NumPy calls hold the GIL,
+so the threads of the NumPy engines partly serialize on it.
+Forked processes (Linux, macOS) each run their own interpreter: they inherit the inputs copy-on-write
+and write their results to anonymous shared memory, which the caller copies back.
+Where fork is not available, or after numba started its TBB threading layer (a fork then hangs the interpreter
+at exit), executor='process' runs on threads.
+'''
+import mmap, sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_context, get_all_start_methods
+
+EXECUTORS = ['thread', 'process']
+
+# the task of the forked workers, inherited instead of pickled
+_task = None
+
+def checkExecutor(executor:str) -> str:
+    executor = executor.lower()
+    if executor not in EXECUTORS:
+        raise ValueError('{} was not supported in pyCT'.format(executor) + '\nWe support the following executors: ' + ', '.join(EXECUTORS))
+    return executor
+
+
+def getSlabs(nx, ny, nz, slab_size):
+    '''
+    Split z into slabs of at most slab_size voxels (at least one slice).
+    ->
+    output : (z0, z1)
+    '''
+    step = max(1, slab_size // max(1, nx*ny))
+    for z0 in range(0, nz, step):
+        yield z0, min(z0+step, nz)
+
+
+def run(func, output, tasks, workers=1, executor='thread'):
+    '''
+    Call func(output, task) for every task, the tasks write to disjoint parts of output.
+    '''
+    tasks = list(tasks)
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            func(output, task)
+    elif _isForked(executor):
+        shared = _getShared(output.shape, output.dtype)
+        shared[...] = output
+        _map(lambda index: func(shared, tasks[index]), len(tasks), workers)
+        output[...] = shared
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(lambda task: func(output, task), tasks))
+
+
+def runPartial(func, output, tasks, workers=1, executor='thread'):
+    '''
+    Call func(partial, task) for every task, each task accumulates into its own zero partial output.
+    The partial outputs are added to output.
+    '''
+    tasks = list(tasks)
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            func(output, task)
+    elif _isForked(executor):
+        partials = _getShared((len(tasks),) + output.shape, output.dtype)
+        _map(lambda index: func(partials[index], tasks[index]), len(tasks), workers)
+        for partial in partials:
+            output += partial
+    else:
+        def partial(task):
+            volume = np.zeros_like(output)
+            func(volume, task)
+            return volume
+        with ThreadPoolExecutor(workers) as pool:
+            for volume in pool.map(partial, tasks):
+                output += volume
+
+
+def _isForked(executor):
+    return executor == 'process' and 'fork' in get_all_start_methods() and not _isTBB()
+
+
+def _isTBB():
+    numba = sys.modules.get('numba')
+    try:
+        return numba is not None and numba.threading_layer() == 'tbb'
+    except ValueError:
+        # no parallel kernel has run yet
+        return False
+
+
+def _getShared(shape, dtype):
+    '''
+    Zero array in anonymous shared memory, written by the forked workers.
+    '''
+    dtype, size = np.dtype(dtype), int(np.prod(shape))
+    return np.frombuffer(mmap.mmap(-1, max(1, size * dtype.itemsize)), dtype, size).reshape(shape)
+
+
+def _map(func, n, workers):
+    '''
+    func(index) for index in range(n), on forked workers.
+    '''
+    global _task
+    _task = func
+    try:
+        with ProcessPoolExecutor(min(workers, n), mp_context=get_context('fork')) as pool:
+            list(pool.map(_call, range(n)))
+    finally:
+        _task = None
+
+
+def _call(index):
+    _task(index)
@@ -1,4 +1,5 @@
 import json
+import hashlib
 import numpy as np
 from copy import deepcopy
 
@@ -74,6 +75,13 @@ class _Parameters():
                     stack.append(element[key])
         json.dump(meta, open(path, 'w'), indent=2)
 
+    def fingerprint(self) -> str:
+        '''
+        Hash of the geometry, used as a cache key.
+        '''
+        meta = json.dumps(self.__dict__, sort_keys=True, default=_serialize)
+        return hashlib.sha1(meta.encode()).hexdigest()
+
     def check(self):
         for i in [self.object, self.detector]:
             l = [i.size.checkNone(), i.spacing.checkNone(), i.length.checkNone()]        
@@ -103,6 +111,14 @@ class _Parameters():
         return deepcopy(self)
         
 
+def _serialize(value):
+    if type(value) == np.ndarray:
+        return value.tolist()
+    elif isinstance(value, np.generic):
+        return value.item()
+    else:
+        return value.__dict__
+
 class _2D():
     def __init__(self, u=None, v=None):
         self.u = u
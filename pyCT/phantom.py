@@ -1,17 +1,144 @@
+import os
 import numpy as np
+from pyCT.cache import getCached
+from pyCT.buffer import getOutput
+from pyCT.transformation import getTransformation
+from pyCT.forward import _getNearFar
+from pyCT.forward.projectionCPU import _getBlocks
+from pyCT.forward.projectionRay import _getParallelRays, _getConeRays
 
-def getPhantom(shape, dtype=float):
+def getPhantom(shape, dtype=float, slab_size=2**22):
     """Generates a Shepp Logan phantom with a given shape and dtype.
 
     Args:
         shape (tuple of ints): shape, can be of length 2 or 3.
         dtype (Dtype): data type.
+        slab_size (int): voxels evaluated at once.
 
     Returns:
         array.
 
     """
-    return _phantom(shape, sl_amps, sl_scales, sl_offsets, sl_angles, dtype)
+    return _phantom(shape, sl_amps, sl_scales, sl_offsets, sl_angles, dtype, slab_size=slab_size)
+
+
+def getEllipsoids(count=10, seed=None):
+    """Draws random ellipsoids in the Shepp Logan convention
+    (coordinates normalized to [-1, 1], angles in degrees).
+    The amplitudes are positive, so the phantoms are nonnegative.
+
+    Args:
+        count (int): number of ellipsoids.
+        seed (int or sequence of ints): seed of numpy.random.default_rng.
+
+    Returns:
+        amps [count], scales [count, 3], offsets [count, 3], angles [count, 3].
+
+    """
+    rng = np.random.default_rng(seed)
+    amps = rng.uniform(.05, .5, count)
+    scales = rng.uniform(.05, .4, (count, 3))
+    offsets = rng.uniform(-.5, .5, (count, 3))
+    angles = rng.uniform(0, 360, (count, 3))
+    return amps, scales, offsets, angles
+
+
+def getRandomPhantoms(shape, batch=1, count=10, seed=0, dtype=np.float32, cache=False, path=None, slab_size=2**22):
+    """Generates a batch of random-ellipsoid phantoms, phantom b from getEllipsoids(count, [seed, b]),
+    so that it does not depend on the batch size.
+
+    Args:
+        shape (tuple of ints): shape, can be of length 2 or 3.
+        batch (int): number of phantoms.
+        count (int): ellipsoids per phantom.
+        seed (int): seed of the batch.
+        dtype (Dtype): data type.
+        cache (bool): keep the batch in the pyCT cache, keyed by (shape, dtype, seed, batch, count).
+        path (str): directory of generated batches, the batch is written once to a .npy file named after
+            its key and memory-mapped read-only afterwards.
+        slab_size (int): voxels evaluated at once.
+
+    Returns:
+        array [batch, *shape], read-only if cached or memory-mapped.
+
+    """
+    shape = tuple(int(n) for n in shape)
+    dtype = np.dtype(dtype)
+    key = (shape, dtype.str, int(seed), int(batch), int(count))
+    if path is not None:
+        generate = lambda: _openPhantoms(path, key, slab_size)
+    else:
+        generate = lambda: _randomPhantoms(np.zeros((batch,) + shape, dtype=dtype), key, slab_size)
+    if cache:
+        # shared by the callers, so not writeable
+        return getCached(('phantom',) + key, lambda: _readOnly(generate()))
+    return generate()
+
+
+def projectPhantom(parameters, ellipsoids=None, **kwargs):
+    """Exact line integrals of an ellipsoid phantom for every detector ray of the geometry,
+    a reference for project(getPhantom(...)) free of discretization error.
+    The ellipsoids fill the object box as in getPhantom, voxel i of an axis of size n at (i - n//2) / n * 2.
+
+    Args:
+        parameters (_Parameters): geometry, parallel or cone beam.
+        ellipsoids (tuple): amps, scales, offsets, angles as from getEllipsoids (Shepp Logan by default).
+        **kwargs: views (indices or slice, all by default), chunk_size (ray-ellipsoid pairs at once), out.
+
+    Returns:
+        float32 array [na, nv, nu].
+
+    """
+    views = kwargs['views'] if 'views' in kwargs.keys() else slice(None)
+    chunk_size = kwargs['chunk_size'] if 'chunk_size' in kwargs.keys() else 2**20
+    if ellipsoids is None:
+        ellipsoids = sl_amps, sl_scales, sl_offsets, sl_angles
+    amps, scales, offsets, angles = (np.asarray(e, dtype=float) for e in ellipsoids)
+
+    nx, ny, nz = parameters.object.size.get()
+    nu, nv = parameters.detector.size.get()
+    su, sv = parameters.detector.length.get()
+    s2d = parameters.source.distance.source2detector
+    near, far, nw = _getNearFar(parameters, 1.)
+    transformation = getTransformation(parameters, nw, near, far)
+    forward = transformation.getForward()[views]
+    ou, ov, oa = (offset[views] for offset in transformation.getOffset())
+    na = len(forward)
+    if parameters.mode:
+        origins, directions = _getConeRays(forward, nu, nv, na, su, sv, ou, ov, oa, s2d)
+        start = 0
+    else:
+        origins, directions = _getParallelRays(forward, nu, nv, 1.)
+        start = -np.inf
+
+    # voxel coordinates p map to the unit ball of each ellipsoid by M p + m
+    size = np.array([nx, ny, nz])
+    R = np.array([_rotation_matrix(angle) for angle in angles])
+    M = R * (2 / size) / scales[:, :, None]
+    m = -(R @ (size // 2 * 2 / size) + offsets) / scales
+
+    detector_array = getOutput(kwargs.get('out'), (na, nv, nu)).reshape(na, nu*nv)
+    for a0, a1, r0, r1 in _getBlocks(na, nu*nv, len(amps), chunk_size):
+        # one end of the rays is shared by a view, the source for cone beam and the direction for parallel beam
+        if parameters.mode:
+            o, d = origins[a0:a1, :1], directions[a0:a1, r0:r1]
+        else:
+            o, d = origins[a0:a1, r0:r1], directions[a0:a1, :1]
+        total = 0
+        for amp, Me, me in zip(amps, M, m):
+            # the ray in the ellipsoid frame is A + B s, it crosses the unit sphere where a s^2 + 2 b s + c = 0
+            A = o @ Me.T + me
+            B = d @ Me.T
+            a = np.einsum('...j,...j->...', B, B)
+            b = np.einsum('...j,...j->...', A, B)
+            c = np.einsum('...j,...j->...', A, A) - 1
+            root = np.sqrt(np.maximum(b * b - a * c, 0))
+            # chord in mm, only the part after the source for cone beam
+            s0 = np.maximum((-b - root) / a, start)
+            s1 = (-b + root) / a
+            total = total + amp * np.maximum(s1 - s0, 0)
+        detector_array[a0:a1, r0:r1] = total
+    return detector_array.reshape(na, nv, nu)
 
 
 sl_amps = [1, -0.8, -0.2, -0.2, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1]
@@ -56,10 +183,37 @@ sl_angles = [
 ]
 
 
-def _phantom(shape, amps, scales, offsets, angles, dtype):
+def _randomPhantoms(out, key, slab_size):
+    shape, _, seed, batch, count = key
+    for b in range(batch):
+        _phantom(shape, *getEllipsoids(count, [seed, b]), out.dtype, out=out[b], slab_size=slab_size)
+    return out
+
+
+def _openPhantoms(path, key, slab_size):
+    shape, dtype, seed, batch, count = key
+    name = os.path.join(path, 'phantom_{}_{}_{}_{}_{}.npy'.format('x'.join(map(str, shape)), dtype.replace('<', '').replace('>', ''), seed, batch, count))
+    if not os.path.exists(name):
+        os.makedirs(path, exist_ok=True)
+        # written one phantom at a time under a temporary name, so that an interrupted run leaves no partial batch
+        temporary = name + '.tmp'
+        out = np.lib.format.open_memmap(temporary, mode='w+', dtype=dtype, shape=(batch,) + shape)
+        _randomPhantoms(out, key, slab_size)
+        out.flush()
+        del out
+        os.replace(temporary, name)
+    return np.load(name, mmap_mode='r')
+
+
+def _readOnly(array):
+    array.flags.writeable = False
+    return array
+
+
+def _phantom(shape, amps, scales, offsets, angles, dtype, out=None, slab_size=2**22):
     """
     Generate a cube of given shape using a list of ellipsoid
-    parameters.
+    parameters, or add them to out.
     """
 
     if len(shape) == 2:
@@ -72,46 +226,56 @@ def _phantom(shape, amps, scales, offsets, angles, dtype):
     else:
         raise ValueError("Incorrect dimension")
 
-    out = np.zeros(shape, dtype=dtype)
-
-    z, y, x = np.mgrid[
-        -(shape[-3] // 2) : ((shape[-3] + 1) // 2),
-        -(shape[-2] // 2) : ((shape[-2] + 1) // 2),
-        -(shape[-1] // 2) : ((shape[-1] + 1) // 2),
-    ]
-
-    coords = np.stack(
-        (
-            x.ravel() / shape[-1] * 2,
-            y.ravel() / shape[-2] * 2,
-            z.ravel() / shape[-3] * 2,
-        )
-    )
+    if out is None:
+        out = np.zeros(shape, dtype=dtype)
+    volume = out.reshape(shape)
 
     for amp, scale, offset, angle in zip(amps, scales, offsets, angles):
-        _ellipsoid(amp, scale, offset, angle, coords, out)
+        _ellipsoid(amp, scale, offset, angle, volume, slab_size)
 
     if ndim == 2:
-        return out[0, :, :]
+        return volume[0, :, :]
 
     else:
-        return out
-    
+        return volume
 
-def _ellipsoid(amp, scale, offset, angle, coords, out):
+
+def _ellipsoid(amp, scale, offset, angle, out, slab_size):
     """
-    Generate a cube containing an ellipsoid defined by its parameters.
-    If out is given, fills the given cube instead of creating a new
-    one.
+    Add an ellipsoid defined by its parameters to out, evaluated in float32
+    inside its bounding box only, a slab of z at a time.
+    Voxel i of an axis of size n is at (i - n//2) / n * 2.
     """
     R = _rotation_matrix(angle)
-    coords = (np.matmul(R, coords) - np.reshape(offset, (3, 1))) / np.reshape(
-        scale, (3, 1)
-    )
+    scale = np.asarray(scale, dtype=float)
+    offset = np.asarray(offset, dtype=float)
+    size = np.array(out.shape[::-1])
+
+    # the ellipsoid is R^T (offset + scale * u) for |u| <= 1
+    center = R.T @ offset
+    extent = np.sqrt(((R * scale[:, None]) ** 2).sum(axis=0))
+    lower = np.clip(np.floor((center - extent) * size / 2) + size // 2 - 1, 0, size).astype(int)
+    upper = np.clip(np.ceil((center + extent) * size / 2) + size // 2 + 2, 0, size).astype(int)
+    if np.any(lower >= upper):
+        return
 
-    r2 = np.sum(coords**2, axis=0).reshape(out.shape)
+    # the rotated and scaled coordinates are separable, (R c - offset) / scale = X[x] + Y[y] + Z[z]
+    x, y, z = ((np.arange(l, u) - n // 2) / n * 2 for l, u, n in zip(lower, upper, size))
+    X = (R[:, 0, None] * x / scale[:, None]).astype(np.float32)
+    Y = (R[:, 1, None] * y / scale[:, None]).astype(np.float32)
+    Z = ((R[:, 2, None] * z - offset[:, None]) / scale[:, None]).astype(np.float32)
 
-    out[r2 <= 1] += amp
+    box = out[lower[2]:upper[2], lower[1]:upper[1], lower[0]:upper[0]]
+    step = max(1, slab_size // (len(x) * len(y)))
+    for z0 in range(0, len(z), step):
+        z1 = min(z0 + step, len(z))
+        r2 = np.zeros((z1 - z0, len(y), len(x)), dtype=np.float32)
+        q = np.empty_like(r2)
+        for i in range(3):
+            np.add((Z[i, z0:z1, None] + Y[i, None, :])[..., None], X[i], out=q)
+            q *= q
+            r2 += q
+        box[z0:z1][r2 <= 1] += amp
 
 
 def _rotation_matrix(angle):
@@ -0,0 +1,133 @@
+'''
+Per-stage timing of project and reconstruct.
+A report is a dict with the function, backend, input shape, total time [s] and
+stages {name: {time, bytes, elements, calls}} in order of first use, where bytes are
+allocated by the stage and elements are the items it processes (rays, voxel updates, samples).
+Reports are only built when something collects them, a disabled stage costs a function call.
+'''
+import threading
+import time
+import numpy as np
+from contextlib import contextmanager
+
+_local = threading.local()
+_hooks = []
+
+@contextmanager
+def profile(callback=None):
+    '''
+    Collect the reports of the project/reconstruct calls made by this thread inside the block.
+    callback(report) is also called as each call finishes.
+    ->
+    output : list of the reports, filled as the calls finish
+    '''
+    reports = []
+    def sink(report):
+        reports.append(report)
+        if callback is not None:
+            callback(report)
+    if not hasattr(_local, 'sinks'):
+        _local.sinks = []
+    _local.sinks.append(sink)
+    try:
+        yield reports
+    finally:
+        _local.sinks.remove(sink)
+
+
+def addProfileHook(func):
+    '''
+    Call func(report) after every project/reconstruct call of every thread, e.g. to feed a metrics pipeline.
+    '''
+    _hooks.append(func)
+
+
+def removeProfileHook(func):
+    _hooks.remove(func)
+
+
+def getReport(function, profile=None, **info):
+    '''
+    profile : profile key of the call, a callable or a list receiving the report
+    ->
+    output  : report to fill with getStage, or None when nothing collects it
+    '''
+    sinks = getattr(_local, 'sinks', None)
+    if profile is None and not sinks and not _hooks:
+        return None
+    targets = list(sinks or []) + list(_hooks)
+    if profile is not None:
+        targets.append(profile.append if isinstance(profile, list) else profile)
+    return _Report(function, targets, info)
+
+
+def getStage(report, name, elements=0, bytes=0):
+    '''
+    Context manager timing a stage of report (a no-op if report is None), add() counts more elements and bytes.
+    '''
+    return _NULL if report is None else _Stage(report, name, elements, bytes)
+
+
+def finishReport(report):
+    if report is not None:
+        report.finish()
+
+
+def getCopiedBytes(array, source):
+    '''
+    output : bytes of array if it is a copy of source (by a dtype or layout cast), else 0
+    '''
+    return 0 if np.may_share_memory(array, source) else array.nbytes
+
+
+class _Report():
+    def __init__(self, function, targets, info):
+        self.targets = targets
+        self.stages = {}
+        self.info = dict(function=function, **info)
+        self.start = time.perf_counter()
+
+    def finish(self):
+        report = dict(self.info, time=time.perf_counter() - self.start, stages=self.stages)
+        for target in self.targets:
+            target(report)
+
+
+class _Stage():
+    __slots__ = ['report', 'name', 'elements', 'bytes', 'start']
+
+    def __init__(self, report, name, elements, bytes):
+        self.report, self.name, self.elements, self.bytes = report, name, elements, bytes
+
+    def add(self, elements=0, bytes=0):
+        self.elements += elements
+        self.bytes += bytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.start
+        # stages repeated over chunks are summed
+        stage = self.report.stages.setdefault(self.name, dict(time=0., bytes=0, elements=0, calls=0))
+        stage['time'] += elapsed
+        stage['bytes'] += int(self.bytes)
+        stage['elements'] += int(self.elements)
+        stage['calls'] += 1
+
+
+class _NullStage():
+    __slots__ = []
+
+    def add(self, elements=0, bytes=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL = _NullStage()
@@ -0,0 +1,123 @@
+import numpy as np
+import pyCT
+from pyCT import backend, parallel
+from pyCT.parameter import _Parameters
+from pyCT.buffer import asFloat32, getOutput
+from pyCT.forward import _getNearFar
+from pyCT.forward.projectionCPU import projectParallelBeamCPU, projectConeBeamCPU, backprojectParallelBeamCPU, backprojectConeBeamCPU
+from pyCT.backward.reconstructionCPU import reconstructParallelBeamCPU, reconstructConeBeamCPU
+
+class Projector():
+    '''
+    Forward projection, its transpose and unfiltered backprojection for a fixed geometry.
+    The transformation, work buffers and device allocations are built once.
+    key : cuda, jit, ray_step, chunk_size, slab_size, workers, executor
+    '''
+    def __init__(self, parameters:_Parameters, **kwargs):
+        self.parameters = parameters.copy()
+        self.backend = backend.select(kwargs.get('cuda'), kwargs.get('jit'))
+        self.ray_step = kwargs['ray_step'] if 'ray_step' in kwargs.keys() else .5
+        self.chunk_size = kwargs['chunk_size'] if 'chunk_size' in kwargs.keys() else 2**18
+        self.slab_size = kwargs['slab_size'] if 'slab_size' in kwargs.keys() else 2**20
+        self.workers = kwargs['workers'] if 'workers' in kwargs.keys() else None
+        self.executor = parallel.checkExecutor(kwargs['executor']) if 'executor' in kwargs.keys() else 'thread'
+
+        self.mode = parameters.mode
+        self.s2d = parameters.source.distance.source2detector
+        self.nx, self.ny, self.nz = parameters.object.size.get()
+        self.du, self.dv = parameters.detector.spacing.get()
+        self.su, self.sv = parameters.detector.length.get()
+        self.nu, self.nv = parameters.detector.size.get()
+        self.na = len(parameters.source.motion.rotation.get()[0])
+        self.near, self.far, self.nw = _getNearFar(parameters, self.ray_step)
+        self.forwardMatrix = pyCT.getTransformation(parameters, self.nw, self.near, self.far).getForward()
+        transformation = pyCT.getTransformation(parameters, 1, 0, self.s2d)
+        self.backwardMatrix = transformation.getBackward()
+        self.ou, self.ov, self.oa = transformation.getOffset()
+
+        self.detector_shape = (self.na, self.nv, self.nu)
+        self.object_shape = (self.nz, self.ny, self.nx)
+        self.__detector_array = np.zeros(self.detector_shape, dtype=np.float32)
+        self.__object_array = np.zeros(self.object_shape, dtype=np.float32)
+
+        if self.backend == 'cuda':
+            forward = backend.getModule('cuda', 'forward')
+            backward = backend.getModule('cuda', 'backward')
+            self.__forwardPlan = forward.ForwardPlanGPU(self.mode, self.forwardMatrix.astype(np.float32).ravel(), self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.su, self.sv, self.ou, self.ov, self.oa, self.s2d, self.near, self.far)
+            self.__backwardPlan = backward.BackwardPlanGPU(self.mode, self.backwardMatrix.astype(np.float32).ravel(), self.nx, self.ny, self.nz, self.nu, self.nv, self.na, self.su, self.sv, self.du, self.dv, self.ou, self.ov, self.oa, self.s2d)
+
+    def forward(self, object_array:np.ndarray, out:np.ndarray=None) -> np.ndarray:
+        '''
+        object_array : [nz, ny, nx]
+        out          : [na, nv, nu] float32, the internal buffer if None
+        '''
+        out = self.__getOutput(out, self.__detector_array, self.detector_shape)
+        if self.backend == 'cuda':
+            self.__forwardPlan.run(out.reshape(-1), asFloat32(object_array).reshape(-1))
+        elif self.backend == 'jit':
+            jit = backend.getModule('jit', 'forward')
+            out.fill(0)
+            if self.mode:
+                jit.projectConeBeamJIT(out, object_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.su, self.sv, self.ou, self.ov, self.oa, self.s2d, self.near, self.far, self.workers)
+            else:
+                jit.projectParallelBeamJIT(out, object_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.workers)
+        else:
+            out.fill(0)
+            if self.mode:
+                projectConeBeamCPU(out, object_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.su, self.sv, self.ou, self.ov, self.oa, self.s2d, self.near, self.far, self.chunk_size, self.workers or 1, executor=self.executor)
+            else:
+                projectParallelBeamCPU(out, object_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.chunk_size, self.workers or 1, executor=self.executor)
+        out *= self.ray_step
+        return out
+
+    def adjoint(self, sinogram_array:np.ndarray, out:np.ndarray=None) -> np.ndarray:
+        '''
+        Exact transpose of forward, <forward(x), y> = <x, adjoint(y)>, on JIT or CPU (as pyCT.iterative).
+        sinogram_array : [na, nv, nu]
+        out            : [nz, ny, nx] float32, the internal buffer if None
+        '''
+        out = self.__getOutput(out, self.__object_array, self.object_shape)
+        sinogram_array = asFloat32(sinogram_array)
+        out.fill(0)
+        # no CUDA transpose, the CUDA backend transposes on JIT when numba is available
+        if self.backend == 'jit' or self.backend == 'cuda' and backend.isAvailable('jit'):
+            jit = backend.getModule('jit', 'forward')
+            if self.mode:
+                jit.backprojectConeBeamJIT(out, sinogram_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.su, self.sv, self.ou, self.ov, self.oa, self.s2d, self.near, self.far, self.workers)
+            else:
+                jit.backprojectParallelBeamJIT(out, sinogram_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.workers)
+        elif self.mode:
+            backprojectConeBeamCPU(out, sinogram_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.su, self.sv, self.ou, self.ov, self.oa, self.s2d, self.near, self.far, self.chunk_size)
+        else:
+            backprojectParallelBeamCPU(out, sinogram_array, self.forwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.nw, self.na, self.chunk_size)
+        out *= self.ray_step
+        return out
+
+    def backproject(self, sinogram_array:np.ndarray, out:np.ndarray=None) -> np.ndarray:
+        '''
+        Unfiltered backprojection, as reconstruct(..., filter=None), only proportional to the transpose.
+        sinogram_array : [na, nv, nu]
+        out            : [nz, ny, nx] float32, the internal buffer if None
+        '''
+        out = self.__getOutput(out, self.__object_array, self.object_shape)
+        if self.backend == 'cuda':
+            self.__backwardPlan.run(out.reshape(-1), asFloat32(sinogram_array).reshape(-1))
+        elif self.backend == 'jit':
+            jit = backend.getModule('jit', 'backward')
+            out.fill(0)
+            if self.mode:
+                jit.reconstructConeBeamJIT(out, sinogram_array, self.backwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.na, self.su, self.sv, self.du, self.dv, self.ou, self.ov, self.oa, self.s2d, self.workers)
+            else:
+                jit.reconstructParallelBeamJIT(out, sinogram_array, self.backwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.na, self.workers)
+        else:
+            out.fill(0)
+            if self.mode:
+                reconstructConeBeamCPU(out, sinogram_array, self.backwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.na, self.su, self.sv, self.du, self.dv, self.ou, self.ov, self.oa, self.s2d, self.slab_size, self.workers or 1, executor=self.executor)
+            else:
+                reconstructParallelBeamCPU(out, sinogram_array, self.backwardMatrix, self.nx, self.ny, self.nz, self.nu, self.nv, self.na, self.slab_size, self.workers or 1, executor=self.executor)
+        return out
+
+    def __getOutput(self, out, buffer, shape):
+        if out is None:
+            return buffer
+        return getOutput(out, shape, clear=False)
@@ -0,0 +1,32 @@
+import numpy as np
+
+ORDERS = ['interleaved', 'bit-reversal', 'golden-angle']
+
+def getSubsets(na:int, subsets:int, order:str='interleaved') -> list:
+    '''
+    Split na evenly spaced views into interleaved subsets (subset s holds views s, s+subsets, ...)
+    and order the subsets so that consecutive ones are far apart in angle.
+    order  : interleaved (0, 1, 2, ...), bit-reversal (0, S/2, S/4, 3S/4, ...), golden-angle
+    ->
+    output : [view indices of each subset, in processing order]
+    '''
+    subsets = max(1, min(subsets, na))
+    return [np.arange(s, na, subsets) for s in getOrder(subsets, order)]
+
+
+def getOrder(n:int, order:str='interleaved') -> np.ndarray:
+    '''
+    output : permutation of range(n)
+    '''
+    if order.lower() == 'interleaved':
+        return np.arange(n)
+    elif order.lower() == 'bit-reversal':
+        bits = max(1, int(np.ceil(np.log2(n))))
+        indices = np.array([int(format(i, '0{}b'.format(bits))[::-1], 2) for i in range(2**bits)])
+        # drop the indices beyond n, the rest keeps the bit-reversed order
+        return indices[indices < n]
+    elif order.lower() == 'golden-angle':
+        # the i-th subset sits at the fractional part of i times the golden ratio
+        position = (np.arange(n) * (np.sqrt(5) - 1) / 2) % 1
+        return np.argsort(np.argsort(position))
+    raise ValueError('{} was not supported in pyCT'.format(order) + '\nWe support the following orders: ' + ', '.join(ORDERS))
@@ -1,8 +1,12 @@
 import numpy as np
 from pyCT.parameter import _Parameters
+from pyCT.cache import getCached
 
 def getTransformation(params, nw, near, far):
-    return _Transformation(params, nw, near, far)
+    '''
+    Cached per geometry: identical parameters share one _Transformation.
+    '''
+    return getCached((params.fingerprint(), 'transformation', nw, near, far), lambda: _Transformation(params, nw, near, far))
 
 class _Transformation():
     def __init__(self, params:_Parameters, nw:int, near:float, far:float):
@@ -10,20 +14,39 @@ class _Transformation():
         self.cameraTransformation : np.ndarray = None
         self.viewTransformation   : np.ndarray = None
         self.__params = params
+        self.__forward  = None
+        self.__backward = None
+        self.__offset   = None
 
         self.__setWorldTransformation()
         self.__setCameraTransformation()
+        self.__setOffset()
         if not params.mode:
             self.__setViewTransformation(nw, near, far)
+        self.__mode = params.mode
+        self.__params = None
 
     def getForward(self) -> np.ndarray:
-        return np.linalg.inv(self.getBackward())
+        if self.__forward is None:
+            self.__forward = _readOnly(np.linalg.inv(self.getBackward()))
+        return self.__forward
     
     def getBackward(self) -> np.ndarray:
-        if self.__params.mode:
-            return np.einsum('aij,ajk->aik', self.cameraTransformation, self.worldTransformation)
-        else:
-            return self.viewTransformation @ np.einsum('aij,ajk->aik', self.cameraTransformation, self.worldTransformation)
+        if self.__backward is None:
+            if self.__mode:
+                backward = np.einsum('aij,ajk->aik', self.cameraTransformation, self.worldTransformation)
+            else:
+                backward = self.viewTransformation @ np.einsum('aij,ajk->aik', self.cameraTransformation, self.worldTransformation)
+            self.__backward = _readOnly(backward)
+        return self.__backward
+
+    def getOffset(self):
+        '''
+        detector offsets per view
+        ->
+        ou, ov, oa : (na,) float32
+        '''
+        return self.__offset
 
 
     def __setWorldTransformation(self):
@@ -54,6 +77,17 @@ class _Transformation():
         self.cameraTransformation = np.einsum('aij,ajk->aik', detectorFrame, _getTranslation(-sourceOrigin))
 
 
+    def __setOffset(self):
+        na = len(self.__params.source.motion.rotation.get()[0])
+        ou, ov = self.__params.detector.motion.translation.get(axis=0).astype(np.float32)
+        oa = self.__params.detector.motion.rotation.get().astype(np.float32)
+        if (len(ou) == 1) and (len(ov) == 1):
+            ou, ov = np.repeat(ou, na), np.repeat(ov, na)
+        if len(oa) == 1:
+            oa = np.repeat(oa, na)
+        self.__offset = (_readOnly(ou), _readOnly(ov), _readOnly(oa))
+
+
     def __setViewTransformation(self, nw, near, far):
         if self.__params.mode:
             pass
@@ -75,6 +109,11 @@ class _Transformation():
             self.viewTransformation = np.einsum('ij,ajk -> aik', viewMatrix, motionMatrix)
 
 
+def _readOnly(array:np.ndarray) -> np.ndarray:
+    # cached arrays are shared between calls
+    array.flags.writeable = False
+    return array
+
 def _makeRotation(angle, 
                   axis:str
                   ) -> np.ndarray:
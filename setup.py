@@ -84,6 +84,8 @@ def locate_cuda():
                 cuda_home = "/usr/local/cuda"
             if not os.path.exists(cuda_home):
                 cuda_home = None
+    if cuda_home is None:
+        raise EnvironmentError("The CUDA path could not be located in $PATH, $CUDA_HOME or $CUDA_PATH.")
     version = get_cuda_version(cuda_home)
     cudaconfig = {
         "home": cuda_home,
@@ -103,25 +105,31 @@ def _is_cuda_file(path):
     return os.path.splitext(path)[1] in [".cu", ".cuh"]
 
 
-CUDA, CUDA_VERSION = locate_cuda()
-
-cuda_version = 11.0
+# the CUDA extensions are built only where CUDA is found, pyCT runs on the JIT and CPU backends without them
 try:
-    cuda_version = float(CUDA_VERSION)
-except ValueError:
-    cuda_list = re.findall('\d+', CUDA_VERSION)
-    cuda_version = float( str(cuda_list[0] + '.' + cuda_list[1]))
-
-# Insert CUDA arguments depedning on the version
-for item in CC_COMPATIBILITY_TABLE:
-    support_begin = item[2]
-    support_end   = item[3]
-    if cuda_version < support_begin:
-        continue
-    if cuda_version >= support_end:
-        continue
-    str_arg = f"-gencode=arch=compute_{item[0]},code=sm_{item[1]}"
-    COMPUTE_CAPABILITY_ARGS.insert(0, str_arg)
+    CUDA, CUDA_VERSION = locate_cuda()
+except (EnvironmentError, RuntimeError) as error:
+    print("{}\nBuilding pyCT without the CUDA backend.".format(error))
+    CUDA, CUDA_VERSION = None, None
+
+if CUDA is not None:
+    cuda_version = 11.0
+    try:
+        cuda_version = float(CUDA_VERSION)
+    except ValueError:
+        cuda_list = re.findall('\d+', CUDA_VERSION)
+        cuda_version = float( str(cuda_list[0] + '.' + cuda_list[1]))
+
+    # Insert CUDA arguments depedning on the version
+    for item in CC_COMPATIBILITY_TABLE:
+        support_begin = item[2]
+        support_end   = item[3]
+        if cuda_version < support_begin:
+            continue
+        if cuda_version >= support_end:
+            continue
+        str_arg = f"-gencode=arch=compute_{item[0]},code=sm_{item[1]}"
+        COMPUTE_CAPABILITY_ARGS.insert(0, str_arg)
 
 # Obtain the numpy include directory.  This logic works across numpy versions.
 try:
@@ -320,31 +328,42 @@ class BuildExtension(build_ext):
     
 
 
-ext1 = Extension('projectionGPU',
-                 sources=["pyCT/forward/projectionGPU.pyx", "pyCT/cuda/forward.cu"],
-                 language="c++",
-                 runtime_library_dirs=[CUDA["lib64"]] if not IS_WINDOWS else None,
-                 library_dirs=[CUDA["lib64"]],
-                 libraries=["cudart"],
-                 include_dirs=[NUMPY_INCLUDE, CUDA["include"], "pyCT/cuda"]
-                )
-ext2 = Extension('reconstructionGPU',
-                 sources=["pyCT/backward/reconstructionGPU.pyx", "pyCT/cuda/backward.cu"],
-                 language="c++",
-                 runtime_library_dirs=[CUDA["lib64"]] if not IS_WINDOWS else None,
-                 library_dirs=[CUDA["lib64"]],
-                 libraries=["cudart"],
-                 include_dirs=[NUMPY_INCLUDE, CUDA["include"], "pyCT/cuda"]
-                )
+EXTENSIONS = []
+if CUDA is not None:
+    ext1 = Extension('projectionGPU',
+                     sources=["pyCT/forward/projectionGPU.pyx", "pyCT/cuda/forward.cu"],
+                     language="c++",
+                     runtime_library_dirs=[CUDA["lib64"]] if not IS_WINDOWS else None,
+                     library_dirs=[CUDA["lib64"]],
+                     libraries=["cudart"],
+                     include_dirs=[NUMPY_INCLUDE, CUDA["include"], "pyCT/cuda"]
+                    )
+    ext2 = Extension('reconstructionGPU',
+                     sources=["pyCT/backward/reconstructionGPU.pyx", "pyCT/cuda/backward.cu"],
+                     language="c++",
+                     runtime_library_dirs=[CUDA["lib64"]] if not IS_WINDOWS else None,
+                     library_dirs=[CUDA["lib64"]],
+                     libraries=["cudart"],
+                     include_dirs=[NUMPY_INCLUDE, CUDA["include"], "pyCT/cuda"]
+                    )
+    EXTENSIONS = [ext1, ext2]
 
 setup(
     name="pyCT", 
     py_modules=['pyCT.py'],
     version="0.1.4",
-    ext_modules=[ext1, ext2],
+    ext_modules=EXTENSIONS,
     cmdclass={"build_ext" : BuildExtension},
     packages=find_packages(),
     include_package_data=True,
-    include_dirs=[NUMPY_INCLUDE, CUDA["include"], "pyCT/cuda"],
+    include_dirs=[NUMPY_INCLUDE, "pyCT/cuda"] + ([CUDA["include"]] if CUDA is not None else []),
+    install_requires=["numpy"],
+    # optional backends: numba for jit=True, scipy for getMatrix/matrix= and method='fourier'
+    extras_require={
+        "jit"    : ["numba"],
+        "matrix" : ["scipy"],
+        "fourier": ["scipy"],
+        "all"    : ["numba", "scipy"],
+    },
     zip_safe=False,
 )
\ No newline at end of file
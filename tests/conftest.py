@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+import pyCT
+
+
+def getParameters(mode=False, size=(24, 20, 16), detector=(40, 30), views=12, s2o=80., s2d=140., spacing=1., detector_spacing=1., offset=(0., 0.)):
+    '''
+    Small geometry of the tests, views over half a turn about z.
+    '''
+    params = pyCT.getParameters()
+    params.mode = mode
+    params.object.size.set(list(size))
+    params.object.spacing.set([spacing]*3)
+    params.detector.size.set(list(detector))
+    params.detector.spacing.set([detector_spacing]*2)
+    params.source.distance.source2origin = s2o
+    params.source.distance.source2detector = s2d
+    params.check()
+    params.set(source_angles=np.linspace(0, np.pi, views, endpoint=False).tolist(), detector_offset=list(offset))
+    return params
+
+
+@pytest.fixture
+def parameters():
+    return getParameters
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
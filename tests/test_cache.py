@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import pyCT
+from pyCT.cache import getCached, getCacheSize
+
+
+@pytest.fixture
+def cache():
+    size = getCacheSize()
+    pyCT.clearCache()
+    yield
+    pyCT.setCacheSize(size)
+    pyCT.clearCache()
+
+
+def test_geometry(parameters, rng, cache):
+    # a geometry changed after a cached call gets its own transformation, and project follows it
+    params = parameters(size=(6, 5, 4), detector=(9, 7), views=3)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    transformation = pyCT.getTransformation(params, 10, 0, 1)
+    assert pyCT.getTransformation(params, 10, 0, 1) is transformation
+    assert pyCT.getTransformation(params.copy(), 10, 0, 1) is transformation
+    y = pyCT.project(x, params)
+    params.set(source_angles=[0., .5, 1.])
+    assert pyCT.getTransformation(params, 10, 0, 1) is not transformation
+    recomputed = pyCT.project(x, params)
+    assert not np.allclose(recomputed, y)
+    pyCT.clearCache()
+    np.testing.assert_array_equal(pyCT.project(x, params), recomputed)
+    # also for an attribute set in place
+    params = parameters(True, size=(6, 5, 4), detector=(9, 7), views=3)
+    y = pyCT.project(x, params)
+    params.source.distance.source2detector = 100.
+    recomputed = pyCT.project(x, params)
+    assert not np.allclose(recomputed, y)
+    pyCT.clearCache()
+    np.testing.assert_array_equal(pyCT.project(x, params), recomputed)
+
+
+def test_eviction(cache):
+    # the least recently used entries are dropped beyond the cache size, clearCache drops them all
+    calls = []
+    def compute(key):
+        calls.append(key)
+        return key
+    pyCT.setCacheSize(2)
+    for key in ['a', 'b', 'a', 'c']:
+        getCached(key, lambda: compute(key))
+    assert calls == ['a', 'b', 'c']
+    getCached('a', lambda: compute('a'))
+    getCached('b', lambda: compute('b'))
+    assert calls == ['a', 'b', 'c', 'b']
+    pyCT.setCacheSize(1)
+    getCached('a', lambda: compute('a'))
+    assert calls == ['a', 'b', 'c', 'b', 'a']
+    pyCT.clearCache()
+    getCached('a', lambda: compute('a'))
+    assert calls == ['a', 'b', 'c', 'b', 'a', 'a']
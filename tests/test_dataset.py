@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import pyCT
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_dataset(parameters, rng, tmp_path, mode):
+    # project and reconstruct between memory-mapped payloads write what they return in memory
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=3)
+    path = pyCT.createDataset(str(tmp_path / 'scan'), params)
+    assert pyCT.loadParameters(path).fingerprint() == params.fingerprint()
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    volume = pyCT.openVolume(path, 'w+')
+    volume[...] = x
+    volume.flush()
+
+    sinogram = pyCT.openSinogram(path, 'w+')
+    assert sinogram.shape == (3, 7, 9) and sinogram.dtype == np.float32
+    pyCT.project(pyCT.openVolume(path), params, out=sinogram)
+    sinogram.flush()
+    y = pyCT.project(x, params)
+    np.testing.assert_array_equal(pyCT.openSinogram(path), y)
+
+    reconstruction = pyCT.openVolume(path, 'r+')
+    pyCT.reconstruct(pyCT.openSinogram(path), params, out=reconstruction)
+    reconstruction.flush()
+    np.testing.assert_array_equal(pyCT.openVolume(path), pyCT.reconstruct(y, params))
+
+
+def test_dataset_size(parameters, tmp_path):
+    # a payload that does not match the header is rejected
+    params = parameters(size=(6, 5, 4), detector=(9, 7), views=3)
+    path = pyCT.createDataset(str(tmp_path / 'scan'), params)
+    pyCT.openVolume(path, 'w+').flush()
+    params.set(source_angles=[0., .5, 1., 1.5])
+    pyCT.createDataset(path, params)
+    pyCT.openVolume(path)
+    np.zeros((3, 7, 9), dtype=np.float32).tofile(tmp_path / 'scan' / 'sinogram.raw')
+    with pytest.raises(ValueError):
+        pyCT.openSinogram(path)
+    params.object.size.set([6, 5, 5])
+    pyCT.createDataset(path, params)
+    with pytest.raises(ValueError):
+        pyCT.openVolume(path)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+import pyCT.iterative, pyCT.subset
+from pyCT.iterative import _forward, _adjoint, _getWeights, _computeWeights
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('detector_spacing', [.5, 1.5])
+@pytest.mark.parametrize('jit', [False, True])
+def test_adjoint(parameters, rng, mode, detector_spacing, jit):
+    # <Ax, y> = <x, A^T y> for any spacing, on every engine
+    params = parameters(mode, spacing=.7, detector_spacing=detector_spacing)
+    x = rng.random((16, 20, 24), dtype=np.float32)
+    y = rng.random((12, 30, 40), dtype=np.float32)
+    kwargs = dict(jit=jit)
+    assert np.vdot(_forward(x, params, slice(None), None, kwargs), y) == pytest.approx(np.vdot(x, _adjoint(y, params, slice(None), None, kwargs)), rel=1e-4)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_adjoint_views(parameters, rng, mode):
+    params = parameters(mode)
+    y = rng.random((12, 30, 40), dtype=np.float32)
+    views = [2, 5, 7]
+    masked = np.zeros_like(y)
+    masked[views] = y[views]
+    np.testing.assert_allclose(_adjoint(y[views], params, views, None, {}), _adjoint(masked, params, slice(None), None, {}), rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_adjoint_ray_driven(parameters, rng, mode):
+    # the backprojection weighted by the ray density only approximates the transpose
+    params = parameters(mode, detector_spacing=1.5)
+    x = rng.random((16, 20, 24), dtype=np.float32)
+    y = rng.random((12, 30, 40), dtype=np.float32)
+    kwargs = dict(method='joseph')
+    assert np.vdot(_forward(x, params, slice(None), None, kwargs), y) == pytest.approx(np.vdot(x, _adjoint(y, params, slice(None), None, kwargs)), rel=.05)
+
+
+@pytest.mark.parametrize('detector_spacing', [.5, 1.5])
+def test_cgls(parameters, detector_spacing):
+    # the residual decreases monotonically and ends below that of SIRT after as many iterations
+    params = parameters(size=(24, 24, 4), detector=(int(36 / detector_spacing), 4), views=30, detector_spacing=detector_spacing)
+    phantom = pyCT.getPhantom((4, 24, 24), np.float32)
+    sinogram = pyCT.project(phantom, params)
+    residuals = []
+    pyCT.iterative.cgls(sinogram, params, 8, callback=lambda k, x, residual, elapsed: residuals.append(residual))
+    assert np.all(np.diff(residuals) < 0)
+    sirt = []
+    pyCT.iterative.sirt(sinogram, params, 8, callback=lambda k, x, residual, elapsed: sirt.append(residual))
+    assert residuals[-1] < sirt[-1] / 2
+
+
+@pytest.mark.parametrize('order', pyCT.subset.ORDERS)
+@pytest.mark.parametrize('na, subsets', [(12, 4), (13, 5), (3, 8)])
+def test_subsets(order, na, subsets):
+    # every view once, interleaved within a subset, whatever the order of the subsets
+    views = pyCT.getSubsets(na, subsets, order)
+    assert len(views) == min(subsets, na)
+    assert sorted(np.concatenate(views).tolist()) == list(range(na))
+    assert all(np.all(np.diff(subset) == len(views)) for subset in views)
+    assert sorted(subset[0] for subset in views) == list(range(len(views)))
+    with pytest.raises(ValueError):
+        pyCT.getSubsets(na, subsets, 'random')
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('jit', [False, True])
+def test_projector_adjoint(parameters, rng, mode, jit):
+    # the persistent Projector is the same operator pair as the solvers
+    params = parameters(mode, spacing=.7, detector_spacing=1.5)
+    projector = pyCT.Projector(params, jit=jit)
+    x = rng.random((16, 20, 24), dtype=np.float32)
+    y = rng.random((12, 30, 40), dtype=np.float32)
+    assert np.vdot(projector.forward(x), y) == pytest.approx(np.vdot(x, projector.adjoint(y)), rel=1e-4)
+    np.testing.assert_allclose(projector.adjoint(y), _adjoint(y, params, slice(None), None, dict(jit=jit)), rtol=1e-4, atol=1e-4)
+
+
+def test_weights_method(parameters):
+    # the cached row and column weights of one projector are not reused for another on the same geometry
+    params = parameters(detector_spacing=1.5)
+    views = pyCT.getSubsets(12, 3)
+    for method in ['sampling', 'siddon', 'sampling', 'joseph']:
+        rows, columns = _getWeights(params, views, 'interleaved', dict(method=method))
+        reference = _computeWeights(params, views, dict(method=method))
+        for cached, computed in zip(rows + columns, reference[0] + reference[1]):
+            np.testing.assert_array_equal(cached, computed)
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+import pyCT
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_matrix(parameters, rng, mode):
+    # A x and A^T y of the matrix are the sampling projector and its transpose
+    params = parameters(mode, size=(12, 10, 8), detector=(16, 12), views=6)
+    x = rng.random((8, 10, 12), dtype=np.float32)
+    y = rng.random((6, 12, 16), dtype=np.float32)
+    matrix = pyCT.getMatrix(params)
+    Ax = pyCT.project(x, params, matrix=matrix)
+    np.testing.assert_allclose(Ax, pyCT.project(x, params, jit=False), rtol=1e-4, atol=1e-4)
+    assert np.vdot(Ax, y) == pytest.approx(np.vdot(x, pyCT.reconstruct(y, params, filter=None, matrix=matrix)), rel=1e-4)
+
+
+def test_matrix_filter(parameters, rng):
+    params = parameters(size=(12, 10, 8), detector=(16, 12), views=6)
+    with pytest.raises(ValueError):
+        pyCT.reconstruct(rng.random((6, 12, 16), dtype=np.float32), params, matrix=True)
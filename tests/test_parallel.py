@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import pyCT
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_workers(parameters, rng, mode, executor):
+    # the worker pools split the same work, project is bit-identical and reconstruct adds partial volumes
+    params = parameters(mode, size=(12, 10, 8), detector=(16, 12), views=6)
+    x = rng.random((8, 10, 12), dtype=np.float32)
+    y = rng.random((6, 12, 16), dtype=np.float32)
+    for method in ['sampling', 'joseph']:
+        np.testing.assert_array_equal(pyCT.project(x, params, jit=False, method=method, workers=3, executor=executor),
+                                      pyCT.project(x, params, jit=False, method=method))
+    np.testing.assert_allclose(pyCT.reconstruct(y, params, filter=None, jit=False, workers=3, executor=executor),
+                               pyCT.reconstruct(y, params, filter=None, jit=False), rtol=1e-5, atol=1e-5)
+
+
+def test_executor(parameters, rng):
+    with pytest.raises(ValueError):
+        pyCT.project(rng.random((8, 10, 12), dtype=np.float32), parameters(size=(12, 10, 8)), executor='fork')
+
+
+def test_jit_threads(parameters, rng):
+    # workers applies to its own call, the numba thread count of the process is restored afterwards
+    numba = pytest.importorskip('numba')
+    params = parameters(size=(12, 10, 8), detector=(16, 12), views=6)
+    x = rng.random((8, 10, 12), dtype=np.float32)
+    threads = numba.get_num_threads()
+    y = pyCT.project(x, params, jit=True, workers=1)
+    pyCT.reconstruct(y, params, filter=None, jit=True, workers=1)
+    pyCT.iterative.sirt(y, params, 1, jit=True, workers=1)
+    assert numba.get_num_threads() == threads
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import pyCT
+from pyCT.phantom import _rotation_matrix, sl_amps, sl_scales, sl_offsets, sl_angles
+
+
+def _phantomGrid(shape, amps, scales, offsets, angles):
+    '''
+    The phantom before it was evaluated per bounding box: every ellipsoid over the whole grid, in float64.
+    '''
+    z, y, x = np.mgrid[-(shape[-3]//2):(shape[-3]+1)//2, -(shape[-2]//2):(shape[-2]+1)//2, -(shape[-1]//2):(shape[-1]+1)//2]
+    coords = np.stack((x.ravel() / shape[-1] * 2, y.ravel() / shape[-2] * 2, z.ravel() / shape[-3] * 2))
+    out = np.zeros(shape)
+    for amp, scale, offset, angle in zip(amps, scales, offsets, angles):
+        r = (_rotation_matrix(angle) @ coords - np.reshape(offset, (3, 1))) / np.reshape(scale, (3, 1))
+        out[(r**2).sum(axis=0).reshape(shape) <= 1] += amp
+    return out
+
+
+@pytest.mark.parametrize('shape', [(16, 20, 24), (15, 33, 21)])
+def test_phantom(shape):
+    reference = _phantomGrid(shape, sl_amps, sl_scales, sl_offsets, sl_angles)
+    np.testing.assert_allclose(pyCT.getPhantom(shape), reference, atol=1e-6)
+    # any slab of the bounding boxes, and a 2D phantom as the single slice of a 3D one
+    np.testing.assert_allclose(pyCT.getPhantom(shape, np.float32, slab_size=100), reference, atol=1e-6)
+    np.testing.assert_allclose(pyCT.getPhantom(shape[1:]), _phantomGrid((1,) + shape[1:], sl_amps, sl_scales, sl_offsets, sl_angles)[0], atol=1e-6)
+
+
+def test_random_phantoms():
+    # phantom b is drawn from getEllipsoids(count, [seed, b]), whatever the batch size
+    phantoms = pyCT.getRandomPhantoms((15, 20, 24), batch=3, count=8, seed=3)
+    for b, phantom in enumerate(phantoms):
+        np.testing.assert_allclose(phantom, _phantomGrid((15, 20, 24), *pyCT.getEllipsoids(8, [3, b])), atol=1e-6)
+    np.testing.assert_array_equal(pyCT.getRandomPhantoms((15, 20, 24), batch=2, count=8, seed=3), phantoms[:2])
+    assert phantoms.min() >= 0
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_project_phantom(parameters, mode):
+    # the exact line integrals of a smooth ellipsoid, which the engines sample from its voxels to a few percent
+    params = parameters(mode, size=(32, 32, 24), detector=(48, 36), views=6, detector_spacing=1.5 if mode else 1.)
+    ellipsoid = ([1.], [[.7, .5, .6]], [[.1, -.05, 0.]], [[20., 0., 0.]])
+    reference = pyCT.projectPhantom(params, ellipsoid)
+    volume = _phantomGrid((24, 32, 32), *ellipsoid).astype(np.float32)
+    for method in ['sampling', 'joseph', 'siddon']:
+        assert np.abs(pyCT.project(volume, params, method=method) - reference).mean() < .08 * np.abs(reference).mean()
+    # by chunks of ray-ellipsoid pairs and for a subset of the views
+    np.testing.assert_allclose(pyCT.projectPhantom(params, ellipsoid, chunk_size=100, views=[1, 4]), reference[[1, 4]], rtol=1e-5, atol=1e-5)
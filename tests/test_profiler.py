@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import pyCT
+
+
+def test_profile(parameters, rng):
+    # the stages of a call in order, with the rays, voxel updates and allocations they count
+    params = parameters(size=(6, 5, 4), detector=(9, 7), views=6)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    reports = []
+    y = pyCT.project(x, params, jit=False, profile=reports)
+    report, = reports
+    assert report['function'] == 'project' and report['backend'] == 'cpu' and report['shape'] == (4, 5, 6)
+    assert list(report['stages']) == ['near_far', 'transformation', 'output', 'kernel', 'scale']
+    assert report['stages']['kernel']['elements'] == 6*7*9 and report['stages']['kernel']['calls'] == 1
+    assert report['stages']['output']['bytes'] == y.nbytes
+    assert report['time'] >= sum(stage['time'] for stage in report['stages'].values())
+
+    # the calls of this thread in a profile block, stages repeated over the chunks of views summed
+    with pyCT.profile() as reports:
+        pyCT.reconstruct(y, params, 'ramp', jit=False, views_per_chunk=4)
+    report, = reports
+    assert report['function'] == 'reconstruct' and report['filter'] == 'ramp'
+    assert report['stages']['filter']['calls'] == report['stages']['kernel']['calls'] == 2
+    assert report['stages']['kernel']['elements'] == 6 * 4*5*6
+    # the out= buffer is not allocated
+    pyCT.project(x, params, jit=False, out=np.empty_like(y), profile=reports.append)
+    assert reports[-1]['stages']['output']['bytes'] == 0
+
+
+def test_profile_hook(parameters, rng):
+    params = parameters(size=(6, 5, 4), detector=(9, 7), views=6)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    reports = []
+    pyCT.addProfileHook(reports.append)
+    try:
+        pyCT.reconstruct(pyCT.project(x, params, jit=False), params, jit=False)
+    finally:
+        pyCT.removeProfileHook(reports.append)
+    assert [report['function'] for report in reports] == ['project', 'reconstruct']
+    pyCT.project(x, params, jit=False)
+    assert len(reports) == 2
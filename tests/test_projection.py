@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+import pyCT
+from pyCT.forward import _getNearFar
+from pyCT.backward import _computeCosineWeight
+
+
+def _projectLoop(object_array, params, ray_step):
+    '''
+    The per-sample loop of the NumPy engine before it was vectorized, in float64.
+    '''
+    near, far, nw = _getNearFar(params, ray_step)
+    transformation = pyCT.getTransformation(params, nw, near, far)
+    nu, nv = params.detector.size.get()
+    su, sv = params.detector.length.get()
+    s2d = params.source.distance.source2detector
+    na = len(transformation.getForward())
+    ou, ov, oa = (np.broadcast_to(offset, na) for offset in transformation.getOffset())
+    volume = np.pad(object_array.astype(np.float64), 1)
+    detector_array = np.zeros([na, nv, nu])
+    for a, matrix in enumerate(transformation.getForward()):
+        for v in range(nv):
+            for u in range(nu):
+                if params.mode:
+                    # from the source through the center of the pixel, rotated by oa and shifted by ou, ov
+                    pu, pv = (u + .5) * su / nu - su/2, (v + .5) * sv / nv - sv/2
+                    direction = np.array([pu*np.cos(oa[a]) + pv*np.sin(oa[a]) + ou[a], -pu*np.sin(oa[a]) + pv*np.cos(oa[a]) + ov[a], -s2d])
+                    direction /= np.linalg.norm(direction)
+                for w in range(nw):
+                    point = [*((near + w*(far-near)/nw) * direction), 1] if params.mode else [u, v, w, 1]
+                    detector_array[a, v, u] += _interpolate(volume, matrix @ point + 1)
+    return detector_array * ray_step
+
+
+def _interpolate(volume, point):
+    x, y, z, _ = point
+    nz, ny, nx = volume.shape
+    if not (0 < x < nx-1 and 0 < y < ny-1 and 0 < z < nz-1):
+        return 0
+    x0, y0, z0 = int(x), int(y), int(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    cube = volume[z0:z0+2, y0:y0+2, x0:x0+2]
+    return np.einsum('zyx,z,y,x->', cube, [1-fz, fz], [1-fy, fy], [1-fx, fx])
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('jit', [False, True])
+@pytest.mark.parametrize('offset', [(0., 0.), (1.5, -.7)])
+def test_project(parameters, rng, mode, jit, offset):
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=3, spacing=.8, detector_spacing=1.5 if mode else 1., offset=offset)
+    if mode:
+        params.detector.motion.rotation.set(.2 if offset[0] else 0.)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    np.testing.assert_allclose(pyCT.project(x, params, jit=jit), _projectLoop(x, params, .5), rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_project_blocks(parameters, rng, mode):
+    # any split into blocks of rays and slabs of the volume adds up to the same sinogram
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=3)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    reference = pyCT.project(x, params, jit=False)
+    for chunk_size, slab_size in [(50, None), (10**6, 30), (7, 60)]:
+        np.testing.assert_allclose(pyCT.project(x, params, jit=False, chunk_size=chunk_size, slab_size=slab_size), reference, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_project_iter(parameters, rng, mode):
+    # the chunks of views, written into the same out, are the views of the full sinogram
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=12)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    reference = pyCT.project(x, params)
+    out = np.empty([5, 7, 9], dtype=np.float32)
+    seen = []
+    for views, chunk in pyCT.project_iter(x, params, 5, out=out):
+        np.testing.assert_allclose(chunk, reference[views], rtol=1e-6, atol=1e-6)
+        seen.extend(views)
+    assert sorted(seen) == list(range(12))
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('method', ['joseph', 'siddon'])
+def test_ray_driven(parameters, mode, method):
+    # through a box of ones, the central rays of the views along its axes measure its width over the cosine of the ray
+    params = parameters(mode, size=(20, 20, 8), detector=(16, 8), views=4, spacing=.8, detector_spacing=1.5 if mode else 1.)
+    chords = pyCT.project(np.ones((8, 20, 20), dtype=np.float32), params, method=method)[::2, 3:5, 5:11]
+    cosine = _computeCosineWeight(params)[0, 3:5, 5:11] if mode else 1.
+    np.testing.assert_allclose(chords, np.broadcast_to(20 * .8 / cosine, chords.shape), rtol=1e-5)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('method', ['sampling', 'joseph', 'siddon'])
+def test_project_batch(parameters, rng, mode, method):
+    # a batch of volumes is projected as each volume alone
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=3)
+    x = rng.random((3, 4, 5, 6), dtype=np.float32)
+    batch = pyCT.project(x, params, method=method, jit=False)
+    assert batch.shape == (3, 3, 7, 9)
+    for volume, sinogram in zip(x, batch):
+        np.testing.assert_allclose(sinogram, pyCT.project(volume, params, method=method, jit=False), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.skipif(not pyCT.backend.isAvailable('cuda'), reason='CUDA is not available')
+@pytest.mark.parametrize('mode', [False, True])
+def test_cuda_views(parameters, rng, mode):
+    # a stepped slice of views, whose offsets are not contiguous, runs on CUDA as on the CPU
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=12, offset=(1.5, -.7))
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    views = slice(1, None, 3)
+    y = pyCT.project(x, params, cuda=True, views=views)
+    np.testing.assert_allclose(y, pyCT.project(x, params, cuda=False, jit=False, views=views), rtol=1e-3, atol=1e-3)
+    np.testing.assert_allclose(pyCT.reconstruct([(views, y)], params, filter=None, cuda=True),
+                               pyCT.reconstruct([(views, y)], params, filter=None, cuda=False, jit=False), rtol=1e-3, atol=1e-3)
@@ -0,0 +1,201 @@
+import numpy as np
+import pytest
+import pyCT
+from pyCT.backward import _applyFilter, _getFilter, _computeCosineWeight, _computeParkerWeight, _computeOffsetWeight
+from pyCT.forward.projectionCPU import _getDirections
+
+
+def _reconstructLoop(sinogram_array, params):
+    '''
+    The per-voxel loop of the NumPy backprojector before it was vectorized, in float64,
+    with the cone-beam pixel index measured from the detector corner at the pixel centers.
+    '''
+    s2d = params.source.distance.source2detector
+    nx, ny, nz = params.object.size.get()
+    du, dv = params.detector.spacing.get()
+    su, sv = params.detector.length.get()
+    transformation = pyCT.getTransformation(params, 1, 0, s2d)
+    na = len(transformation.getBackward())
+    ou, ov, oa = (np.broadcast_to(offset, na) for offset in transformation.getOffset())
+    views = np.pad(sinogram_array.astype(np.float64), [(0, 0), (1, 1), (1, 1)])
+    reconstruction_array = np.zeros([nz, ny, nx])
+    for a, matrix in enumerate(transformation.getBackward()):
+        for z in range(nz):
+            for y in range(ny):
+                for x in range(nx):
+                    u, v, w, _ = matrix @ [x, y, z, 1]
+                    if params.mode:
+                        u, v = np.cos(oa[a])*u - np.sin(oa[a])*v, np.sin(oa[a])*u + np.cos(oa[a])*v
+                        u, v = (u / w * -s2d + su/2 - ou[a]) / du - .5, (v / w * -s2d + sv/2 - ov[a]) / dv - .5
+                    reconstruction_array[z, y, x] += _interpolate(views[a], u + 1, v + 1)
+    return reconstruction_array
+
+
+def _filterLoop(sinogram_array, params, filter):
+    '''
+    The filter before the cached rfft filter bank: complex FFT of every padded row, in float64.
+    '''
+    na = len(params.source.motion.rotation.get()[0])
+    nu = params.detector.size.u
+    du = params.detector.spacing.u
+    extended_size = max(64, int(2 ** np.ceil(np.log2(2 * nu))))
+    pad = (extended_size - nu) // 2
+    n = np.concatenate((np.arange(1, extended_size/2 + 1, 2), np.arange(extended_size/2 - 1, 0, -2)))
+    f = np.zeros(extended_size)
+    f[0] = .25
+    f[1::2] = -1 / (np.pi * n) ** 2
+    response = 2 * np.real(np.fft.fft(f))
+    if filter == 'shepp-logan':
+        omega = np.pi * np.fft.fftfreq(extended_size)[1:]
+        response[1:] *= np.sin(omega) / omega
+    elif filter == 'hann':
+        response *= np.fft.fftshift(np.hanning(extended_size))
+    rows = np.fft.ifft(np.fft.fft(np.pad(sinogram_array.astype(np.float64), [(0, 0), (0, 0), (pad, pad)]), axis=-1) * response, axis=-1).real
+    weight = np.pi / na / 2 / du
+    if params.mode:
+        weight *= params.source.distance.source2detector / params.source.distance.source2origin
+    return rows[..., pad:-pad] * weight
+
+
+def _interpolate(view, u, v):
+    nv, nu = view.shape
+    if not (0 < u < nu-1 and 0 < v < nv-1):
+        return 0
+    u0, v0 = int(u), int(v)
+    fu, fv = u - u0, v - v0
+    return np.einsum('vu,v,u->', view[v0:v0+2, u0:u0+2], [1-fv, fv], [1-fu, fu])
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('jit', [False, True])
+@pytest.mark.parametrize('offset', [(0., 0.), (1.5, -.7)])
+def test_backproject(parameters, rng, mode, jit, offset):
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=3, spacing=.8, detector_spacing=1.5 if mode else 1., offset=offset)
+    if mode:
+        params.detector.motion.rotation.set(.2 if offset[0] else 0.)
+    else:
+        # tilted about x, off the slice-wise path
+        params.object.motion.rotation.set(.3 if offset[0] else 0., axes='x')
+    y = rng.random((3, 7, 9), dtype=np.float32)
+    np.testing.assert_allclose(pyCT.reconstruct(y, params, filter=None, jit=jit), _reconstructLoop(y, params), rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+def test_backproject_slabs(parameters, rng, mode):
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=3)
+    y = rng.random((3, 7, 9), dtype=np.float32)
+    reference = pyCT.reconstruct(y, params, filter=None, jit=False)
+    for slab_size in [1, 30, 60]:
+        np.testing.assert_allclose(pyCT.reconstruct(y, params, filter=None, jit=False, slab_size=slab_size), reference, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('filter', [None, 'hann'])
+def test_reconstruct_chunks(parameters, rng, mode, filter):
+    # filtering and backprojecting a few views at a time, or the chunks of project_iter, adds up to the full reconstruction
+    params = parameters(mode, size=(6, 5, 4), detector=(9, 7), views=12)
+    x = rng.random((4, 5, 6), dtype=np.float32)
+    reference = pyCT.reconstruct(pyCT.project(x, params), params, filter)
+    tolerance = dict(rtol=1e-4, atol=1e-5 * np.abs(reference).max())
+    np.testing.assert_allclose(pyCT.reconstruct(pyCT.project(x, params), params, filter, views_per_chunk=5), reference, **tolerance)
+    np.testing.assert_allclose(pyCT.reconstruct(pyCT.project_iter(x, params, 5), params, filter), reference, **tolerance)
+
+
+@pytest.mark.parametrize('mode', [False, True])
+@pytest.mark.parametrize('filter', ['ramp', 'shepp-logan', 'hann'])
+def test_filter(parameters, rng, mode, filter):
+    params = parameters(mode, detector=(40, 6), views=5, detector_spacing=.8)
+    y = rng.random((5, 6, 40), dtype=np.float32)
+    reference = _filterLoop(y, params, filter)
+    tolerance = dict(rtol=1e-4, atol=1e-5 * np.abs(reference).max())
+    np.testing.assert_allclose(_applyFilter(y, params, filter), reference, **tolerance)
+    # the pre-weights multiply the rows before the filter, per view or for all views
+    weights = [rng.random((1, 1, 40), dtype=np.float32), rng.random((5, 6, 1), dtype=np.float32)]
+    np.testing.assert_allclose(_applyFilter(y, params, filter, weights=weights), _filterLoop(y * weights[0] * weights[1], params, filter), **tolerance)
+    np.testing.assert_allclose(_applyFilter(y[2:4], params, filter, weights=[weights[0], weights[1][2:4]]), _filterLoop(y[2:4] * weights[0] * weights[1][2:4], params, filter), **tolerance)
+
+
+def test_filter_cache():
+    # one read-only response per filter and padded size
+    ramp = _getFilter('ramp', 64)
+    assert _getFilter('RAMP', 64) is ramp
+    np.testing.assert_array_equal(_getFilter('ram-lak', 64), ramp)
+    assert not ramp.flags.writeable and ramp.shape == (33,)
+    assert not np.array_equal(_getFilter('hann', 64), ramp)
+    pyCT.clearCache()
+    np.testing.assert_array_equal(_getFilter('ramp', 64), ramp)
+
+
+@pytest.mark.parametrize('offset', [(0., 0.), (3., -2.)])
+def test_cosine_weight(parameters, offset):
+    # the cosine between the ray of each pixel, as the projectors trace it, and the central ray
+    params = parameters(True, detector=(40, 30), views=4, detector_spacing=1.5, offset=offset)
+    params.detector.motion.rotation.set(.2)
+    nu, nv = params.detector.size.get()
+    su, sv = params.detector.length.get()
+    s2d = params.source.distance.source2detector
+    ou, ov, oa = pyCT.getTransformation(params, 1, 0, s2d).getOffset()
+    directions = _getDirections(nu, nv, 1, su, sv, ou[:1], ov[:1], oa[:1], s2d)
+    np.testing.assert_allclose(_computeCosineWeight(params), -directions[..., 2], rtol=1e-6)
+
+
+def test_parker_weight(parameters):
+    params = parameters(True, size=(32, 32, 4), detector=(48, 4), views=90, detector_spacing=1.5)
+    fan = np.arctan(48 * 1.5 / 2 / params.source.distance.source2detector)
+    params.set(source_angles=np.linspace(0, np.pi + 2*fan + .1, 90, endpoint=False).tolist())
+    weight = _computeParkerWeight(params)
+    # every line is weighted once over the short scan, which the scale of the weights spreads over its views
+    np.testing.assert_allclose(weight.mean(axis=0), 1, atol=1e-3)
+    assert weight.min() >= 0
+    # the short scan with Parker weights reconstructs as the full scan
+    phantom = pyCT.getPhantom((4, 32, 32), np.float32)
+    short = pyCT.reconstruct(pyCT.project(phantom, params), params, parker=True)
+    full = parameters(True, size=(32, 32, 4), detector=(48, 4), views=180, detector_spacing=1.5)
+    full.set(source_angles=np.linspace(0, 2*np.pi, 180, endpoint=False).tolist())
+    reference = pyCT.reconstruct(pyCT.project(phantom, full), full)
+    assert np.abs(short - reference)[1:3].mean() < .1 * np.abs(reference[1:3]).mean()
+    # a full scan needs none, a scan shorter than 180 degrees plus the fan angle cannot be weighted
+    assert _computeParkerWeight(full) is None
+    params.set(source_angles=np.linspace(0, np.pi, 90, endpoint=False).tolist())
+    with pytest.raises(ValueError):
+        _computeParkerWeight(params)
+
+
+def test_offset_weight(parameters):
+    # the columns seen from both sides weigh 2 together, the others 2 alone, mirrored for a negative offset
+    params = parameters(True, detector=(40, 6), offset=(6., 0.))
+    weight = _computeOffsetWeight(params)[0, 0]
+    gap = 14
+    np.testing.assert_allclose(weight[:2*gap] + weight[:2*gap][::-1], 2, rtol=1e-6)
+    np.testing.assert_array_equal(weight[2*gap:], 2)
+    np.testing.assert_array_equal(_computeOffsetWeight(parameters(True, detector=(40, 6), offset=(-6., 0.)))[0, 0], weight[::-1])
+    assert _computeOffsetWeight(parameters(True, detector=(40, 6))) is None
+
+
+@pytest.mark.parametrize('filter', ['ramp', 'hann'])
+def test_fourier(parameters, filter):
+    params = parameters(size=(32, 32, 3), detector=(48, 3), views=60)
+    phantom = pyCT.getPhantom((3, 32, 32), np.float32)
+    sinogram = pyCT.project(phantom, params)
+    fbp = pyCT.reconstruct(sinogram, params, filter)
+    fourier = pyCT.reconstruct(sinogram, params, filter, method='fourier')
+    # as close to the phantom as the filtered backprojection, and to the backprojection itself with a smooth window
+    assert np.abs(fourier - phantom).mean() < 1.25 * np.abs(fbp - phantom).mean()
+    if filter == 'hann':
+        assert np.abs(fourier - fbp).mean() < .1 * np.abs(fbp).mean()
+    # the gridding matrix is shared by the chunks of views and the sinograms of a batch
+    tolerance = dict(rtol=1e-4, atol=1e-5 * np.abs(fourier).max())
+    np.testing.assert_allclose(pyCT.reconstruct(sinogram, params, filter, method='fourier', views_per_chunk=7), fourier, **tolerance)
+    np.testing.assert_allclose(pyCT.reconstruct(np.stack([sinogram, 2*sinogram]), params, filter, method='fourier'), np.stack([fourier, 2*fourier]), **tolerance)
+
+
+def test_fourier_geometry(parameters, rng):
+    y = rng.random((12, 30, 40), dtype=np.float32)
+    with pytest.raises(ValueError):
+        pyCT.reconstruct(y, parameters(True), method='fourier')
+    with pytest.raises(ValueError):
+        pyCT.reconstruct(y, parameters(), None, method='fourier')
+    tilted = parameters()
+    tilted.object.motion.rotation.set(.3, axes='x')
+    with pytest.raises(ValueError):
+        pyCT.reconstruct(y, tilted, method='fourier')